@@ -0,0 +1,78 @@
+'''
+Throughput of `copy_to`: the plain read/write loop vs. the dispatched paths.
+
+    python benchmarks/copy_throughput.py [big-file-MiB] [small-file-count]
+
+Files are created in a temporary directory under the current one.
+'''
+import shutil
+import sys
+import tempfile
+import time
+
+from externals import File, Memory
+
+
+def legacy_copy_to(source, destination, max_block_size=1024 ** 2):
+    '''`copy_to` as it was: a new bytes object for every block'''
+    with source.readable_stream() as r:
+        with destination.writable_stream() as w:
+            while True:
+                block = r.read(max_block_size)
+                if not block:
+                    break
+                w.write(block)
+
+
+def dispatched_copy_to(source, destination):
+    source.copy_to(destination)
+
+
+def measure(label, copy, pairs, total_bytes):
+    start = time.time()
+    for source, destination in pairs:
+        copy(source, destination)
+    elapsed = time.time() - start
+    print(
+        '{:44} {:8.3f} s {:10.1f} MiB/s {:10.0f} files/s'.format(
+            label, elapsed, total_bytes / 1024. ** 2 / elapsed,
+            len(pairs) / elapsed))
+
+
+def main():
+    big_mib = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    small_count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    tmp = tempfile.mkdtemp(dir='.')
+    try:
+        root = File(tmp)
+        big = root / 'big'
+        with big.writable_stream() as f:
+            block = b'\1' * 1024 ** 2
+            for _ in range(big_mib):
+                f.write(block)
+        small = [root / 'small' / str(i) for i in range(small_count)]
+        for x in small:
+            x.content = b'\2' * 4096
+
+        for copy in (legacy_copy_to, dispatched_copy_to):
+            name = copy.__name__
+            measure(
+                '{} File->File {} MiB'.format(name, big_mib),
+                copy, [(big, root / 'big-copy')], big_mib * 1024 ** 2)
+            measure(
+                '{} File->Memory {} MiB'.format(name, big_mib),
+                copy, [(big, Memory())], big_mib * 1024 ** 2)
+            measure(
+                '{} File->File {} x 4 KiB'.format(name, small_count),
+                copy, [(x, root / 'small-copy' / x.name) for x in small],
+                small_count * 4096)
+            measure(
+                '{} File->Memory {} x 4 KiB'.format(name, small_count),
+                copy, [(x, Memory()) for x in small],
+                small_count * 4096)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
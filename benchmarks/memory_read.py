@@ -0,0 +1,66 @@
+'''
+Peak RSS of reading a large `Memory` blob: BytesIO copy vs. memoryview.
+
+    python benchmarks/memory_read.py [size-in-MiB]
+
+Every mode runs in a fresh interpreter, so its peak RSS is its own.
+'''
+import io
+import resource
+import subprocess
+import sys
+
+from externals import Memory
+
+
+def peak_rss_mib():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+
+def bytesio_copy(x):
+    '''The read path before content_view: copy everything into a BytesIO'''
+    stream = io.BytesIO()
+    stream.write(x.content)
+    stream.seek(0)
+    return stream.read(16)
+
+
+def content_view(x):
+    return x.content_view()[:16].tobytes()
+
+
+def readable_stream(x):
+    with x.readable_stream() as stream:
+        return stream.read(16)
+
+
+MODES = dict(
+    bytesio_copy=bytesio_copy,
+    content_view=content_view,
+    readable_stream=readable_stream,
+)
+
+
+def run(mode, size_mib):
+    x = Memory() / 'blob'
+    x.content = b'\0' * (size_mib * 1024 ** 2)
+    baseline = peak_rss_mib()
+    MODES[mode](x)
+    print(
+        '{:16} peak RSS {:8.1f} MiB  (+{:.1f} MiB over the stored blob)'
+        .format(mode, peak_rss_mib(), peak_rss_mib() - baseline))
+
+
+def main():
+    size_mib = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    if len(sys.argv) > 2:
+        run(sys.argv[2], size_mib)
+        return
+    for mode in sorted(MODES):
+        subprocess.check_call(
+            [sys.executable, __file__, str(size_mib), mode])
+
+
+if __name__ == '__main__':
+    main()
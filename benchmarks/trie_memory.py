@@ -0,0 +1,57 @@
+'''
+Memory use and speed of `Trie` vs. `CompactTrie`.
+
+    python benchmarks/trie_memory.py [path-count]
+
+Paths look like data/<batch>/part-<n>/file-<m>, so segment names repeat.
+'''
+import sys
+import time
+import tracemalloc
+
+from externals.trie import Trie
+from externals.compact_trie import CompactTrie
+
+
+def paths(count):
+    for i in range(count):
+        yield (
+            'data',
+            'batch-{:04}'.format(i // 10000),
+            'part-{:05}'.format(i // 100 % 100),
+            'file-{:02}'.format(i % 100))
+
+
+def measure(trie_class, count):
+    # paths are created while tracing, as when loading a manifest:
+    # what the trie keeps of them is counted
+    tracemalloc.start()
+    start = time.time()
+    trie = trie_class()
+    for path in paths(count):
+        trie[path] = b''
+    insert_seconds = time.time() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    all_paths = list(paths(count))
+    start = time.time()
+    for path in all_paths:
+        trie[path]
+    lookup_seconds = time.time() - start
+
+    print(
+        '{:12} {:8.1f} MiB {:6.1f} bytes/path'
+        '  insert {:9.0f} paths/s  lookup {:9.0f} paths/s'.format(
+            trie_class.__name__, size / 1024. ** 2, size / float(count),
+            count / insert_seconds, count / lookup_seconds))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    for trie_class in (Trie, CompactTrie):
+        measure(trie_class, count)
+
+
+if __name__ == '__main__':
+    main()
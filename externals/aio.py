@@ -0,0 +1,188 @@
+'''
+asyncio interface to externals (Python 3.6+).
+
+    root = AsyncExternal(File('/data'))
+    content = await (root / 'x').read()
+    async for child in root:
+        ...
+
+Blocking calls run on an executor - the loop's default one unless given -,
+at most `limit` of them at a time, so that a burst of requests does not
+use up all file descriptors.
+`Memory` does no I/O, calls on it complete inline.
+'''
+import asyncio
+import functools
+
+from .memory import Memory
+
+
+# externals walked in batches of this many from the executor
+WALK_BATCH = 256
+
+
+class _Runner(object):
+
+    '''Executor and concurrency limit shared by an AsyncExternal tree'''
+
+    def __init__(self, executor, limit):
+        self.executor = executor
+        self.limit = limit
+        self._semaphore = None
+
+    async def call(self, function, *args):
+        semaphore = self._semaphore
+        if semaphore is None:
+            # created lazily, inside the running loop
+            semaphore = self._semaphore = asyncio.Semaphore(self.limit)
+        async with semaphore:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, *args))
+
+
+class AsyncExternal(object):
+
+    '''Awaitable versions of the operations of external'''
+
+    __slots__ = ('external', '_runner', '_inline')
+
+    def __init__(self, external, executor=None, limit=64, inline=None):
+        '''
+        limit: maximum number of blocking calls in flight
+        inline: call external directly, without executor,
+            by default only for `Memory`
+        '''
+        self.external = external
+        self._runner = _Runner(executor, limit)
+        if inline is None:
+            inline = isinstance(external, Memory)
+        self._inline = inline
+
+    def _wrap(self, external):
+        '''external sharing my executor, limit and inlining'''
+        wrapped = object.__new__(self.__class__)
+        wrapped.external = external
+        wrapped._runner = self._runner
+        wrapped._inline = self._inline
+        return wrapped
+
+    async def _call(self, function, *args):
+        if self._inline:
+            return function(*args)
+        return await self._runner.call(function, *args)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, AsyncExternal)
+            and self.external == other.external)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.external)
+
+    def __repr__(self):
+        return '<AsyncExternal {!r}>'.format(self.external.path)
+
+    # Path
+    @property
+    def name(self):
+        return self.external.name
+
+    @property
+    def path(self):
+        return self.external.path
+
+    @property
+    def path_segments(self):
+        return self.external.path_segments
+
+    def parent(self):
+        return self._wrap(self.external.parent())
+
+    def __truediv__(self, sub_path):
+        return self._wrap(self.external / sub_path)
+
+    async def __aiter__(self):
+        '''Children, listed on the executor in one go'''
+        for child in await self._call(list, self.external):
+            yield self._wrap(child)
+
+    async def children(self):
+        return [self._wrap(child) for child in await self._call(
+            list, self.external)]
+
+    async def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Async iterator over everything below, see `Path.walk`.
+
+        prune is called - on the executor - with (not async) externals.
+        '''
+        iterator = self.external.walk(depth_first, max_depth, prune)
+        while True:
+            batch = await self._call(_take, iterator, WALK_BATCH)
+            if not batch:
+                return
+            for external in batch:
+                yield self._wrap(external)
+
+    # External
+    async def exists(self):
+        return await self._call(self.external.exists)
+
+    async def is_file(self):
+        return await self._call(self.external.is_file)
+
+    async def is_dir(self):
+        return await self._call(self.external.is_dir)
+
+    async def stat(self):
+        return await self._call(self.external.stat)
+
+    async def read(self):
+        '''The content'''
+        return await self._call(_get_content, self.external)
+
+    async def write(self, content):
+        '''Set the content'''
+        await self._call(_set_content, self.external, content)
+
+    async def read_range(self, offset, length):
+        return await self._call(self.external.read_range, offset, length)
+
+    async def delete(self):
+        await self._call(self.external.delete)
+
+    async def make_dirs(self):
+        await self._call(self.external.make_dirs)
+
+    async def copy_to(self, other, max_block_size=1024 ** 2):
+        '''Copy my content to other (External or AsyncExternal),
+        return the number of bytes copied'''
+        if isinstance(other, AsyncExternal):
+            inline = self._inline and other._inline
+            other = other.external
+        else:
+            inline = self._inline and isinstance(other, Memory)
+        if inline:
+            return self.external.copy_to(other, max_block_size)
+        return await self._runner.call(
+            self.external.copy_to, other, max_block_size)
+
+
+def _take(iterator, count):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == count:
+            break
+    return batch
+
+
+def _get_content(external):
+    return external.content
+
+
+def _set_content(external, content):
+    external.content = content
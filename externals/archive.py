@@ -0,0 +1,328 @@
+'''
+Read-only externals on zip and tar archives, without extracting them.
+
+    bundle = ZipArchive('data.zip', index='data.zip.index')
+    for x in bundle / 'images':
+        data = x.content
+
+The members are indexed once, at open time, in a trie - listings and
+`is_file()`/`is_dir()` need no access to the archive.
+Stored (uncompressed) members are read directly from the archive file,
+`read_range` on them reads just the range.
+
+With `index`, the member index is saved in an image file (see
+`Memory.save_image`) and mapped on later opens, as long as the archive
+has the same size and modification time.
+'''
+import collections
+import io
+import os
+import struct
+import tarfile
+import threading
+import time
+import zipfile
+
+from . import HierarchicalExternal, NoContentError
+from .external import Stat, _check_range
+from .image import ImageTrie, write_image
+from .trie import Trie
+
+
+# index contents: data offset, size, mtime, is stored, then the name
+_MEMBER = struct.Struct('<QQdB')
+# content of the index root: size and mtime of the archive
+_ARCHIVE_STAMP = struct.Struct('<Qd')
+# zip local file header: signature ... name length, extra field length
+_ZIP_LOCAL_HEADER = struct.Struct('<4s22xHH')
+
+Member = collections.namedtuple('Member', 'name offset size mtime stored')
+
+
+def _segments(name):
+    return tuple(
+        segment for segment in name.split('/') if segment not in ('', '.'))
+
+
+def _pack(member):
+    return _MEMBER.pack(
+        member.offset, member.size, member.mtime,
+        member.stored) + member.name.encode('utf-8', 'surrogateescape')
+
+
+def _unpack(data):
+    offset, size, mtime, stored = _MEMBER.unpack_from(data)
+    name = bytes(data[_MEMBER.size:]).decode('utf-8', 'surrogateescape')
+    return Member(name, offset, size, mtime, bool(stored))
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return _ARCHIVE_STAMP.pack(stat.st_size, stat.st_mtime)
+
+
+def _scan_zip(path):
+    '''(path segments, Member or None for directories) of a zip archive'''
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            segments = _segments(info.filename)
+            if not segments:
+                continue
+            if info.filename.endswith('/'):
+                yield segments, None
+                continue
+            # the data follows the variable length local header
+            f.seek(info.header_offset)
+            _, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack(
+                f.read(_ZIP_LOCAL_HEADER.size))
+            offset = (
+                info.header_offset + _ZIP_LOCAL_HEADER.size
+                + name_length + extra_length)
+            stored = (
+                info.compress_type == zipfile.ZIP_STORED
+                and not info.flag_bits & 1)  # not encrypted
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            yield segments, Member(
+                info.filename, offset, info.file_size, mtime, stored)
+
+
+def _scan_tar(path):
+    '''(path segments, Member or None for directories) of a tar archive.
+
+    Links, sparse and special files are left out.
+    '''
+    try:
+        archive = tarfile.open(path, 'r:')
+        compressed = False
+    except tarfile.ReadError:
+        archive = tarfile.open(path, 'r:*')
+        compressed = True
+    with archive:
+        for info in archive:
+            segments = _segments(info.name)
+            if not segments:
+                continue
+            if info.isdir():
+                yield segments, None
+            elif info.isreg() and not info.issparse():
+                yield segments, Member(
+                    info.name, info.offset_data, info.size, info.mtime,
+                    not compressed)
+
+
+def _open_zip_member(archive, member):
+    # streams of one ZipFile are independent, also in several threads
+    return archive.shared(zipfile.ZipFile).open(member.name)
+
+
+def _open_tar_member(archive, member):
+    # a decompressing stream of its own, skipped to the member's data:
+    # no position shared with other readers, no lookup by name
+    opened = tarfile.open(archive.path)
+    try:
+        opened.fileobj.seek(member.offset)
+    except BaseException:
+        opened.close()
+        raise
+    return _MemberStream(opened.fileobj, member.size, opened)
+
+
+class _Archive(object):
+
+    '''Member index and open archive, shared by the externals on it'''
+
+    def __init__(self, path, scan, open_member, index=None):
+        self.path = path
+        self._open_member = open_member
+        # see `shared`
+        self._opened = None
+        self._lock = threading.Lock()
+        self.trie = self._cached_index(index)
+        if self.trie is None:
+            self.trie = Trie()
+            self.trie[()] = _stamp(path)
+            for segments, member in scan(path):
+                if member is None:
+                    self.trie.extend(segments)
+                else:
+                    self.trie[segments] = _pack(member)
+            if index is not None:
+                write_image(self.trie, index)
+
+    def _cached_index(self, index):
+        if index is None or not os.path.exists(index):
+            return None
+        try:
+            trie = ImageTrie(index)
+        except ValueError:
+            return None
+        if trie[()] != _stamp(self.path):
+            return None
+        return trie
+
+    def member(self, path_segments):
+        '''Member at path_segments, None for directories and missing ones'''
+        if not path_segments:
+            # the root holds the archive stamp
+            return None
+        try:
+            data = self.trie[path_segments]
+        except KeyError:
+            return None
+        return None if data is None else _unpack(data)
+
+    def open(self, member):
+        if member.stored:
+            f = open(self.path, 'rb')
+            f.seek(member.offset)
+            return _MemberStream(f, member.size)
+        return self._open_member(self, member)
+
+    def shared(self, open_archive):
+        '''open_archive(path), made once and kept until `close`'''
+        with self._lock:
+            if self._opened is None:
+                self._opened = open_archive(self.path)
+            return self._opened
+
+    def close(self):
+        with self._lock:
+            if self._opened is not None:
+                self._opened.close()
+                self._opened = None
+
+
+class _MemberStream(io.RawIOBase):
+
+    '''The size bytes of archive file f from its current position.
+
+    Closing closes owner - f by default.
+    '''
+
+    def __init__(self, f, size, owner=None):
+        self._file = f
+        self._left = size
+        self._owner = f if owner is None else owner
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        target = memoryview(buffer).cast('B')[:self._left]
+        read = self._file.readinto(target)
+        self._left -= read
+        return read
+
+    def close(self):
+        self._owner.close()
+        super(_MemberStream, self).close()
+
+
+class ArchiveExternal(HierarchicalExternal):
+
+    '''Read-only external on a member of an archive'''
+
+    __slots__ = ('_archive',)
+
+    # archive path -> [(path segments, Member or None)]
+    _scan = None
+    # (`_Archive`, not stored Member) -> readable stream
+    _open_member = None
+
+    def __init__(self, archive, index=None, path=None, path_segments=()):
+        '''
+        archive: path of the archive file, or the `_Archive`
+            shared with another external
+        index: file to save the member index in and map it from
+        '''
+        if not isinstance(archive, _Archive):
+            archive = _Archive(archive, self._scan, self._open_member, index)
+        self._archive = archive
+        super(ArchiveExternal, self).__init__(path, path_segments)
+
+    def new(self, path_segments):
+        return self.__class__(self._archive, path_segments=path_segments)
+
+    def _backend_key(self):
+        return self._archive
+
+    def close(self):
+        '''Close the archive, if opened for reading compressed members'''
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        try:
+            children = self._archive.trie.children(self.path_segments)
+        except KeyError:
+            return iter(())
+        return (self / name for name in children)
+
+    def _member(self):
+        member = self._archive.member(self.path_segments)
+        if member is None:
+            raise NoContentError(self.path)
+        return member
+
+    # External implementation
+    def is_file(self):
+        return self._archive.member(self.path_segments) is not None
+
+    def is_dir(self):
+        return self._archive.trie.is_internal(self.path_segments)
+
+    @property
+    def content(self):
+        with self.readable_stream() as stream:
+            return stream.read()
+
+    @content.setter
+    def content(self, value):
+        raise TypeError('archive is read-only')
+
+    def stat(self):
+        member = self._member()
+        return Stat(member.size, member.mtime)
+
+    def readable_stream(self):
+        return self._archive.open(self._member())
+
+    def read_range(self, offset, length):
+        '''Range of the member, read directly for stored members'''
+        _check_range(offset, length)
+        member = self._member()
+        if not member.stored:
+            return super(ArchiveExternal, self).read_range(offset, length)
+        length = max(min(length, member.size - offset), 0)
+        with open(self._archive.path, 'rb') as f:
+            f.seek(member.offset + offset)
+            return f.read(length)
+
+    def writable_stream(self):
+        raise TypeError('archive is read-only')
+
+    def delete(self):
+        raise TypeError('archive is read-only')
+
+
+class ZipArchive(ArchiveExternal):
+
+    __slots__ = ()
+
+    _scan = staticmethod(_scan_zip)
+    _open_member = staticmethod(_open_zip_member)
+
+
+class TarArchive(ArchiveExternal):
+
+    '''Tar archive, compressed ones too - their members are not stored'''
+
+    __slots__ = ()
+
+    _scan = staticmethod(_scan_tar)
+    _open_member = staticmethod(_open_tar_member)
@@ -0,0 +1,269 @@
+'''
+Memory with a budget: contents are evicted when it is exceeded.
+
+    cache = BoundedMemory(max_bytes=64 * 1024 ** 2, policy=LFUPolicy())
+
+A policy decides which content goes first, it is an object with
+- `add(path)`: content was set at path
+- `access(path)`: content at path was read
+- `discard(path)`: content at path is gone
+- `victim(keep)`: path of the content to evict next, other than keep
+  if possible, None if there is none
+- `__len__`, `__contains__`
+'''
+import collections
+import itertools
+
+from .memory import Memory
+from .trie import SizedTrie, _add_totals, nbytes
+
+
+class LRUPolicy(object):
+
+    '''Evict the least recently used content first'''
+
+    def __init__(self):
+        self._order = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, path):
+        return path in self._order
+
+    def add(self, path):
+        self._order[path] = None
+        self._order.move_to_end(path)
+
+    def access(self, path):
+        if path in self._order:
+            self._order.move_to_end(path)
+
+    def discard(self, path):
+        self._order.pop(path, None)
+
+    def victim(self, keep=None):
+        for path in self._order:
+            if path != keep:
+                return path
+        return keep if keep in self._order else None
+
+
+class LFUPolicy(object):
+
+    '''Evict the least frequently used content first.
+
+    Of contents used equally often the least recently used one goes.
+    '''
+
+    def __init__(self):
+        self._counts = {}
+        # use count -> paths used that often, least recently used first
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, path):
+        return path in self._counts
+
+    def add(self, path):
+        if path in self._counts:
+            self.access(path)
+        else:
+            self._counts[path] = 1
+            self._buckets.setdefault(1, collections.OrderedDict())[path] = None
+
+    def access(self, path):
+        count = self._counts.get(path)
+        if count is None:
+            return
+        self._remove_from_bucket(path, count)
+        self._counts[path] = count + 1
+        self._buckets.setdefault(
+            count + 1, collections.OrderedDict())[path] = None
+
+    def discard(self, path):
+        count = self._counts.pop(path, None)
+        if count is not None:
+            self._remove_from_bucket(path, count)
+
+    def victim(self, keep=None):
+        for count in sorted(self._buckets):
+            for path in self._buckets[count]:
+                if path != keep:
+                    return path
+        return keep if keep in self._counts else None
+
+    def _remove_from_bucket(self, path, count):
+        bucket = self._buckets[count]
+        del bucket[path]
+        if not bucket:
+            del self._buckets[count]
+
+
+class BoundedTrie(SizedTrie):
+
+    '''SizedTrie evicting contents when over max_bytes or max_entries.
+
+    Evicted leaves are deleted together with the directories
+    they leave empty.
+    A content bigger than the whole budget is evicted right away.
+    '''
+
+    def __init__(
+            self, max_bytes=None, max_entries=None, policy=None,
+            sizeof=nbytes):
+        super(BoundedTrie, self).__init__(sizeof)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.policy = LRUPolicy() if policy is None else policy
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    @classmethod
+    def from_items(
+            cls, items, max_bytes=None, max_entries=None, policy=None,
+            sizeof=nbytes):
+        trie = cls(max_bytes, max_entries, policy, sizeof)
+        trie.update(items)
+        return trie
+
+    def copy(self):
+        '''Independent trie with my limits, nodes, contents and mtimes.
+
+        Takes O(N). The copy has a new policy of the same class,
+        the contents are added to it in walk order.
+        '''
+        with self._lock:
+            paths = list(itertools.chain([()], self.walk()))
+            nodes = [self._get_node(path) for path in paths]
+            trie = self.__class__(
+                self.max_bytes, self.max_entries, self.policy.__class__(),
+                self._sizeof)
+            trie.update(
+                (path, node.content) for path, node in zip(paths, nodes))
+            for path, node in zip(paths, nodes):
+                trie._get_node(path).mtime = node.mtime
+            return trie
+
+    def __getitem__(self, path):
+        with self._lock:
+            content = super(BoundedTrie, self).__getitem__(path)
+            if content is not None:
+                self.policy.access(tuple(path))
+            return content
+
+    def __setitem__(self, path, content):
+        with self._lock:
+            super(BoundedTrie, self).__setitem__(path, content)
+            path = tuple(path)
+            self._register(path, content)
+            self._evict(keep=path)
+
+    def extend(self, path, contents=itertools.repeat(None)):
+        with self._lock:
+            super(BoundedTrie, self).extend(path, contents)
+            path = tuple(path)
+            for i, node in enumerate(self._spine(path, create=False)):
+                if node.content is not None and path[:i] not in self.policy:
+                    self.policy.add(path[:i])
+            self._evict()
+
+    def update(self, items, prefix=()):
+        prefix = tuple(prefix)
+
+        def registered():
+            for path, content in items:
+                self._register(prefix + tuple(path), content)
+                yield path, content
+
+        with self._lock:
+            super(BoundedTrie, self).update(registered(), prefix)
+            self._evict()
+
+    def delete(self, path):
+        with self._lock:
+            path = tuple(path)
+            self.policy.discard(path)
+            for below in self.walk(path):
+                self.policy.discard(below)
+            super(BoundedTrie, self).delete(path)
+
+    # helpers
+
+    def _register(self, path, content):
+        if content is None:
+            self.policy.discard(path)
+        else:
+            self.policy.add(path)
+
+    def _over_budget(self):
+        root = self._root
+        return (
+            (self.max_bytes is not None and root.size > self.max_bytes)
+            or (self.max_entries is not None
+                and root.count > self.max_entries))
+
+    def _evict(self, keep=None):
+        while self._over_budget():
+            victim = self.policy.victim(keep)
+            if victim is None:
+                return
+            self._remove_content(victim)
+
+    def _remove_content(self, path):
+        self.policy.discard(path)
+        nodes = self._spine(path, create=False)
+        node = nodes[-1]
+        size = self._size(node.content)
+        self.evictions += 1
+        self.evicted_bytes += size
+        if node.children or not path:
+            # a directory with content, only the content goes
+            node.content = None
+            _add_totals(nodes, -size, -1)
+            return
+        depth = len(path)
+        # prune the directories left empty
+        while depth > 1:
+            parent = nodes[depth - 1]
+            if parent.content is not None or len(parent.children) > 1:
+                break
+            depth -= 1
+        super(BoundedTrie, self).delete(path[:depth])
+
+
+class BoundedMemory(Memory):
+
+    '''Memory holding at most max_bytes / max_entries of contents.
+
+    `du()` and `count()` of the root tell the current usage.
+    '''
+
+    __slots__ = ()
+
+    def __init__(
+            self, fs=None, path=None, path_segments=(),
+            max_bytes=None, max_entries=None, policy=None):
+        '''
+        fs: a `BoundedTrie` to share, the limits are taken from it
+        policy: `LRUPolicy()` by default, or `LFUPolicy()`, ...
+        '''
+        if fs is None:
+            fs = BoundedTrie(max_bytes, max_entries, policy)
+        super(BoundedMemory, self).__init__(fs, path, path_segments)
+
+    def snapshot(self):
+        '''Independent copy with the same limits, see `BoundedTrie.copy`'''
+        return self.__class__(
+            self._fs.copy(), path_segments=self.path_segments)
+
+    @property
+    def evictions(self):
+        '''Number of contents evicted so far'''
+        return self._fs.evictions
+
+    @property
+    def evicted_bytes(self):
+        return self._fs.evicted_bytes
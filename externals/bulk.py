@@ -0,0 +1,216 @@
+'''
+Operations on many externals at once.
+'''
+import concurrent.futures
+import threading
+import time
+
+
+# workers -> executor used when none is given, shared by all calls
+_shared_executors = {}
+_shared_executors_lock = threading.Lock()
+
+
+class CopyStats(object):
+
+    '''What `copy_tree` did, and how fast'''
+
+    __slots__ = ('files', 'bytes', 'seconds')
+
+    def __init__(self, files=0, bytes=0, seconds=0.0):
+        self.files = files
+        self.bytes = bytes
+        self.seconds = seconds
+
+    @property
+    def files_per_second(self):
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __repr__(self):
+        return (
+            '<CopyStats {} files, {} bytes in {:.3f} s:'
+            ' {:.1f} files/s, {:.1f} bytes/s>'.format(
+                self.files, self.bytes, self.seconds,
+                self.files_per_second, self.bytes_per_second))
+
+
+def copy_tree(source, destination, workers=8, executor=None):
+    '''Copy source and everything below it to destination.
+
+    Directories are created once, in walk order, before their contents.
+    Files are copied with `copy_to` - so with the fast path for the pair
+    where there is one - on a shared pool of `workers` threads,
+    or on `executor` if given.
+    With `workers` <= 1 and no executor everything happens in this thread.
+
+    Return a `CopyStats`.
+    '''
+    start = time.time()
+    stats = CopyStats()
+
+    def copies():
+        source_depth = len(source.path_segments)
+        destination_segments = destination.path_segments
+        if source.is_dir():
+            destination.make_dirs()
+        if source.is_file():
+            yield source, destination
+        for x in source.walk():
+            target = destination.new(
+                destination_segments + x.path_segments[source_depth:])
+            if x.is_dir():
+                target.make_dirs()
+            if x.is_file():
+                yield x, target
+
+    for copied in _map(_copy, copies(), workers, executor):
+        stats.bytes += copied or 0
+        stats.files += 1
+
+    stats.seconds = time.time() - start
+    return stats
+
+
+def _copy(pair):
+    source, destination = pair
+    return source.copy_to(destination)
+
+
+def read_many(externals, workers=8, executor=None):
+    '''Read the content of many externals.
+
+    All reads are started before returning, on a shared pool of
+    `workers` threads or on `executor`.
+    Return an iterator over (external, content, error) triples in
+    completion order, where exactly one of content and error is None.
+    A failing read does not stop the others.
+    '''
+    return _submit_all(_read, externals, workers, executor)
+
+
+def write_many(contents, workers=8, executor=None):
+    '''Set the content of many externals.
+
+    contents is a mapping or an iterable of (external, content) pairs.
+    Every distinct parent is made once, before the writes below it.
+    All writes are started before returning, on a shared pool of
+    `workers` threads or on `executor`: they happen also when the
+    result is not iterated.
+    Return an iterator over (external, error) pairs in completion order,
+    error is None for successful writes.
+    A failing write does not stop the others.
+    '''
+    if hasattr(contents, 'items'):
+        contents = contents.items()
+    contents = list(contents)
+
+    parent_errors = {}
+    for external, _ in contents:
+        if external.is_root:
+            continue
+        parent = external.parent()
+        if parent not in parent_errors:
+            try:
+                parent.make_dirs()
+                parent_errors[parent] = None
+            except Exception as e:
+                parent_errors[parent] = e
+
+    def writes():
+        for external, content in contents:
+            error = None if external.is_root else parent_errors[
+                external.parent()]
+            yield external, content, error
+
+    return _submit_all(_write, writes(), workers, executor)
+
+
+def _read(external):
+    try:
+        return external, external.content, None
+    except Exception as e:
+        return external, None, e
+
+
+def _write(item):
+    external, content, error = item
+    if error is None:
+        try:
+            external.content = content
+        except Exception as e:
+            error = e
+    return external, error
+
+
+def _shared_executor(workers):
+    '''Pool of workers threads, made once and kept for later calls'''
+    with _shared_executors_lock:
+        executor = _shared_executors.get(workers)
+        if executor is None:
+            executor = _shared_executors[workers] = (
+                concurrent.futures.ThreadPoolExecutor(workers))
+        return executor
+
+
+def _submit_all(function, items, workers, executor):
+    '''Start function(item) for all items now.
+
+    Return an iterator over the results in completion order.
+    With `workers` <= 1 and no executor everything is done in this thread
+    before returning.
+    '''
+    if executor is None and workers <= 1:
+        return iter([function(item) for item in items])
+    if executor is None:
+        executor = _shared_executor(workers)
+    futures = [executor.submit(function, item) for item in items]
+    return (
+        future.result()
+        for future in concurrent.futures.as_completed(futures))
+
+
+def _map(function, items, workers, executor):
+    '''Yield function(item) results in completion order.
+
+    Calls run on a shared pool of `workers` threads, or on `executor`
+    if given. With `workers` <= 1 and no executor everything happens
+    in this thread.
+    '''
+    if executor is None and workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    if executor is None:
+        executor = _shared_executor(workers)
+    for result in _bounded_map(
+            executor, function, items, max(workers, 1) * 4):
+        yield result
+
+
+def _bounded_map(executor, function, items, max_pending):
+    '''Yield function(item) results in completion order.
+
+    At most max_pending calls are submitted at any time, so huge
+    inputs do not turn into as many futures.
+    The first exception is raised after cancelling the pending calls.
+    '''
+    pending = set()
+    try:
+        for item in items:
+            if len(pending) >= max_pending:
+                done, pending = concurrent.futures.wait(
+                    pending,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(function, item))
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
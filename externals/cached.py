@@ -0,0 +1,268 @@
+'''
+Read-through cache in front of another external.
+
+    data = CachedExternal(File('/data'), max_bytes=256 * 1024 ** 2)
+    (data / 'config.json').content  # read from disk
+    (data / 'config.json').content  # served from memory
+
+Cached contents are checked against the `stat()` of the backing
+external (size and modification time) before they are served,
+or - with `ttl` - served without checking for ttl seconds.
+Contents of backing externals without modification times can not be
+checked, they are cached only with `ttl`.
+Writes go to the backing external and drop the cached content.
+'''
+import threading
+import time
+
+from . import HierarchicalExternal, NoContentError
+from .bounded import BoundedMemory, BoundedTrie
+from .external import _check_range
+from .memory import ReadableStream, readonly_view
+
+
+class CacheStats(object):
+
+    '''Counters shared by all externals of a `CachedExternal` tree'''
+
+    __slots__ = ('hits', 'misses', 'bytes_saved', '_lock')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # bytes served from memory instead of the backing external
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def _hit(self, size):
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def __repr__(self):
+        return '<CacheStats {} hits, {} misses, {} bytes saved>'.format(
+            self.hits, self.misses, self.bytes_saved)
+
+
+class _Entry(object):
+
+    '''Cached content with what it was validated against'''
+
+    __slots__ = ('content', 'stat', 'checked')
+
+    def __init__(self, content, stat, checked):
+        self.content = content
+        self.stat = stat
+        # time of the last validation
+        self.checked = checked
+
+    def __len__(self):
+        # size for `BoundedTrie`, see `trie.nbytes`
+        return readonly_view(self.content).nbytes
+
+
+class CachedExternal(HierarchicalExternal):
+
+    __slots__ = ('_backing', '_cache', '_ttl', '_clock', 'stats')
+
+    def __init__(
+            self, backing, cache=None, max_bytes=64 * 1024 ** 2, ttl=None,
+            path=None, path_segments=None, clock=time.time):
+        '''
+        backing: the external to cache, my paths are its paths
+        cache: Memory-like root to keep the cached contents in,
+            a `BoundedMemory` of max_bytes (None: unbounded) by default
+        ttl: seconds a cached content is served without asking the
+            backing external for its `stat()`
+        '''
+        self._backing = backing
+        if cache is None:
+            cache = BoundedMemory(BoundedTrie(max_bytes))
+        self._cache = cache
+        self._ttl = ttl
+        self._clock = clock
+        self.stats = CacheStats()
+        if path is None and path_segments is None:
+            path_segments = backing.path_segments
+        super(CachedExternal, self).__init__(path, path_segments or ())
+
+    def new(self, path_segments):
+        external = self.__class__(
+            self._backing, self._cache, ttl=self._ttl,
+            path_segments=path_segments, clock=self._clock)
+        external.stats = self.stats
+        return external
+
+    def _backend_key(self):
+        return (self._backing, self._cache)
+
+    @property
+    def backing(self):
+        '''The external I cache'''
+        return self._backing.new(self.path_segments)
+
+    def _cached(self):
+        return self._cache.new(self.path_segments)
+
+    def __iter__(self):
+        return (self.new(x.path_segments) for x in self.backing)
+
+    def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Walk of the backing external'''
+        new = self.new
+        return (
+            new(x.path_segments)
+            for x in self.backing.walk(
+                depth_first, max_depth,
+                None if prune is None
+                else (lambda x: prune(new(x.path_segments)))))
+
+    # External implementation
+    def exists(self):
+        return self.backing.exists()
+
+    def is_file(self):
+        return self.backing.is_file()
+
+    def is_dir(self):
+        return self.backing.is_dir()
+
+    def stat(self):
+        return self.backing.stat()
+
+    @property
+    def content(self):
+        '''Content from the cache if it is still valid, read through if not'''
+        entry = self._valid_entry()
+        if entry is not None:
+            self.stats._hit(len(entry))
+            return entry.content
+        backing = self.backing
+        # stat before reading: a change in between shows at the next check
+        stat = backing.stat()
+        content = backing.content
+        if stat.mtime is not None or self._ttl is not None:
+            self._cached().content = _Entry(content, stat, self._clock())
+        return content
+
+    @content.setter
+    def content(self, value):
+        self._invalidate()
+        self.backing.content = value
+        self._invalidate()
+
+    def readable_stream(self):
+        return ReadableStream(readonly_view(self.content))
+
+    def read_range(self, offset, length):
+        '''Range of a cached content, not cached ranges are not cached'''
+        _check_range(offset, length)
+        entry = self._valid_entry()
+        if entry is None:
+            return self.backing.read_range(offset, length)
+        data = readonly_view(entry.content)[offset:offset + length].tobytes()
+        self.stats._hit(len(data))
+        return data
+
+    def readinto_range(self, buffer, offset):
+        _check_range(offset, 0)
+        entry = self._valid_entry()
+        if entry is None:
+            return self.backing.readinto_range(buffer, offset)
+        target = memoryview(buffer).cast('B')
+        data = readonly_view(entry.content)[offset:offset + len(target)]
+        target[:len(data)] = data
+        self.stats._hit(len(data))
+        return len(data)
+
+    def writable_stream(self):
+        self._invalidate()
+        return _Invalidating(self, self.backing.writable_stream())
+
+    def make_dirs(self):
+        self.backing.make_dirs()
+
+    def delete(self):
+        self._invalidate()
+        self.backing.delete()
+
+    def copy_to(self, other, max_block_size=1024 ** 2):
+        entry = self._valid_entry()
+        if entry is None:
+            return self.backing.copy_to(other, max_block_size)
+        view = readonly_view(entry.content)
+        with other.writable_stream() as destination:
+            destination.write(view)
+        self.stats._hit(len(view))
+        return len(view)
+
+    # helpers
+
+    def _valid_entry(self):
+        '''Cached entry if still valid, counting misses.
+
+        Callers count the hit, with the number of bytes they serve.
+        '''
+        cached = self._cached()
+        try:
+            entry = cached.content
+        except NoContentError:
+            entry = None
+        if isinstance(entry, _Entry) and self._is_valid(entry):
+            return entry
+        if entry is not None:
+            cached.delete()
+        self.stats._miss()
+        return None
+
+    def _is_valid(self, entry):
+        now = self._clock()
+        if self._ttl is not None and now - entry.checked <= self._ttl:
+            return True
+        if entry.stat.mtime is None:
+            # same size is no proof of same content
+            return False
+        try:
+            stat = self.backing.stat()
+        except NoContentError:
+            return False
+        if stat != entry.stat:
+            return False
+        entry.checked = now
+        return True
+
+    def _invalidate(self):
+        self._cached().delete()
+
+
+class _Invalidating(object):
+
+    '''Stream forgetting the cached content when closed'''
+
+    def __init__(self, external, stream):
+        self._external = external
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._external._invalidate()
@@ -0,0 +1,343 @@
+'''
+A Trie with a small memory footprint, for trees of millions of paths.
+
+    Memory(fs=CompactTrie())
+
+- path segments are interned: every distinct name is stored once,
+  nodes refer to them by integer id
+- children of a node are kept in a single tuple (sorted ids, then values)
+  while there are few of them, a dict id -> value is used for larger
+  fan-outs
+- leaves need no node object: their content is stored directly in their
+  parent, it is replaced with a node only when a child is added, or -
+  with `CompactTrie(mtimes=True)` - to remember the modification time of
+  content set one by one
+
+Names are never removed from the intern table.
+'''
+import bisect
+import itertools
+import threading
+import time
+
+from .traversal import walk_tree
+
+
+# children above this count are kept in a dict
+MAX_SMALL_FANOUT = 64
+
+_MISSING = object()
+
+
+class CompactNode(object):
+
+    # children: tuple of the sorted name ids followed by the child values
+    # in the same order, or dict of name id -> value for large fan-outs;
+    # always replaced - or a dict changed - in one step, so readers
+    # without the lock never see keys and values that do not belong
+    # together
+    # child values are CompactNodes or contents of leaves
+    __slots__ = ('children', 'content', 'mtime')
+
+    def __init__(self, content, mtime=None):
+        self.children = ()
+        self.content = content
+        self.mtime = mtime
+
+    def get(self, key, default=None):
+        children = self.children
+        if type(children) is dict:
+            return children.get(key, default)
+        size = len(children) // 2
+        i = bisect.bisect_left(children, key, 0, size)
+        if i < size and children[i] == key:
+            return children[size + i]
+        return default
+
+    def set(self, key, value):
+        children = self.children
+        if type(children) is dict:
+            children[key] = value
+            return
+        size = len(children) // 2
+        keys, values = children[:size], children[size:]
+        i = bisect.bisect_left(keys, key)
+        if i < size and keys[i] == key:
+            self.children = keys + values[:i] + (value,) + values[i + 1:]
+        elif size >= MAX_SMALL_FANOUT:
+            children = dict(zip(keys, values))
+            children[key] = value
+            self.children = children
+        else:
+            self.children = (
+                keys[:i] + (key,) + keys[i:]
+                + values[:i] + (value,) + values[i:])
+
+    def remove(self, key):
+        children = self.children
+        if type(children) is dict:
+            del children[key]
+            return
+        size = len(children) // 2
+        i = bisect.bisect_left(children, key, 0, size)
+        if i == size or children[i] != key:
+            raise KeyError(key)
+        self.children = (
+            children[:i] + children[i + 1:size + i]
+            + children[size + i + 1:])
+
+    def keys(self):
+        children = self.children
+        if type(children) is dict:
+            return list(children)
+        return children[:len(children) // 2]
+
+    def items(self):
+        children = self.children
+        if type(children) is dict:
+            return list(children.items())
+        size = len(children) // 2
+        return zip(children[:size], children[size:])
+
+
+def _content(value):
+    return value.content if type(value) is CompactNode else value
+
+
+def _is_internal(value):
+    return type(value) is CompactNode and bool(value.children)
+
+
+class CompactTrie(object):
+
+    '''Drop-in replacement for `trie.Trie`'''
+
+    def __init__(self, mtimes=False):
+        '''
+        mtimes: remember when contents were set by `__setitem__`,
+            costs a node and a float per leaf
+        '''
+        self._mtimes = mtimes
+        self._root = CompactNode(None)
+        self._ids = {}
+        self._names = []
+        # mutations rebuild tuples, they must not interleave,
+        # readers need no lock
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_items(cls, items, mtimes=False):
+        '''New trie from (path, content) pairs, see `Trie.update`'''
+        trie = cls(mtimes)
+        trie.update(items)
+        return trie
+
+    def __setitem__(self, path, content):
+        if path:
+            contents = itertools.chain(
+                itertools.repeat(None, len(path) - 1), (content,))
+            self._extend(path, contents, set_last=True)
+        else:
+            self._root.content = content
+            self._root.mtime = self._now()
+
+    def __getitem__(self, path):
+        return _content(self._get(path))
+
+    def mtime(self, path):
+        '''Time content at path was set, see `Trie.mtime`.
+
+        Always None without `mtimes=True`.
+        '''
+        value = self._get(path)
+        return value.mtime if type(value) is CompactNode else None
+
+    def is_internal(self, path):
+        try:
+            return _is_internal(self._get(path))
+        except KeyError:
+            return False
+
+    def has_content(self, path):
+        try:
+            return _content(self._get(path)) is not None
+        except KeyError:
+            return False
+
+    def last(self, path):
+        '''Content of last existing node on path'''
+        ids = self._ids
+        value = self._root
+        for name in path:
+            key = ids.get(name)
+            if key is None or type(value) is not CompactNode:
+                break
+            child = value.get(key, _MISSING)
+            if child is _MISSING:
+                break
+            value = child
+        return _content(value)
+
+    def children(self, path):
+        value = self._get(path)
+        if type(value) is not CompactNode:
+            return ()
+        names = self._names
+        return [names[key] for key in value.keys()]
+
+    def walk(self, path=(), depth_first=True, max_depth=None, prune=None):
+        '''Iterate over the paths of all nodes below path.
+
+        prune is called with paths of internal nodes,
+        see `traversal.walk_tree` for the rest of the parameters.
+        '''
+        try:
+            root = (tuple(path), self._get(path))
+        except KeyError:
+            return iter(())
+
+        names = self._names
+
+        def child_items(item):
+            path, node = item
+            if type(node) is not CompactNode:
+                return ()
+            return (
+                (path + (names[key],), child)
+                for key, child in node.items())
+
+        return (
+            item[0]
+            for item in walk_tree(
+                root, child_items, _item_is_internal,
+                depth_first, max_depth,
+                None if prune is None else (lambda item: prune(item[0]))))
+
+    def extend(self, path, contents=itertools.repeat(None)):
+        '''Add missing nodes along path, see `Trie.extend`'''
+        self._extend(path, contents, set_last=False)
+
+    def update(self, items, prefix=()):
+        '''Set contents from (path, content) pairs, see `Trie.update`'''
+        intern = self._intern
+        directory = self._directory
+        names = []
+        with self._lock:
+            node = self._root
+            for name in prefix:
+                node = directory(node, name)
+            nodes = [node]
+            for path, content in items:
+                if not path:
+                    nodes[0].content = content
+                    continue
+                directories = len(path) - 1
+                common = 0
+                for name in names:
+                    if common == directories or name != path[common]:
+                        del names[common:]
+                        del nodes[common + 1:]
+                        break
+                    common += 1
+
+                node = nodes[-1]
+                for i in range(common, directories):
+                    node = directory(node, path[i])
+                    names.append(path[i])
+                    nodes.append(node)
+                key = intern(path[-1])
+                child = node.get(key, _MISSING)
+                if type(child) is CompactNode:
+                    child.content = content
+                    child.mtime = None
+                else:
+                    node.set(key, content)
+
+    def delete(self, path):
+        with self._lock:
+            if not path:
+                self._root = CompactNode(None)
+                return
+            parent = self._get(path[:-1])
+            key = self._ids.get(path[-1])
+            if (
+                    key is None
+                    or type(parent) is not CompactNode
+                    or parent.get(key, _MISSING) is _MISSING):
+                raise KeyError(path)
+            parent.remove(key)
+
+    # helpers
+
+    def _get(self, path):
+        '''Node or leaf content at path'''
+        ids = self._ids
+        value = self._root
+        for name in path:
+            key = ids.get(name)
+            if key is None or type(value) is not CompactNode:
+                raise KeyError(path)
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(path)
+        return value
+
+    def _directory(self, node, name):
+        '''Child node of node, created or promoted from a leaf if needed'''
+        key = self._intern(name)
+        child = node.get(key, _MISSING)
+        if child is _MISSING:
+            child = CompactNode(None)
+            node.set(key, child)
+        elif type(child) is not CompactNode:
+            child = CompactNode(child)
+            node.set(key, child)
+        return child
+
+    def _now(self):
+        return time.time() if self._mtimes else None
+
+    def _intern(self, name):
+        key = self._ids.get(name)
+        if key is None:
+            key = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return key
+
+    def _extend(self, path, contents, set_last):
+        icontents = iter(contents)
+        last = len(path) - 1
+        with self._lock:
+            node = self._root
+            for i, name in enumerate(path):
+                try:
+                    content = next(icontents)
+                except StopIteration:
+                    raise ValueError
+                key = self._intern(name)
+                child = node.get(key, _MISSING)
+                if i == last:
+                    if set_last:
+                        mtime = self._now()
+                        if type(child) is CompactNode:
+                            child.content = content
+                            child.mtime = mtime
+                        elif mtime is None:
+                            node.set(key, content)
+                        else:
+                            node.set(key, CompactNode(content, mtime))
+                    elif child is _MISSING:
+                        node.set(key, content)
+                    return
+                if child is _MISSING:
+                    child = CompactNode(content)
+                    node.set(key, child)
+                elif type(child) is not CompactNode:
+                    # leaf getting a child
+                    child = CompactNode(child)
+                    node.set(key, child)
+                node = child
+
+
+def _item_is_internal(item):
+    return _is_internal(item[1])
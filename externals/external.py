@@ -10,6 +10,8 @@ XML DOM - not really external, yet tree-like with content
 '''
 from abc import ABCMeta, abstractmethod, abstractproperty
 
+from .traversal import walk_tree
+
 
 class NoParentError(LookupError):
     pass
@@ -20,9 +22,40 @@ class NoContentError(LookupError):
     # raised for .content and .readable_stream
 
 
+class Stat(object):
+
+    '''Metadata of an external with content'''
+
+    __slots__ = ('size', 'mtime')
+
+    def __init__(self, size, mtime=None):
+        self.size = size
+        # seconds since the epoch, None when not known
+        self.mtime = mtime
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Stat)
+            and (self.size, self.mtime) == (other.size, other.mtime))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<Stat size={} mtime={}>'.format(self.size, self.mtime)
+
+
 class Path(object):
 
+    '''
+    Paths are equal (and hash the same) if they are of the same class,
+    have the same segments and the same backend (see `_backend_key()`).
+    '''
+
     __metaclass__ = ABCMeta
+    __slots__ = ('path_segments', '_path')
     PATH_SEPARATOR = '/'
     ROOT = PATH_SEPARATOR
 
@@ -35,6 +68,24 @@ class Path(object):
             for segment in path_segments
             if segment
         )
+        self._path = None
+
+    def _backend_key(self):
+        '''What identifies the world I am a path in, besides my class'''
+        return None
+
+    def __eq__(self, other):
+        return (
+            self.__class__ is other.__class__
+            and self.path_segments == other.path_segments
+            and self._backend_key() == other._backend_key())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(
+            (self.__class__, self.path_segments, self._backend_key()))
 
     def new(self, path_segments):
         '''
@@ -56,7 +107,11 @@ class Path(object):
     @property
     def path(self):
         '''Path to me as a string'''
-        return self.ROOT + self.PATH_SEPARATOR.join(self.path_segments)
+        path = self._path
+        if path is None:
+            path = self._path = (
+                self.ROOT + self.PATH_SEPARATOR.join(self.path_segments))
+        return path
 
     def parse_path(self, path):
         '''Return path segments
@@ -92,15 +147,31 @@ class Path(object):
     def children(self):
         return list(self)
 
+    def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Iterate lazily over everything below me.
+
+        depth_first: pre-order depth first when true, breadth first otherwise
+        max_depth: go at most this many levels deep (1: children only)
+        prune: called with directories, the contents of those it returns
+               true for are not visited
+        '''
+        return walk_tree(
+            self, iter, _is_dir, depth_first, max_depth, prune)
+
     @abstractmethod
     def __iter__(self):  # pragma: no cover
         ''' Iterator over children '''
         pass
 
 
+def _is_dir(external):
+    return external.is_dir()
+
+
 class External(object):
 
     __metaclass__ = ABCMeta
+    __slots__ = ()
 
     def exists(self):
         return self.is_dir() or self.is_file()
@@ -129,19 +200,121 @@ class External(object):
     def delete(self):  # pragma: no cover
         pass
 
+    def make_dirs(self):
+        '''Make sure I can have children.
+
+        Backends where directories exist only by having children
+        have nothing to do.
+        '''
+
     def copy_to(self, other, max_block_size=1024 ** 2):
+        '''Copy my content to `other`, return the number of bytes copied.
+
+        Backends override this with faster paths for the pairs they know.
+        '''
         with self.readable_stream() as source:
             with other.writable_stream() as destination:
-                while True:
-                    try:
-                        block = source.read(max_block_size)
-                    except EOFError:
-                        break
-                    if not block:
-                        break
-                    destination.write(block)
+                return copy_stream(source, destination, max_block_size)
+
+    def stat(self):
+        '''`Stat` of my content, NoContentError if I have none.
+
+        Backends override this to avoid reading the content.
+        '''
+        return Stat(len(self.content))
+
+    def read_range(self, offset, length):
+        '''At most length bytes of content, starting at offset.
+
+        Fewer bytes are returned only at the end of the content.
+        '''
+        _check_range(offset, length)
+        with self.readable_stream() as stream:
+            _skip(stream, offset)
+            return _read_fully(stream, length)
+
+    def readinto_range(self, buffer, offset):
+        '''Fill buffer with content starting at offset.
+
+        Return the number of bytes read, less than the buffer size
+        only at the end of the content.
+        '''
+        target = memoryview(buffer).cast('B')
+        data = self.read_range(offset, len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+def _check_range(offset, length):
+    if offset < 0 or length < 0:
+        raise ValueError(
+            'invalid range: offset={}, length={}'.format(offset, length))
+
+
+def _skip(stream, offset):
+    seekable = getattr(stream, 'seekable', None)
+    if seekable is not None and seekable():
+        stream.seek(offset)
+        return
+    while offset > 0:
+        skipped = len(stream.read(min(offset, 1024 ** 2)))
+        if not skipped:
+            return
+        offset -= skipped
+
+
+def _read_fully(stream, length):
+    blocks = []
+    while length > 0:
+        block = stream.read(length)
+        if not block:
+            break
+        blocks.append(block)
+        length -= len(block)
+    return b''.join(blocks)
+
+
+def copy_stream(source, destination, max_block_size=1024 ** 2):
+    '''Copy all data from `source` to `destination` stream.
+
+    Streams supporting `readinto` are copied through a single, reused
+    buffer, others block by block with `read`.
+    Return the number of bytes copied.
+    '''
+    readinto = getattr(source, 'readinto', None)
+    if readinto is None:
+        return _copy_blocks(source, destination, max_block_size)
+
+    buffer = bytearray(max_block_size)
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        try:
+            size = readinto(buffer)
+        except EOFError:
+            break
+        if not size:
+            break
+        destination.write(view[:size])
+        copied += size
+    return copied
+
+
+def _copy_blocks(source, destination, max_block_size):
+    copied = 0
+    while True:
+        try:
+            block = source.read(max_block_size)
+        except EOFError:
+            break
+        if not block:
+            break
+        destination.write(block)
+        copied += len(block)
+    return copied
 
 
 class HierarchicalExternal(Path, External):
 
     __metaclass__ = ABCMeta
+    __slots__ = ()
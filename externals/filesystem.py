@@ -1,31 +1,141 @@
+import collections
+import errno
+import io
 import os
 import shutil
+import stat
+import threading
 
-from . import HierarchicalExternal, NoContentError
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from . import HierarchicalExternal, NoContentError, Memory
+from .external import Stat, copy_stream, _check_range
+from .traversal import walk_tree
+
+
+# ioctl request number for cloning a whole file (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+# errors meaning: this kernel/filesystem can not do it, try another way
+_UNSUPPORTED = frozenset(
+    getattr(errno, name)
+    for name in (
+        'EINVAL', 'ENOSYS', 'ENOTSUP', 'EOPNOTSUPP', 'EXDEV', 'ENOTTY',
+        'EBADF', 'EPERM')
+    if hasattr(errno, name))
 
 
 class File(HierarchicalExternal):
 
+    __slots__ = ('_stat_cache', '_resolve', '_entry')
     PATH_SEPARATOR = os.path.sep
 
+    def __init__(
+            self, path=None, path_segments=(), stat_cache=None,
+            resolve=None):
+        '''
+        stat_cache: optional `statcache.StatCache`, shared by all Files
+            derived from this one, answering `exists()`, `is_file()`,
+            `is_dir()`
+        resolve: makes path strings canonical, also for paths with
+            `.` or `..` given to `/` on derived Files.
+            `os.path.realpath` by default, `lexical_path` does not touch
+            the disk, a `RealpathCache` remembers realpath results.
+        '''
+        self._stat_cache = stat_cache
+        self._resolve = resolve
+        # os.DirEntry, when created by listing the parent directory
+        self._entry = None
+        super(File, self).__init__(path, path_segments)
+
+    def new(self, path_segments):
+        return self.__class__(
+            path_segments=path_segments, stat_cache=self._stat_cache,
+            resolve=self._resolve)
+
     # Path implementation
     def parse_path(self, path):
-        return super(File, self).parse_path(os.path.realpath(path))
+        resolve = self._resolve or os.path.realpath
+        return super(File, self).parse_path(resolve(path))
+
+    def __div__(self, sub_path):
+        segments = sub_path.split(self.PATH_SEPARATOR)
+        if '.' in segments or '..' in segments:
+            return self.__class__(
+                self.path + self.PATH_SEPARATOR + sub_path,
+                stat_cache=self._stat_cache, resolve=self._resolve)
+        return super(File, self).__div__(sub_path)
 
     def __iter__(self):
-        for name in os.listdir(self.path):
-            yield self / name
+        '''Iterator over children.
+
+        Children remember the type information seen while listing,
+        so `is_file()`, `is_dir()` and `exists()` on them need no `stat`,
+        they report the state of the directory at the time of listing.
+        '''
+        scandir = getattr(os, 'scandir', None)
+        if scandir is None:  # pragma: no cover
+            for name in os.listdir(self.path):
+                yield self / name
+            return
+
+        parent_segments = self.path_segments
+        iterator = scandir(self.path)
+        try:
+            for entry in iterator:
+                child = self.new(parent_segments + (entry.name,))
+                child._entry = entry
+                yield child
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Iterate lazily over everything below me.
+
+        Directories are listed with `os.scandir`, symbolic links to
+        directories are not followed.
+        '''
+        return walk_tree(
+            self, iter, _is_real_dir, depth_first, max_depth, prune)
 
     # External implementation
     def exists(self):
+        entry = self._entry
+        if entry is not None and not entry.is_symlink():
+            return True
+        if self._stat_cache is not None:
+            return self._stat_cache.stat(self.path) is not None
         return os.path.exists(self.path)
 
     def is_file(self):
+        entry = self._entry
+        if entry is not None:
+            return entry.is_file()
+        if self._stat_cache is not None:
+            return self._has_mode(stat.S_ISREG)
         return os.path.isfile(self.path)
 
     def is_dir(self):
+        entry = self._entry
+        if entry is not None:
+            return entry.is_dir()
+        if self._stat_cache is not None:
+            return self._has_mode(stat.S_ISDIR)
         return os.path.isdir(self.path)
 
+    def _has_mode(self, is_mode):
+        result = self._stat_cache.stat(self.path)
+        return result is not None and is_mode(result.st_mode)
+
+    def _invalidate(self, path, recursive=True):
+        if self._stat_cache is not None:
+            self._stat_cache.invalidate(path, recursive)
+
     @property
     def content(self):
         'read/write property for accessing the content of "files"'
@@ -37,21 +147,316 @@ class File(HierarchicalExternal):
         with self.writable_stream() as f:
             f.write(value)
 
+    def stat(self):
+        '''Size and modification time of the file.
+
+        Children from listing a directory use the stat result
+        cached on their directory entry.
+        '''
+        entry = self._entry
+        if entry is not None:
+            try:
+                result = entry.stat()
+            except OSError:
+                result = None
+        elif self._stat_cache is not None:
+            result = self._stat_cache.stat(self.path)
+        else:
+            try:
+                result = os.stat(self.path)
+            except OSError:
+                result = None
+        if result is None or not stat.S_ISREG(result.st_mode):
+            raise NoContentError(self.path)
+        return Stat(result.st_size, result.st_mtime)
+
     def readable_stream(self):
         try:
             return open(self.path, 'rb')
         except IOError:
             raise NoContentError(self.path)
 
+    def read_range(self, offset, length):
+        '''At most length bytes from offset, read with `os.pread`'''
+        if not hasattr(os, 'pread'):  # pragma: no cover
+            return super(File, self).read_range(offset, length)
+        _check_range(offset, length)
+        fd = self._open_for_reading()
+        try:
+            blocks = []
+            while length > 0:
+                block = _no_content_on_dir(os.pread, fd, length, offset)
+                if not block:
+                    break
+                blocks.append(block)
+                offset += len(block)
+                length -= len(block)
+            return blocks[0] if len(blocks) == 1 else b''.join(blocks)
+        finally:
+            os.close(fd)
+
+    def readinto_range(self, buffer, offset):
+        '''Fill buffer from offset directly, with `os.preadv`'''
+        if not hasattr(os, 'preadv'):  # pragma: no cover
+            return super(File, self).readinto_range(buffer, offset)
+        _check_range(offset, 0)
+        target = memoryview(buffer).cast('B')
+        fd = self._open_for_reading()
+        try:
+            filled = 0
+            while filled < len(target):
+                read = _no_content_on_dir(
+                    os.preadv, fd, [target[filled:]], offset + filled)
+                if not read:
+                    break
+                filled += read
+            return filled
+        finally:
+            os.close(fd)
+
+    def _open_for_reading(self):
+        flags = os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)
+        try:
+            return os.open(self.path, flags)
+        except OSError:
+            raise NoContentError(self.path)
+
     def writable_stream(self):
+        self._entry = None
         parent, tail = os.path.split(self.path)
-        if not os.path.exists(parent):
-            os.makedirs(parent)
+        try:
+            stream = open(self.path, 'wb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            self._make_dirs(parent)
+            stream = open(self.path, 'wb')
+        self._invalidate(parent, recursive=False)
+        self._invalidate(self.path, recursive=False)
+        return stream
 
-        return open(self.path, 'wb')
+    def make_dirs(self):
+        if not self.is_dir():
+            self._entry = None
+            self._make_dirs(self.path)
+
+    def _make_dirs(self, path):
+        created = path
+        while not os.path.exists(os.path.dirname(created)):
+            created = os.path.dirname(created)
+        try:
+            os.makedirs(path)
+        except OSError:
+            # someone else might have been faster
+            if not os.path.isdir(path):
+                raise
+        self._invalidate(created)
+        self._invalidate(os.path.dirname(created), recursive=False)
 
     def delete(self):
-        shutil.rmtree(self.path)
+        self._entry = None
+        try:
+            shutil.rmtree(self.path)
+        finally:
+            self._invalidate(self.path)
+            self._invalidate(os.path.dirname(self.path), recursive=False)
+
+    def copy_to(self, other, max_block_size=1024 ** 2):
+        '''Copy my content to `other`, return the number of bytes copied.
+
+        File to File copies are done by the kernel where possible,
+        File to Memory reads into a single buffer of the file's size,
+        which becomes the content: a bytearray, as for `writable_stream`.
+        '''
+        if isinstance(other, File):
+            with self.readable_stream() as source:
+                with other.writable_stream() as destination:
+                    return copy_file(source, destination, max_block_size)
+
+        if isinstance(other, Memory):
+            with self.readable_stream() as source:
+                buffer = read_into_buffer(source)
+                if buffer is not None:
+                    other.content = buffer
+                    return len(buffer)
+                with other.writable_stream() as destination:
+                    return copy_stream(source, destination, max_block_size)
+
+        return super(File, self).copy_to(other, max_block_size)
+
+
+def _no_content_on_dir(pread, fd, *args):
+    try:
+        return pread(fd, *args)
+    except OSError as e:
+        if e.errno == errno.EISDIR:
+            raise NoContentError
+        raise
+
+
+def _is_real_dir(file):
+    entry = file._entry
+    if entry is not None:
+        return entry.is_dir(follow_symlinks=False)
+    return file.is_dir() and not os.path.islink(file.path)
+
+
+def _fileno(stream):
+    try:
+        return stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+def read_into_buffer(source):
+    '''Read the whole of an open file into a buffer allocated just once.
+
+    Return None, if `source` is not backed by a real file.
+    '''
+    fileno = _fileno(source)
+    if fileno is None:
+        return None
+
+    size = os.fstat(fileno).st_size
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    filled = 0
+    while filled < size:
+        read = source.readinto(view[filled:])
+        if not read:
+            # the file has shrunk meanwhile
+            del view
+            del buffer[filled:]
+            return buffer
+        filled += read
+    rest = source.read()
+    if rest:
+        # the file has grown meanwhile
+        del view
+        buffer += rest
+    return buffer
+
+
+def copy_file(source, destination, max_block_size=1024 ** 2):
+    '''Copy between two open files, preferably without user space copies.
+
+    Tries in order: reflink clone, `copy_file_range`, `sendfile`,
+    then falls back to copying through a reused buffer.
+    Return the number of bytes copied.
+    '''
+    source_fd = _fileno(source)
+    destination_fd = _fileno(destination)
+    if source_fd is not None and destination_fd is not None:
+        destination.flush()
+        for kernel_copy in (_clone, _copy_file_range, _sendfile):
+            copied = kernel_copy(source_fd, destination_fd)
+            if copied is not None:
+                return copied
+    return copy_stream(source, destination, max_block_size)
+
+
+def _clone(source_fd, destination_fd):
+    if fcntl is None:  # pragma: no cover
+        return None
+    try:
+        fcntl.ioctl(destination_fd, FICLONE, source_fd)
+    except (IOError, OSError) as e:
+        if e.errno in _UNSUPPORTED:
+            return None
+        raise
+    size = os.fstat(source_fd).st_size
+    os.lseek(destination_fd, size, os.SEEK_SET)
+    return size
+
+
+def _kernel_copy(
+        copy_chunk, source_fd, destination_fd, trust_first_eof=True):
+    '''Drive `copy_chunk(count)` until EOF.
+
+    Return None if the very first call is not supported, or - without
+    trust_first_eof - copies nothing.
+    '''
+    chunk = max(os.fstat(source_fd).st_size, 1024 ** 2)
+    copied = 0
+    while True:
+        try:
+            size = copy_chunk(copied, chunk)
+        except OSError as e:
+            if copied == 0 and e.errno in _UNSUPPORTED:
+                return None
+            raise
+        if not size:
+            if copied == 0 and not trust_first_eof:
+                return None
+            return copied
+        copied += size
+
+
+def _copy_file_range(source_fd, destination_fd):
+    if not hasattr(os, 'copy_file_range'):  # pragma: no cover
+        return None
+
+    def copy_chunk(offset, count):
+        return os.copy_file_range(source_fd, destination_fd, count)
+    # some kernels copy nothing from pseudo-files (procfs, sysfs)
+    # reporting size 0, without an error: let the others try
+    return _kernel_copy(
+        copy_chunk, source_fd, destination_fd, trust_first_eof=False)
+
+
+def _sendfile(source_fd, destination_fd):
+    if not hasattr(os, 'sendfile'):  # pragma: no cover
+        return None
+
+    def copy_chunk(offset, count):
+        return os.sendfile(destination_fd, source_fd, offset, count)
+    return _kernel_copy(copy_chunk, source_fd, destination_fd)
+
+
+def lexical_path(path):
+    '''Absolute path with `.` and `..` resolved by text only.
+
+    Symbolic links are not looked at: `link/..` is the directory
+    containing `link`, not the parent of its target.
+    '''
+    return os.path.abspath(path)
+
+
+class RealpathCache(object):
+
+    '''`os.path.realpath` remembering the last `maxsize` results.
+
+    Changes of symbolic links after a path is first resolved
+    are not noticed.
+    '''
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict()
+
+    def __call__(self, path):
+        # relative paths depend on the current directory
+        key = path if os.path.isabs(path) else (os.getcwd(), path)
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = os.path.realpath(path)
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
 
 
 def working_directory():
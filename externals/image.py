@@ -0,0 +1,264 @@
+'''
+A Memory tree saved in a single file, used through `mmap` without loading.
+
+    Memory(...).save_image('tree.img')
+    tree = Memory.open_image('tree.img')
+
+Opening takes constant time, lookups read the index from the mapping,
+contents are read-only memoryviews into it - pages are loaded on first
+use and shared by all processes mapping the same file.
+
+Layout (little endian):
+- header: magic, node count, offsets of the node table, the names
+  and the contents
+- node table: fixed size records in breadth first order, so the children
+  of a node are consecutive and sorted by name (binary search):
+  name offset, name length, first child, child count, has content,
+  content offset, content length, mtime (NaN when not known)
+- names: utf-8 path segments
+- contents
+'''
+import math
+import mmap
+import os
+import struct
+import tempfile
+
+from .traversal import walk_tree
+
+
+MAGIC = b'EXTIMG01'
+_HEADER = struct.Struct('<8sQQQQ')
+_NODE = struct.Struct('<QIIIIQQd')
+_NO_MTIME = float('nan')
+
+
+def _read_umask():
+    # it can only be read by setting it, done once: not safe with threads
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_UMASK = _read_umask()
+
+
+def _encode(name):
+    return name.encode('utf-8', 'surrogateescape')
+
+
+def _decode(name):
+    return name.decode('utf-8', 'surrogateescape')
+
+
+def write_image(trie, path, prefix=()):
+    '''Save the part of trie below prefix to file path.
+
+    The file is replaced in one step, readers of the old image
+    keep seeing it.
+    '''
+    mtime = getattr(trie, 'mtime', None)
+    # breadth first: (encoded name, content view or None, mtime)
+    nodes = []
+    # index of the first child of each node
+    first_children = []
+    queue = [(tuple(prefix), b'')]
+    while len(nodes) < len(queue):
+        node_path, name = queue[len(nodes)]
+        content = trie[node_path]
+        view = None if content is None else memoryview(content).cast('B')
+        node_mtime = None if mtime is None else mtime(node_path)
+        nodes.append((name, view, node_mtime))
+        first_children.append(len(queue))
+        children = sorted(
+            (_encode(child), child) for child in trie.children(node_path))
+        queue.extend(
+            (node_path + (child,), encoded) for encoded, child in children)
+    # children are queued in node order: the next node's first child
+    # ends my range
+    ends = first_children[1:] + [len(queue)]
+    child_counts = [end - start for start, end in zip(first_children, ends)]
+
+    nodes_offset = _HEADER.size
+    names_offset = nodes_offset + _NODE.size * len(nodes)
+    names_size = sum(len(name) for name, _, _ in nodes)
+    contents_offset = names_offset + names_size
+
+    # a unique name next to path: writers do not clash, the rename
+    # does not cross file systems
+    fd, temp_path = tempfile.mkstemp(
+        prefix='.image-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(
+                MAGIC, len(nodes), nodes_offset, names_offset,
+                contents_offset))
+            name_offset = 0
+            content_offset = 0
+            for i, (name, view, node_mtime) in enumerate(nodes):
+                f.write(_NODE.pack(
+                    name_offset, len(name), first_children[i], child_counts[i],
+                    view is not None,
+                    content_offset, 0 if view is None else view.nbytes,
+                    _NO_MTIME if node_mtime is None else node_mtime))
+                name_offset += len(name)
+                if view is not None:
+                    content_offset += view.nbytes
+            for name, _, _ in nodes:
+                f.write(name)
+            for _, view, _ in nodes:
+                if view is not None:
+                    f.write(view)
+        # mkstemp makes the file private
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class ImageTrie(object):
+
+    '''Read-only trie on a file written by `write_image`.
+
+    The file is closed once mapped, `close` unmaps it.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        (magic, self._node_count, self._nodes_offset, self._names_offset,
+         self._contents_offset) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('not an image: {!r}'.format(path))
+
+    def close(self):
+        '''Unmap the file, contents read from me must be released first.
+
+        Raises BufferError while any of them is still referenced,
+        I stay usable then.
+        '''
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            self._view = memoryview(self._map)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _node(self, index):
+        return _NODE.unpack_from(
+            self._map, self._nodes_offset + index * _NODE.size)
+
+    def _name(self, node):
+        start = self._names_offset + node[0]
+        return self._map[start:start + node[1]]
+
+    def _find(self, path):
+        '''Index and record of the node at path'''
+        index = 0
+        node = self._node(index)
+        for name in path:
+            index = self._find_child(node, _encode(name))
+            if index is None:
+                raise KeyError(path)
+            node = self._node(index)
+        return index, node
+
+    def _find_child(self, node, name):
+        low = node[2]
+        high = low + node[3]
+        while low < high:
+            middle = (low + high) // 2
+            middle_name = self._name(self._node(middle))
+            if middle_name < name:
+                low = middle + 1
+            elif middle_name > name:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _content(self, node):
+        if not node[4]:
+            return None
+        start = self._contents_offset + node[5]
+        return self._view[start:start + node[6]]
+
+    def __getitem__(self, path):
+        '''Content at path, a read-only memoryview into the image'''
+        return self._content(self._find(path)[1])
+
+    def mtime(self, path):
+        mtime = self._find(path)[1][7]
+        return None if math.isnan(mtime) else mtime
+
+    def is_internal(self, path):
+        try:
+            return self._find(path)[1][3] > 0
+        except KeyError:
+            return False
+
+    def has_content(self, path):
+        try:
+            return bool(self._find(path)[1][4])
+        except KeyError:
+            return False
+
+    def last(self, path):
+        '''Content of last existing node on path'''
+        node = self._node(0)
+        for name in path:
+            index = self._find_child(node, _encode(name))
+            if index is None:
+                break
+            node = self._node(index)
+        return self._content(node)
+
+    def children(self, path):
+        node = self._find(path)[1]
+        return [
+            _decode(self._name(self._node(index)))
+            for index in range(node[2], node[2] + node[3])]
+
+    def walk(self, path=(), depth_first=True, max_depth=None, prune=None):
+        '''Iterate over the paths of all nodes below path, see `Trie.walk`'''
+        try:
+            root = (tuple(path), self._find(path)[1])
+        except KeyError:
+            return iter(())
+
+        def child_items(item):
+            path, node = item
+            for index in range(node[2], node[2] + node[3]):
+                child = self._node(index)
+                yield path + (_decode(self._name(child)),), child
+
+        return (
+            item[0]
+            for item in walk_tree(
+                root, child_items, _item_is_internal, depth_first, max_depth,
+                None if prune is None else (lambda item: prune(item[0]))))
+
+    def __setitem__(self, path, content):
+        raise TypeError('image is read-only')
+
+    def extend(self, path, contents=None):
+        raise TypeError('image is read-only')
+
+    def update(self, items, prefix=()):
+        raise TypeError('image is read-only')
+
+    def delete(self, path):
+        raise TypeError('image is read-only')
+
+
+def _item_is_internal(item):
+    return item[1][3] > 0
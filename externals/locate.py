@@ -36,3 +36,67 @@ def locate(external, name):
             parent = parent.parent()
     except NoParentError:
         raise NotFoundError
+
+
+def locate_many(external, names, cache=None):
+    ''' `locate` for several names at once.
+
+    The parents of :external: are visited only once, each of them is
+    listed at most once and the listing answers all the plain names.
+    Names containing a path separator are checked with `exists()`,
+    as are all names in directories that can not be listed (search-only
+    permission).
+
+    Return a dict of name -> located external, names not found are left out.
+
+    :cache: optional dict shared between calls, mapping directories to
+    the names of their existing children.  Calls from sibling directories
+    find their common parents there without listing them again.
+    The cache is not invalidated, it is for trees not changing meanwhile.
+    '''
+    separator = external.PATH_SEPARATOR
+    remaining = list(names)
+    located = {}
+    directory = external
+    while remaining:
+        child_names = None
+        listed = False
+        for name in list(remaining):
+            if not listed and separator not in name:
+                child_names = _child_names(directory, cache)
+                listed = True
+            if child_names is None or separator in name:
+                exists = (directory / name).exists()
+            else:
+                exists = name in child_names
+            if exists:
+                located[name] = directory / name
+                remaining.remove(name)
+
+        try:
+            directory = directory.parent()
+        except NoParentError:
+            break
+    return located
+
+
+def _child_names(directory, cache):
+    '''Names of the existing children, None if directory can not be listed'''
+    if cache is not None:
+        try:
+            return cache[directory]
+        except KeyError:
+            pass
+
+    if directory.is_dir():
+        try:
+            names = frozenset(
+                child.name for child in directory if child.exists())
+        except OSError:
+            return None
+    else:
+        names = frozenset()
+
+    if cache is not None:
+        cache[directory] = names
+    return names
@@ -34,6 +34,29 @@ class Mask(Trie):
         last, remaining = self._get_last_and_missing(path)
         return self._covered(last, remaining)
 
+    def uncovered(self, path, names):
+        '''Those of names, that are not covered as children of path.
+
+        Equivalent to filtering with `covered(path + (name,))`,
+        but walks the mask only once.
+        '''
+        last, remaining = self._get_last_and_missing(path)
+        if remaining:
+            if last.content == TRANSPARENT:
+                for name in names:
+                    yield name
+            return
+
+        children = last.children or {}
+        missing_covered = last.content != TRANSPARENT
+        for name in names:
+            child = children.get(name)
+            if child is None:
+                if not missing_covered:
+                    yield name
+            elif child.content != OPAQUE:
+                yield name
+
     def _covered(self, last, remaining):
         if remaining:
             return last.content != TRANSPARENT
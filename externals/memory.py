@@ -1,7 +1,9 @@
 import io
-import contextlib
 
 from . import HierarchicalExternal, NoContentError
+from .external import Stat, _check_range
+from .image import ImageTrie, write_image
+from .persistent_trie import PersistentTrie
 from .trie import Trie
 
 
@@ -9,6 +11,8 @@ class Memory(HierarchicalExternal):
 
     '''I am not an external, but pretend to be: hold data in memory.'''
 
+    __slots__ = ('_fs',)
+
     def __init__(self, fs=None, path=None, path_segments=()):
         self._fs = fs or Trie()
         super(Memory, self).__init__(path, path_segments)
@@ -17,11 +21,98 @@ class Memory(HierarchicalExternal):
     def new(self, path_segments):
         return self.__class__(self._fs, path_segments=path_segments)
 
+    def _backend_key(self):
+        return self._fs
+
     def __iter__(self):
         ''' Iterator over children '''
         children = self._fs.children(self.path_segments)
         return ((self / name) for name in children)
 
+    def bulk_load(self, items):
+        '''Set contents from (path segments, content) pairs below me.
+
+        Faster than setting contents one by one, especially when
+        the paths are sorted.
+        Modification times are not recorded, `stat()` reports
+        None for them.
+        '''
+        self._fs.update(items, prefix=self.path_segments)
+
+    def snapshot(self):
+        '''Independent copy of the whole tree, as a Memory at my path.
+
+        Takes constant time with a `PersistentTrie`, the two trees share
+        everything not changed later.
+        Other tries - so also the default `Trie` - are copied into a new
+        `PersistentTrie`, in O(N) time and memory; later snapshots of the
+        copy are again free.
+        '''
+        fs = self._fs
+        snapshot = getattr(fs, 'snapshot', None)
+        if snapshot is not None:
+            copy = snapshot()
+        else:
+            copy = PersistentTrie.copy_of(fs)
+        return self.__class__(copy, path_segments=self.path_segments)
+
+    def save_image(self, path):
+        '''Save everything below me to file path, see `open_image`.
+
+        Contents must be bytes-like.
+        '''
+        write_image(self._fs, path, prefix=self.path_segments)
+
+    @classmethod
+    def open_image(cls, path):
+        '''Read-only Memory on an image file written by `save_image`.
+
+        The file is mapped, not read: opening is instant and contents are
+        memoryviews into the mapping.
+        '''
+        return cls(ImageTrie(path))
+
+    def du(self):
+        '''Total size of the contents at and below me.
+
+        Takes constant time with a `trie.SizedTrie`,
+        walks everything below me with other tries.
+        '''
+        total_size = getattr(self._fs, 'total_size', None)
+        if total_size is not None:
+            return total_size(self.path_segments)
+        return sum(x.stat().size for x in self._with_content())
+
+    def count(self):
+        '''Number of contents at and below me, see `du`'''
+        total_count = getattr(self._fs, 'total_count', None)
+        if total_count is not None:
+            return total_count(self.path_segments)
+        return sum(1 for x in self._with_content())
+
+    def _with_content(self):
+        if self.is_file():
+            yield self
+        for x in self.walk():
+            if x.is_file():
+                yield x
+
+    def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Iterate lazily over everything below me - walking the trie'''
+        new = self.new
+        last = [None, None]
+
+        def external(path_segments):
+            # prune is called with the external yielded just before
+            if last[0] is not path_segments:
+                last[0], last[1] = path_segments, new(path_segments)
+            return last[1]
+
+        paths = self._fs.walk(
+            self.path_segments, depth_first, max_depth,
+            None if prune is None else (lambda path: prune(external(path))))
+        return (external(path) for path in paths)
+
     # External implementation
     def is_file(self):
         return self._fs.has_content(self.path_segments)
@@ -31,7 +122,12 @@ class Memory(HierarchicalExternal):
 
     @property
     def content(self):
-        'read/write property for accessing the content of "files"'
+        '''read/write property for accessing the content of "files"
+
+        The content is the object stored, not a copy.  Contents written
+        through `writable_stream()` - so also by `copy_to` - are
+        bytearrays, owned by the tree: changing them changes the content.
+        '''
         try:
             return self._fs[self.path_segments]
         except KeyError:
@@ -41,14 +137,44 @@ class Memory(HierarchicalExternal):
     def content(self, value):
         self._fs[self.path_segments] = value
 
+    def stat(self):
+        content = self.content
+        if content is None:
+            raise NoContentError(self.path)
+        return Stat(
+            readonly_view(content).nbytes,
+            self._fs.mtime(self.path_segments))
+
+    def content_view(self):
+        '''Read-only memoryview of the stored content - no copy is made.
+
+        Usable wherever the buffer protocol is, e.g. `numpy.frombuffer`.
+        '''
+        return readonly_view(self.content)
+
+    def read_range(self, offset, length):
+        _check_range(offset, length)
+        return self.content_view()[offset:offset + length].tobytes()
+
+    def readinto_range(self, buffer, offset):
+        _check_range(offset, 0)
+        target = memoryview(buffer).cast('B')
+        data = self.content_view()[offset:offset + len(target)]
+        target[:len(data)] = data
+        return len(data)
+
     def readable_stream(self):
-        stream = io.BytesIO()
-        stream.write(self.content)
-        stream.seek(0)
-        return contextlib.closing(stream)
+        return ReadableStream(self.content_view())
 
     def writable_stream(self):
-        return contextlib.closing(WritableStream(self))
+        return WritableStream(self)
+
+    def copy_to(self, other, max_block_size=1024 ** 2):
+        '''Copy my content to `other` in a single write, from my buffer'''
+        view = self.content_view()
+        with other.writable_stream() as destination:
+            destination.write(view)
+        return len(view)
 
     def delete(self):
         try:
@@ -57,13 +183,111 @@ class Memory(HierarchicalExternal):
             pass
 
 
-class WritableStream(io.BytesIO):
+def readonly_view(content):
+    '''Flat, read-only memoryview over any buffer, sharing its memory'''
+    view = memoryview(content)
+    if view.ndim != 1 or view.format != 'B':
+        view = view.cast('B')
+    if not view.readonly:
+        view = view.toreadonly()
+    return view
+
+
+class ReadableStream(io.RawIOBase):
+
+    '''Seekable binary stream over a memoryview.
+
+    Nothing is copied up front: reads copy only the requested range,
+    `readinto` copies straight into the caller's buffer.
+    '''
+
+    def __init__(self, view):
+        io.RawIOBase.__init__(self)
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError('invalid whence: {}'.format(whence))
+        if position < 0:
+            raise ValueError('negative seek position {}'.format(position))
+        self._position = position
+        return position
+
+    def _take(self, size):
+        start = min(self._position, len(self._view))
+        if size is None or size < 0:
+            end = len(self._view)
+        else:
+            end = min(start + size, len(self._view))
+        self._position = end
+        return self._view[start:end]
+
+    def read(self, size=-1):
+        return self._take(size).tobytes()
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, buffer):
+        target = memoryview(buffer).cast('B')
+        block = self._take(len(target))
+        target[:len(block)] = block
+        return len(block)
+
+    def close(self):
+        io.RawIOBase.close(self)
+        self._view = memoryview(b'')
+
+
+class WritableStream(io.RawIOBase):
+
+    '''Collect written data in a single growing buffer.
+
+    On close the buffer itself - a bytearray - becomes the content
+    of the external, so the data is not copied again.
+    '''
 
     def __init__(self, external):
-        io.BytesIO.__init__(self)
+        io.RawIOBase.__init__(self)
         self.__external = external
+        self.__buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError('I/O operation on closed stream')
+
+    def tell(self):
+        self._check_open()
+        return len(self.__buffer)
+
+    def write(self, data):
+        self._check_open()
+        self.__buffer += data
+        return memoryview(data).nbytes
 
     def close(self):
-        content = self.getvalue()
-        io.BytesIO.close(self)
-        self.__external.content = content
+        if self.closed:
+            return
+        io.RawIOBase.close(self)
+        # the content is not mine to change any more
+        buffer, self.__buffer = self.__buffer, None
+        self.__external.content = buffer
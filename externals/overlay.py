@@ -1,37 +1,99 @@
 from __future__ import unicode_literals
 
+import itertools
+
 from . import HierarchicalExternal, NoContentError
+from .traversal import walk_tree
+from .trie import Trie
+
+
+# marks covered paths in the resolution cache
+HIDDEN = 'HIDDEN'
 
 
 class Overlay(HierarchicalExternal):
 
-    def __init__(self, readonly, writable, mask, path=None, path_segments=()):
+    __slots__ = (
+        'layer_readonly', 'layer_writable', 'layer_deleted',
+        '_resolved', '_resolutions')
+
+    def __init__(
+            self, readonly, writable, mask, path=None, path_segments=(),
+            exclusive_layers=False):
+        '''
+        exclusive_layers: promise, that the layers and the mask are changed
+            only through this overlay (and externals derived from it).
+            Resolved layers are then remembered per path.
+        '''
         self.layer_readonly = readonly
         self.layer_writable = writable
         self.layer_deleted = mask
+        # layer external holding my content, if known from listing
+        self._resolved = None
+        # path -> layer or HIDDEN, shared by all derived overlays
+        self._resolutions = Trie() if exclusive_layers else None
         super(Overlay, self).__init__(path, path_segments)
 
     def __iter__(self):
-        ''' Iterator over children '''
-        def names(x):
-            return set(child.name for child in x / self.path)
-
-        read_only_names = names(self.layer_readonly)
-        writable_names = names(self.layer_writable)
-
-        child_names = read_only_names.union(writable_names)
-        for name in child_names:
-            child = self / name
-            if child.exists():
-                yield child
+        '''Iterator over children.
+
+        Children remember which layer they were found in, so
+        `is_file()`, `content`, ... on them do not resolve again,
+        they report the state at the time of listing.
+        '''
+        return (item[0] for item in self._merged_child_items(self._item()))
+
+    def walk(self, depth_first=True, max_depth=None, prune=None):
+        '''Iterate lazily over everything below me.
+
+        The layers are walked in parallel: every directory of each layer
+        is listed once and merged, children are not resolved again.
+        '''
+        items = walk_tree(
+            self._item(), self._merged_child_items, _resolved_is_dir,
+            depth_first, max_depth,
+            None if prune is None else (lambda item: prune(item[0])))
+        return (item[0] for item in items)
+
+    def _item(self):
+        return (
+            self,
+            self._resolved,
+            self.layer_writable.new(self.path_segments),
+            self.layer_readonly.new(self.path_segments))
+
+    def _merged_child_items(self, item):
+        '''(overlay child, resolved child, writable child, readonly child)
+        for all visible children'''
+        directory, _, writable_directory, readonly_directory = item
+        writable_children = _children_by_name(writable_directory)
+        readonly_children = _children_by_name(readonly_directory)
+        names = itertools.chain(
+            writable_children,
+            (
+                name for name in readonly_children
+                if name not in writable_children))
+        path_segments = directory.path_segments
+
+        for name in self.layer_deleted.uncovered(path_segments, names):
+            child = self.new(path_segments + (name,))
+            writable = writable_children.get(name)
+            readonly = readonly_children.get(name)
+            child._resolved = readonly if writable is None else writable
+            yield child, child._resolved, writable, readonly
 
     def new(self, path_segments):
-        return self.__class__(
+        overlay = self.__class__(
             self.layer_readonly,
             self.layer_writable,
             self.layer_deleted,
             path_segments=path_segments
         )
+        overlay._resolutions = self._resolutions
+        return overlay
+
+    def _backend_key(self):
+        return (self.layer_readonly, self.layer_writable, self.layer_deleted)
 
     # External
 
@@ -51,14 +113,57 @@ class Overlay(HierarchicalExternal):
 
     @property
     def _external_with_content(self):
-        if self.layer_deleted.covered(self.path_segments):
+        if self._resolved is not None:
+            return self._resolved
+
+        resolutions = self._resolutions
+        if resolutions is None:
+            layer = self._resolve_layer()
+        else:
+            try:
+                layer = resolutions[self.path_segments]
+            except KeyError:
+                layer = None
+            if layer is None:
+                layer = self._resolve_layer()
+                resolutions[self.path_segments] = layer
+
+        if layer is HIDDEN:
             raise NoContentError
+        return layer.new(self.path_segments)
+
+    def _resolve_layer(self):
+        if self.layer_deleted.covered(self.path_segments):
+            return HIDDEN
 
         writable = self.layer_writable.new(self.path_segments)
         if writable.exists():
-            return writable
+            return self.layer_writable
 
-        return self.layer_readonly.new(self.path_segments)
+        return self.layer_readonly
+
+    def _forget_resolutions(self, layer):
+        '''Resolutions of my subtree are unknown, I am in layer'''
+        self._resolved = None
+        resolutions = self._resolutions
+        if resolutions is None:
+            return
+
+        path = self.path_segments
+        try:
+            resolutions.delete(path)
+        except KeyError:
+            pass
+        resolutions[path] = layer
+
+    def _written(self, layer):
+        '''I and my parents are all in layer - None if not yet known'''
+        self._forget_resolutions(layer)
+        resolutions = self._resolutions
+        if resolutions is not None:
+            path = self.path_segments
+            for depth in range(len(path)):
+                resolutions[path[:depth]] = layer
 
     @property
     def content(self):
@@ -70,14 +175,43 @@ class Overlay(HierarchicalExternal):
 
         writable = self.layer_writable.new(self.path_segments)
         writable.content = value
+        self._written(self.layer_writable)
 
     def readable_stream(self):
         return self._external_with_content.readable_stream()
 
+    def stat(self):
+        return self._external_with_content.stat()
+
+    def read_range(self, offset, length):
+        return self._external_with_content.read_range(offset, length)
+
+    def readinto_range(self, buffer, offset):
+        return self._external_with_content.readinto_range(buffer, offset)
+
     def writable_stream(self):
         self.layer_deleted.drill(self.path_segments)
         writable = self.layer_writable.new(self.path_segments)
-        return writable.writable_stream()
+        stream = writable.writable_stream()
+        # content might show up only when the stream is closed
+        self._written(None)
+        return stream
+
+    def make_dirs(self):
+        self.layer_deleted.drill(self.path_segments)
+        self.layer_writable.new(self.path_segments).make_dirs()
+        self._written(None)
 
     def delete(self):
         self.layer_deleted.cover(self.path_segments)
+        self._forget_resolutions(HIDDEN)
+
+
+def _children_by_name(directory):
+    if directory is None or not directory.is_dir():
+        return {}
+    return dict((child.name, child) for child in directory)
+
+
+def _resolved_is_dir(item):
+    return item[1].is_dir()
@@ -0,0 +1,240 @@
+'''
+A Trie whose snapshots are free: nodes are never changed once visible.
+
+    fork = Memory(fs=PersistentTrie()).snapshot()
+
+A change copies the nodes on its path (path copying) and installs the new
+root in one step, everything else is shared with earlier snapshots.
+Readers need no lock, they always see a complete version.
+'''
+import itertools
+import threading
+import time
+
+from .traversal import walk_tree
+from .trie import _child_items, _has_children
+
+
+class PersistentNode(object):
+
+    __slots__ = ('children', 'content', 'mtime')
+
+    def __init__(self, children, content, mtime):
+        self.children = children
+        self.content = content
+        self.mtime = mtime
+
+    def copy(self):
+        return PersistentNode(
+            dict(self.children) if self.children else None,
+            self.content, self.mtime)
+
+
+_EMPTY = PersistentNode(None, None, None)
+
+
+class PersistentTrie(object):
+
+    '''Drop-in replacement for `trie.Trie` with O(1) `snapshot()`'''
+
+    def __init__(self):
+        self._root = _EMPTY
+        # writers build on the latest root one at a time
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_items(cls, items):
+        '''New trie from (path, content) pairs, see `Trie.update`'''
+        trie = cls()
+        trie.update(items)
+        return trie
+
+    @classmethod
+    def copy_of(cls, trie):
+        '''New trie with the nodes, contents and mtimes of any trie, in O(N)'''
+        mtime = getattr(trie, 'mtime', None)
+
+        def copy(path):
+            children = dict(
+                (name, copy(path + (name,))) for name in trie.children(path))
+            return PersistentNode(
+                children or None, trie[path],
+                None if mtime is None else mtime(path))
+
+        result = cls()
+        result._root = copy(())
+        return result
+
+    def snapshot(self):
+        '''Independent trie with my current contents'''
+        trie = self.__class__()
+        trie._root = self._root
+        return trie
+
+    def __setitem__(self, path, content):
+        mtime = time.time()
+        with self._lock:
+            self._root = _replace(
+                self._root, path,
+                lambda node: PersistentNode(
+                    None if node is None else node.children, content, mtime))
+
+    def __getitem__(self, path):
+        return self._get_node(path).content
+
+    def mtime(self, path):
+        '''Time content at path was set, see `Trie.mtime`'''
+        return self._get_node(path).mtime
+
+    def is_internal(self, path):
+        try:
+            return bool(self._get_node(path).children)
+        except KeyError:
+            return False
+
+    def has_content(self, path):
+        try:
+            return self._get_node(path).content is not None
+        except KeyError:
+            return False
+
+    def last(self, path):
+        '''Content of last existing node on path'''
+        node = self._root
+        for name in path:
+            children = node.children
+            if not children or name not in children:
+                break
+            node = children[name]
+        return node.content
+
+    def children(self, path):
+        children = self._get_node(path).children
+        return list(children) if children else ()
+
+    def walk(self, path=(), depth_first=True, max_depth=None, prune=None):
+        '''Iterate over the paths of all nodes below path, see `Trie.walk`
+
+        The walk sees the version current when it was started.
+        '''
+        try:
+            root = (tuple(path), self._get_node(path))
+        except KeyError:
+            return iter(())
+
+        return (
+            item[0]
+            for item in walk_tree(
+                root, _child_items, _has_children, depth_first, max_depth,
+                None if prune is None else (lambda item: prune(item[0]))))
+
+    def extend(self, path, contents=itertools.repeat(None)):
+        '''Add missing nodes along path, see `Trie.extend`'''
+        contents = iter(contents)
+        values = []
+        for _ in path:
+            try:
+                values.append(next(contents))
+            except StopIteration:
+                raise ValueError
+        with self._lock:
+            node = self._root
+            existing = 0
+            for name in path:
+                children = node.children
+                if not children or name not in children:
+                    break
+                node = children[name]
+                existing += 1
+            if existing == len(path):
+                return
+            # the missing nodes, built bottom up
+            chain = None
+            for depth in range(len(path) - 1, existing - 1, -1):
+                chain = PersistentNode(
+                    None if chain is None else {path[depth + 1]: chain},
+                    values[depth], None)
+            self._root = _replace(
+                self._root, path[:existing + 1], lambda _: chain)
+
+    def update(self, items, prefix=()):
+        '''Set contents from (path, content) pairs, see `Trie.update`.
+
+        Nodes are copied once per update, not once per item.
+        '''
+        prefix = tuple(prefix)
+        with self._lock:
+            # ids of the copies made by this update, free to change
+            owned = set()
+
+            def own(node):
+                if node is None:
+                    node = PersistentNode(None, None, None)
+                elif id(node) in owned:
+                    return node
+                else:
+                    node = node.copy()
+                owned.add(id(node))
+                copies.append(node)
+                return node
+
+            # keeps the copies alive, so that their ids stay unique
+            copies = []
+            root = own(self._root)
+            for path, content in items:
+                node = root
+                for name in prefix + tuple(path):
+                    children = node.children
+                    if children is None:
+                        children = node.children = {}
+                    child = own(children.get(name))
+                    children[name] = child
+                    node = child
+                node.content = content
+                node.mtime = None
+            self._root = root
+
+    def delete(self, path):
+        with self._lock:
+            if not path:
+                self._root = _EMPTY
+                return
+            self._get_node(path)
+            self._root = _replace(self._root, path, lambda node: None)
+
+    # helpers
+
+    def _get_node(self, path):
+        node = self._root
+        for name in path:
+            children = node.children
+            if not children or name not in children:
+                raise KeyError(path)
+            node = children[name]
+        return node
+
+
+def _replace(root, path, change):
+    '''New root with the node at path replaced by change(old node or None).
+
+    change returning None removes the node.
+    '''
+    spine = [root]
+    for name in path:
+        node = spine[-1]
+        children = None if node is None else node.children
+        spine.append(children.get(name) if children else None)
+
+    new = change(spine[-1])
+    for depth in range(len(path) - 1, -1, -1):
+        parent = spine[depth]
+        children = dict(parent.children or ()) if parent is not None else {}
+        if new is None:
+            del children[path[depth]]
+        else:
+            children[path[depth]] = new
+        new = PersistentNode(
+            children or None,
+            None if parent is None else parent.content,
+            None if parent is None else parent.mtime)
+    return new
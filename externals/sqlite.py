@@ -0,0 +1,358 @@
+'''
+A tree of contents kept in an SQLite database file.
+
+    tree = SQLite('tree.db')
+    with tree.batch():
+        for name, data in many_small_files:
+            (tree / name).content = data  # committed once, at the end
+
+One row per node, listings use the (parent, name) index.
+Streams and `read_range` read the content with incremental blob I/O
+(Python 3.11+), without loading all of it.
+The database is in WAL mode: readers are not blocked by a writer.
+Every thread uses its own connection, closed when the thread ends.
+'''
+import contextlib
+import io
+import sqlite3
+import threading
+import time
+import weakref
+
+from . import HierarchicalExternal, NoContentError
+from .external import Stat, _check_range
+from .memory import ReadableStream, WritableStream
+
+
+# id of the root, which has no row
+ROOT = 0
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    -- NULL for directories
+    content BLOB,
+    mtime REAL,
+    UNIQUE (parent, name)
+)
+'''
+
+_SUBTREE = '''
+WITH RECURSIVE subtree(id) AS (
+    SELECT ? UNION ALL
+    SELECT nodes.id FROM nodes JOIN subtree ON nodes.parent = subtree.id
+)
+'''
+
+
+class _ThreadConnection(object):
+
+    '''Connection of one thread, closed when the thread ends'''
+
+    __slots__ = ('connection', 'depth', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+        # nesting level of `Database.batch`
+        self.depth = 0
+        # the thread-local holding me goes away with the thread
+        weakref.finalize(self, connection.close)
+
+
+class Database(object):
+
+    '''Connections to a database file, shared by an `SQLite` tree'''
+
+    def __init__(self, path, timeout=30.0):
+        '''
+        timeout: seconds to wait for another writer to finish
+        '''
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # open connections of live threads, for `close`
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+        connection = self.connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(_SCHEMA)
+
+    def _thread_connection(self):
+        local = getattr(self._local, 'connection', None)
+        if local is None:
+            # transactions are started explicitly, see `batch`
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None,
+                check_same_thread=False)
+            # durable at checkpoints, the usual setting for WAL
+            connection.execute('PRAGMA synchronous=NORMAL')
+            local = self._local.connection = _ThreadConnection(connection)
+            with self._lock:
+                self._connections.add(local)
+        return local
+
+    def connection(self):
+        '''Connection of the current thread'''
+        return self._thread_connection().connection
+
+    @property
+    def open_connections(self):
+        '''Number of connections open, one per thread that used me'''
+        with self._lock:
+            return len(self._connections)
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''Commit the writes of the current thread in the block at once.
+
+        Nothing is committed if the block raises. Batches nest.
+        '''
+        local = self._thread_connection()
+        connection = local.connection
+        if local.depth:
+            local.depth += 1
+            try:
+                yield connection
+            finally:
+                local.depth -= 1
+            return
+        connection.execute('BEGIN IMMEDIATE')
+        local.depth = 1
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        else:
+            connection.execute('COMMIT')
+        finally:
+            local.depth = 0
+
+    def close(self):
+        '''Close the connections of all threads'''
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for local in connections:
+            local.connection.close()
+        self._local = threading.local()
+
+    # nodes
+
+    def find(self, path):
+        '''(id, has content) of the node at path, None if missing'''
+        if not path:
+            return ROOT, False
+        execute = self.connection().execute
+        node = ROOT
+        for name in path[:-1]:
+            row = execute(
+                'SELECT id FROM nodes WHERE parent = ? AND name = ?',
+                (node, name)).fetchone()
+            if row is None:
+                return None
+            node = row[0]
+        row = execute(
+            'SELECT id, content IS NOT NULL FROM nodes'
+            ' WHERE parent = ? AND name = ?',
+            (node, path[-1])).fetchone()
+        return None if row is None else (row[0], bool(row[1]))
+
+    def children(self, node):
+        return [
+            name for name, in self.connection().execute(
+                'SELECT name FROM nodes WHERE parent = ? ORDER BY name',
+                (node,))]
+
+    def has_children(self, node):
+        return self.connection().execute(
+            'SELECT 1 FROM nodes WHERE parent = ? LIMIT 1',
+            (node,)).fetchone() is not None
+
+    def make_dirs(self, connection, path):
+        '''id of the node at path, adding missing nodes along it'''
+        node = ROOT
+        for name in path:
+            connection.execute(
+                'INSERT OR IGNORE INTO nodes (parent, name) VALUES (?, ?)',
+                (node, name))
+            node = connection.execute(
+                'SELECT id FROM nodes WHERE parent = ? AND name = ?',
+                (node, name)).fetchone()[0]
+        return node
+
+
+class SQLite(HierarchicalExternal):
+
+    __slots__ = ('_db',)
+
+    def __init__(self, database, path=None, path_segments=()):
+        '''
+        database: file name of the database, created if missing,
+            or the `Database` shared with another external
+        '''
+        if not isinstance(database, Database):
+            database = Database(database)
+        self._db = database
+        super(SQLite, self).__init__(path, path_segments)
+
+    def new(self, path_segments):
+        return self.__class__(self._db, path_segments=path_segments)
+
+    def _backend_key(self):
+        return self._db
+
+    def batch(self):
+        '''Context in which the writes of this thread are committed at once.
+
+        Much faster for many small writes: one transaction, one sync.
+        '''
+        return self._db.batch()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        found = self._db.find(self.path_segments)
+        if found is None:
+            return iter(())
+        return (self / name for name in self._db.children(found[0]))
+
+    def _file_path(self):
+        '''My path segments, which can have content'''
+        if not self.path_segments:
+            raise ValueError('the root of an SQLite tree has no content')
+        return self.path_segments
+
+    def _file_id(self):
+        found = self._db.find(self.path_segments)
+        if found is None or not found[1]:
+            raise NoContentError(self.path)
+        return found[0]
+
+    # External implementation
+    def is_file(self):
+        found = self._db.find(self.path_segments)
+        return found is not None and found[1]
+
+    def is_dir(self):
+        '''Nodes without content are directories, also when empty'''
+        found = self._db.find(self.path_segments)
+        if found is None:
+            return False
+        node, has_content = found
+        return not has_content or self._db.has_children(node)
+
+    @property
+    def content(self):
+        '''The content, read in one query'''
+        return self._db.connection().execute(
+            'SELECT content FROM nodes WHERE id = ?', (self._file_id(),)
+        ).fetchone()[0]
+
+    @content.setter
+    def content(self, value):
+        path = self._file_path()
+        with self._db.batch() as connection:
+            parent = self._db.make_dirs(connection, path[:-1])
+            connection.execute(
+                'INSERT INTO nodes (parent, name, content, mtime)'
+                ' VALUES (?, ?, ?, ?)'
+                ' ON CONFLICT (parent, name) DO UPDATE'
+                ' SET content = excluded.content, mtime = excluded.mtime',
+                (parent, path[-1], value, time.time()))
+
+    def stat(self):
+        row = self._db.connection().execute(
+            'SELECT length(content), mtime FROM nodes WHERE id = ?',
+            (self._file_id(),)).fetchone()
+        return Stat(row[0], row[1])
+
+    def readable_stream(self):
+        '''Stream reading the content incrementally, as a blob'''
+        node = self._file_id()
+        connection = self._db.connection()
+        if not hasattr(connection, 'blobopen'):  # pragma: no cover
+            return ReadableStream(memoryview(self.content))
+        return _BlobStream(
+            connection.blobopen('nodes', 'content', node, readonly=True))
+
+    def read_range(self, offset, length):
+        '''At most length bytes from offset, reading just the range'''
+        _check_range(offset, length)
+        node = self._file_id()
+        connection = self._db.connection()
+        if not hasattr(connection, 'blobopen'):  # pragma: no cover
+            return bytes(connection.execute(
+                'SELECT substr(content, ?, ?) FROM nodes WHERE id = ?',
+                (offset + 1, length, node)).fetchone()[0])
+        with connection.blobopen(
+                'nodes', 'content', node, readonly=True) as blob:
+            blob.seek(min(offset, len(blob)))
+            return blob.read(length)
+
+    def writable_stream(self):
+        self._file_path()
+        return WritableStream(self)
+
+    def make_dirs(self):
+        with self._db.batch() as connection:
+            self._db.make_dirs(connection, self.path_segments)
+
+    def delete(self):
+        '''Delete me and everything below me'''
+        with self._db.batch():
+            found = self._db.find(self.path_segments)
+            if found is None:
+                return
+            # the root has no row, only the nodes below it go
+            self._db.connection().execute(
+                _SUBTREE + 'DELETE FROM nodes WHERE id IN subtree',
+                (found[0],))
+
+
+class _BlobStream(io.RawIOBase):
+
+    '''Readable stream on an open `sqlite3.Blob`'''
+
+    def __init__(self, blob):
+        io.RawIOBase.__init__(self)
+        self._blob = blob
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._blob.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        blob = self._blob
+        if whence == io.SEEK_CUR:
+            offset += blob.tell()
+        elif whence == io.SEEK_END:
+            offset += len(blob)
+        # past the end reads nothing, as for files
+        blob.seek(max(min(offset, len(blob)), 0))
+        return blob.tell()
+
+    def readinto(self, buffer):
+        target = memoryview(buffer).cast('B')
+        data = self._blob.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._blob.close()
+        io.RawIOBase.close(self)
@@ -0,0 +1,251 @@
+'''
+Cache of `os.stat` results for `File` trees.
+
+    cache = StatCache(maxsize=10000, ttl=5)
+    root = File('/data', stat_cache=cache)
+
+Missing paths are cached as well (negative entries).
+Entries are dropped when
+- they are the least recently used ones and the cache is full
+- they are older than `ttl` seconds
+- `invalidate()` is called for them or for one of their parents
+- with `watch=True` (Linux only): inotify reports a change in their directory
+'''
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+
+
+class StatCache(object):
+
+    def __init__(self, maxsize=10000, ttl=None, watch=False, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        # path -> (stat_result or None, time of stat)
+        self._entries = collections.OrderedDict()
+        # bumped by every invalidation, a stat racing with one is not stored
+        self._generation = 0
+        # directory -> number of entries in it, while watching
+        self._directory_entries = collections.Counter()
+        self._watcher = InotifyWatcher(self) if watch else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stat(self, path):
+        '''`os.stat(path)`, or None if path does not exist'''
+        now = self._clock()
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None:
+                result, stat_time = cached
+                if self.ttl is None or now - stat_time <= self.ttl:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return result
+                self._drop(path)
+            self.misses += 1
+            generation = self._generation
+
+        directory = os.path.dirname(path)
+        cacheable = (
+            self._watcher is None or self._watcher.watch(directory))
+        try:
+            result = os.stat(path)
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            result = None
+        if cacheable:
+            with self._lock:
+                # an invalidation since the stat might be about this path,
+                # and the watch might have been dropped with the entries
+                # of directory
+                if generation == self._generation and (
+                        self._watcher is None
+                        or self._watcher.is_watched(directory)):
+                    self._store(path, (result, now))
+        return result
+
+    def invalidate(self, path, recursive=True):
+        '''Forget path and - if recursive - everything below it'''
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            self._generation += 1
+            if path in self._entries:
+                self._drop(path)
+            if recursive:
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            directories = list(self._directory_entries)
+            self._directory_entries.clear()
+            if self._watcher is not None:
+                for directory in directories:
+                    self._watcher.unwatch(directory)
+
+    def close(self):
+        '''Stop watching for changes, the cache is cleared'''
+        if self._watcher is not None:
+            self._watcher.close()
+        self.clear()
+        self._watcher = None
+
+    # helpers, called with the lock held
+
+    def _store(self, path, entry):
+        if path not in self._entries and self._watcher is not None:
+            self._directory_entries[os.path.dirname(path)] += 1
+        self._entries[path] = entry
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, path):
+        '''Forget path, and stop watching its directory with its last entry'''
+        del self._entries[path]
+        if self._watcher is None:
+            return
+        directory = os.path.dirname(path)
+        self._directory_entries[directory] -= 1
+        if self._directory_entries[directory] <= 0:
+            del self._directory_entries[directory]
+            self._watcher.unwatch(directory)
+
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher(object):
+
+    '''Evict entries of a StatCache when their directory changes.
+
+    Every directory containing a cached path is watched - until its last
+    entry leaves the cache -, events are processed on a daemon thread.
+    '''
+
+    def __init__(self, cache):
+        self._cache = cache
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._lock = threading.Lock()
+        self._directories = {}  # wd -> directory
+        self._descriptors = {}  # directory -> wd
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def watch(self, directory):
+        '''Start watching directory, return False if that is not possible'''
+        with self._lock:
+            if directory in self._descriptors:
+                return True
+            if self._fd is None:
+                return False
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                # nonexistent directory, watch limit reached, ...
+                return False
+            self._directories[wd] = directory
+            self._descriptors[directory] = wd
+            return True
+
+    def is_watched(self, directory):
+        with self._lock:
+            return directory in self._descriptors
+
+    def unwatch(self, directory):
+        with self._lock:
+            wd = self._descriptors.pop(directory, None)
+            if wd is None:
+                return
+            del self._directories[wd]
+            if self._fd is not None:
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def close(self):
+        if self._fd is None:
+            return
+        os.write(self._stop_write, b'x')
+        self._thread.join()
+        with self._lock:
+            os.close(self._fd)
+            self._fd = None
+        os.close(self._stop_read)
+        os.close(self._stop_write)
+
+    def _run(self):
+        while True:
+            ready, _, _ = select.select([self._fd, self._stop_read], [], [])
+            if self._stop_read in ready:
+                return
+            self._process(os.read(self._fd, 64 * 1024))
+
+    def _process(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                self._cache.clear()
+                continue
+
+            with self._lock:
+                directory = self._directories.get(wd)
+                if mask & IN_IGNORED and directory is not None:
+                    del self._directories[wd]
+                    del self._descriptors[directory]
+            if directory is None:
+                continue
+
+            if name:
+                # only a directory can have entries below it
+                self._cache.invalidate(
+                    os.path.join(directory, os.fsdecode(name)),
+                    recursive=bool(mask & IN_ISDIR))
+                self._cache.invalidate(directory, recursive=False)
+            else:
+                # the directory itself changed / went away
+                self._cache.invalidate(directory)
@@ -4,10 +4,12 @@ Mixin classes for testing common `External` behavior.
 '''
 
 from abc import ABCMeta, abstractmethod
+import time
 import mock
 
 from externals import Memory
-from externals import NoParentError
+from externals import NoParentError, NoContentError
+from externals.external import External
 
 
 class RootTests(object):
@@ -64,13 +66,20 @@ class External_copy_to_Tests(object):
 
             self.assertEqual(b'small something', external.content)
 
+    def test_returns_number_of_bytes_copied(self):
+        mem = Memory()
+        mem.content = b'small something'
+
+        with self._get_external() as external:
+            self.assertEqual(15, mem.copy_to(external))
+
 
 class BigExternal_copy_to_Tests(External_copy_to_Tests):
 
     def test_incomplete_reads_are_concatenated(self):
         mem = Memory()
         with self._get_external() as external:
-            def create_fragmenting_reader():
+            def create_fragmenting_reader(external):
                 class Reader(object):
 
                     def __init__(self, fragments):
@@ -92,8 +101,189 @@ class BigExternal_copy_to_Tests(External_copy_to_Tests):
 
                 return Reader([b'a', b'b', b'c'])
 
+            # externals have __slots__, patch the class
             with mock.patch.object(
-                    external, 'readable_stream', create_fragmenting_reader):
+                    external.__class__, 'readable_stream',
+                    create_fragmenting_reader):
                 external.copy_to(mem)
 
         self.assertEqual(b'abc', mem.content)
+
+
+class WalkTests(object):
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def _get_root(self):  # pragma: no cover
+        '''\
+        I should return a `context manager`, whose value is an empty,
+          writable external
+        '''
+
+    TREE = ('a/b/c', 'a/d', 'e', 'f/g/h/i')
+    ALL = ('a', 'a/b', 'a/b/c', 'a/d', 'e', 'f', 'f/g', 'f/g/h', 'f/g/h/i')
+
+    def walk(self, **kwargs):
+        with self._get_root() as root:
+            for path in self.TREE:
+                (root / path).content = path.encode('ascii')
+            depth = len(root.path_segments)
+            return [
+                '/'.join(x.path_segments[depth:])
+                for x in root.walk(**kwargs)]
+
+    def test_all_nodes_are_visited(self):
+        self.assertEqual(sorted(self.ALL), sorted(self.walk()))
+
+    def test_depth_first_is_pre_order(self):
+        paths = self.walk()
+        for path in paths:
+            if '/' in path:
+                parent = path.rsplit('/', 1)[0]
+                self.assertLess(paths.index(parent), paths.index(path))
+        # subtrees are not interleaved
+        a_subtree = [i for i, path in enumerate(paths) if path[0] == 'a']
+        self.assertEqual(
+            list(range(a_subtree[0], a_subtree[-1] + 1)), a_subtree)
+
+    def test_breadth_first_is_ordered_by_depth(self):
+        paths = self.walk(depth_first=False)
+        self.assertEqual(sorted(self.ALL), sorted(paths))
+        depths = [path.count('/') for path in paths]
+        self.assertEqual(sorted(depths), depths)
+
+    def test_max_depth(self):
+        self.assertEqual(
+            ['a', 'a/b', 'a/d', 'e', 'f', 'f/g'],
+            sorted(self.walk(max_depth=2)))
+        self.assertEqual([], self.walk(max_depth=0))
+
+    def test_prune(self):
+        self.assertEqual(
+            ['a', 'a/b', 'a/b/c', 'a/d', 'e', 'f'],
+            sorted(self.walk(prune=lambda x: x.name == 'f')))
+
+    def test_prune_breadth_first(self):
+        self.assertEqual(
+            ['a', 'e', 'f', 'f/g', 'f/g/h', 'f/g/h/i'],
+            sorted(
+                self.walk(depth_first=False, prune=lambda x: x.name == 'a')))
+
+    def test_nodes_are_usable_externals(self):
+        with self._get_root() as root:
+            (root / 'x/y').content = b'y'
+            x, y = root.walk()
+            self.assertTrue(x.is_dir())
+            self.assertEqual(b'y', y.content)
+
+
+class ReadRangeTests(object):
+
+    __metaclass__ = ABCMeta
+
+    CONTENT = b'0123456789'
+
+    @abstractmethod
+    def _get_root(self):  # pragma: no cover
+        '''\
+        I should return a `context manager`, whose value is an empty,
+          writable external
+        '''
+
+    def check(self, read_range):
+        with self._get_root() as root:
+            x = root / 'file'
+            x.content = self.CONTENT
+            self.assertEqual(b'234', read_range(x, 2, 3))
+            self.assertEqual(b'89', read_range(x, 8, 5))
+            self.assertEqual(b'', read_range(x, 10, 5))
+            self.assertEqual(b'', read_range(x, 20, 5))
+            self.assertEqual(b'', read_range(x, 3, 0))
+            with self.assertRaises(ValueError):
+                read_range(x, -1, 1)
+            with self.assertRaises(NoContentError):
+                read_range(root / 'nonexistent', 0, 1)
+
+    def test_read_range(self):
+        self.check(lambda x, offset, length: x.read_range(offset, length))
+
+    def test_readinto_range(self):
+        def read_range(x, offset, length):
+            buffer = bytearray(length)
+            size = x.readinto_range(buffer, offset)
+            return bytes(buffer[:size])
+        self.check(read_range)
+
+    def test_generic_read_range(self):
+        self.check(
+            lambda x, offset, length: External.read_range(x, offset, length))
+
+    def test_readinto_range_fills_part_of_a_bigger_buffer(self):
+        with self._get_root() as root:
+            x = root / 'file'
+            x.content = self.CONTENT
+            buffer = bytearray(b'.' * 8)
+            self.assertEqual(
+                3, x.readinto_range(memoryview(buffer)[2:5], 4))
+            self.assertEqual(b'..456...', bytes(buffer))
+
+
+class StatTests(object):
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def _get_root(self):  # pragma: no cover
+        '''\
+        I should return a `context manager`, whose value is an empty,
+          writable external
+        '''
+
+    def test_size_and_mtime(self):
+        with self._get_root() as root:
+            before = time.time()
+            x = root / 'file'
+            x.content = b'0123456789'
+
+            stat = x.stat()
+
+            self.assertEqual(10, stat.size)
+            # filesystem timestamps may be coarser than time.time()
+            self.assertGreaterEqual(stat.mtime, before - 2)
+            self.assertLessEqual(stat.mtime, time.time() + 2)
+
+    def test_empty_file(self):
+        with self._get_root() as root:
+            x = root / 'file'
+            x.content = b''
+            self.assertEqual(0, x.stat().size)
+
+    def test_overwritten_file(self):
+        with self._get_root() as root:
+            x = root / 'file'
+            x.content = b'0123456789'
+            x.content = b'012'
+            self.assertEqual(3, (root / 'file').stat().size)
+
+    def test_listed_child(self):
+        with self._get_root() as root:
+            (root / 'file').content = b'012'
+            self.assertEqual([3], [x.stat().size for x in root])
+
+    def test_missing(self):
+        with self._get_root() as root:
+            with self.assertRaises(NoContentError):
+                (root / 'missing').stat()
+
+    def test_directory(self):
+        with self._get_root() as root:
+            (root / 'dir' / 'file').content = b'012'
+            with self.assertRaises(NoContentError):
+                (root / 'dir').stat()
+
+    def test_generic_stat(self):
+        with self._get_root() as root:
+            x = root / 'file'
+            x.content = b'0123456789'
+            self.assertEqual(10, External.stat(x).size)
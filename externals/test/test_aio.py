@@ -0,0 +1,137 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import unittest
+import mock
+from temp_dir import within_temp_dir
+
+import externals.aio as m
+from externals import Memory, File
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def collect(iterator):
+    return [x async for x in iterator]
+
+
+class Test_AsyncExternal(unittest.TestCase):
+
+    def check_read_write(self, root):
+        async def main():
+            x = m.AsyncExternal(root) / 'dir' / 'x'
+            await x.write(b'content')
+            self.assertTrue(await x.exists())
+            self.assertTrue(await x.is_file())
+            self.assertTrue(await x.parent().is_dir())
+            self.assertEqual(b'content', await x.read())
+            self.assertEqual(b'nte', await x.read_range(2, 3))
+            self.assertEqual(7, (await x.stat()).size)
+            await x.parent().delete()
+            self.assertFalse(await x.exists())
+        run(main())
+
+    def test_memory(self):
+        self.check_read_write(Memory())
+
+    @within_temp_dir
+    def test_file(self):
+        self.check_read_write(File('.'))
+
+    def test_memory_is_inline(self):
+        root = m.AsyncExternal(Memory())
+
+        async def main():
+            loop = asyncio.get_event_loop()
+            with mock.patch.object(loop, 'run_in_executor') as executor:
+                await (root / 'x').write(b'x')
+                self.assertEqual(b'x', await (root / 'x').read())
+            self.assertFalse(executor.called)
+        run(main())
+
+    @within_temp_dir
+    def test_file_runs_on_executor(self):
+        threads = set()
+        original = File.exists
+
+        def exists(self):
+            threads.add(threading.current_thread())
+            return original(self)
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            root = m.AsyncExternal(File('.'), executor=executor)
+            with mock.patch.object(File, 'exists', exists):
+                run((root / 'x').exists())
+
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertEqual(1, len(threads))
+
+    @within_temp_dir
+    def test_limit(self):
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+        original = File.is_file
+
+        def is_file(self):
+            with lock:
+                in_flight.append(self)
+                peak.append(len(in_flight))
+            try:
+                threading.Event().wait(0.01)
+                return original(self)
+            finally:
+                with lock:
+                    in_flight.remove(self)
+
+        root = m.AsyncExternal(File('.'), limit=3)
+
+        async def main():
+            await asyncio.gather(
+                *[(root / str(i)).is_file() for i in range(20)])
+
+        with mock.patch.object(File, 'is_file', is_file):
+            run(main())
+
+        self.assertEqual(3, max(peak))
+
+    @within_temp_dir
+    def test_children_and_walk(self):
+        os.makedirs('a/b')
+        open('a/b/c', 'wb').close()
+        root = m.AsyncExternal(File('.'))
+
+        self.assertEqual(
+            ['a'], [x.name for x in run(collect(root.__aiter__()))])
+        self.assertEqual(['a'], [x.name for x in run(root.children())])
+        self.assertEqual(
+            ['a', 'b', 'c'], [x.name for x in run(collect(root.walk()))])
+
+    def test_walk_in_batches(self):
+        source = Memory()
+        for i in range(m.WALK_BATCH * 2 + 1):
+            (source / str(i)).content = b''
+        root = m.AsyncExternal(source)
+
+        self.assertEqual(
+            m.WALK_BATCH * 2 + 1, len(run(collect(root.walk()))))
+
+    @within_temp_dir
+    def test_copy_to(self):
+        source = m.AsyncExternal(Memory()) / 'x'
+        run(source.write(b'content'))
+        destination = m.AsyncExternal(File('.')) / 'y'
+
+        self.assertEqual(7, run(source.copy_to(destination)))
+        self.assertEqual(7, run(destination.copy_to(Memory() / 'z')))
+        self.assertEqual(7, run(source.copy_to(Memory() / 'z')))
+        with open('y', 'rb') as f:
+            self.assertEqual(b'content', f.read())
+
+    def test_equality(self):
+        root = Memory()
+        self.assertEqual(
+            m.AsyncExternal(root) / 'x', m.AsyncExternal(root / 'x'))
@@ -0,0 +1,247 @@
+from abc import ABCMeta, abstractmethod
+import io
+import os
+import tarfile
+import threading
+import unittest
+import zipfile
+import mock
+
+from temp_dir import within_temp_dir
+
+import externals.archive as m
+from externals import Memory, NoContentError
+
+
+CONTENTS = {
+    'a/b': b'ab' * 1000,
+    'a/c': b'ac',
+    'd': b'',
+    'e/f/g': b'efg',
+}
+
+
+def make_zip(path, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, 'w', compression) as archive:
+        archive.writestr('empty/', b'')
+        for name, content in sorted(CONTENTS.items()):
+            archive.writestr(name, content)
+
+
+def make_tar(path, mode='w'):
+    with tarfile.open(path, mode) as archive:
+        directory = tarfile.TarInfo('empty')
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+        for name, content in sorted(CONTENTS.items()):
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mtime = 1234567890
+            archive.addfile(info, io.BytesIO(content))
+
+
+class ArchiveTests(object):
+
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def open(self, **kwargs):  # pragma: no cover
+        '''\
+        I should return the archive external on an archive with CONTENTS,
+          made in the current directory
+        '''
+
+    @within_temp_dir
+    def test_contents(self):
+        with self.open() as archive:
+            for name, content in CONTENTS.items():
+                self.assertEqual(content, (archive / name).content)
+                with (archive / name).readable_stream() as stream:
+                    self.assertEqual(content, stream.read())
+            with self.assertRaises(NoContentError):
+                (archive / 'a').content
+            with self.assertRaises(NoContentError):
+                (archive / 'x').readable_stream()
+
+    @within_temp_dir
+    def test_listing(self):
+        with self.open() as archive:
+            self.assertEqual(
+                ['a', 'd', 'e', 'empty'], sorted(x.name for x in archive))
+            self.assertEqual(
+                ['/a/b', '/a/c'], sorted(x.path for x in archive / 'a'))
+            self.assertEqual([], list(archive / 'empty'))
+            self.assertEqual([], list(archive / 'x'))
+            self.assertTrue((archive / 'a').is_dir())
+            self.assertFalse((archive / 'a').is_file())
+            self.assertTrue((archive / 'd').is_file())
+            self.assertTrue((archive / 'e/f').exists())
+            self.assertFalse((archive / 'x').exists())
+            self.assertFalse(archive.is_file())
+
+    @within_temp_dir
+    def test_walk(self):
+        with self.open() as archive:
+            self.assertEqual(
+                ['/a', '/a/b', '/a/c', '/d', '/e', '/e/f', '/e/f/g',
+                 '/empty'],
+                sorted(x.path for x in archive.walk()))
+
+    @within_temp_dir
+    def test_stat(self):
+        with self.open() as archive:
+            stat = (archive / 'a/b').stat()
+            self.assertEqual(2000, stat.size)
+            self.assertIsNotNone(stat.mtime)
+            with self.assertRaises(NoContentError):
+                (archive / 'a').stat()
+
+    @within_temp_dir
+    def test_read_range(self):
+        with self.open() as archive:
+            x = archive / 'a/b'
+            self.assertEqual(b'ba', x.read_range(1, 2))
+            self.assertEqual(b'ab', x.read_range(1998, 10))
+            self.assertEqual(b'', x.read_range(2000, 10))
+            self.assertEqual(b'', x.read_range(3000, 10))
+            buffer = bytearray(4)
+            self.assertEqual(4, x.readinto_range(buffer, 2))
+            self.assertEqual(b'abab', bytes(buffer))
+            with self.assertRaises(ValueError):
+                x.read_range(-1, 1)
+            with self.assertRaises(NoContentError):
+                (archive / 'x').read_range(0, 1)
+
+    @within_temp_dir
+    def test_copy_to_memory(self):
+        with self.open() as archive:
+            memory = Memory() / 'copy'
+            self.assertEqual(2000, (archive / 'a/b').copy_to(memory))
+            self.assertEqual(CONTENTS['a/b'], memory.content)
+
+    @within_temp_dir
+    def test_is_read_only(self):
+        with self.open() as archive:
+            with self.assertRaises(TypeError):
+                (archive / 'a/b').content = b'x'
+            with self.assertRaises(TypeError):
+                (archive / 'a/b').delete()
+            with self.assertRaises(TypeError):
+                (archive / 'new').writable_stream()
+
+    @within_temp_dir
+    def test_concurrent_reads(self):
+        with self.open() as archive:
+            results = []
+
+            def read():
+                for _ in range(20):
+                    for name, content in CONTENTS.items():
+                        results.append(
+                            (archive / name).content == content)
+
+            threads = [threading.Thread(target=read) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertTrue(all(results))
+            self.assertEqual(4 * 20 * len(CONTENTS), len(results))
+
+    @within_temp_dir
+    def test_index_is_saved_and_reused(self):
+        with self.open(index='archive.index') as archive:
+            self.assertTrue(os.path.exists('archive.index'))
+            self.assertEqual(CONTENTS['a/c'], (archive / 'a/c').content)
+        with self.open(index='archive.index') as archive:
+            self.assertIsInstance(archive._archive.trie, m.ImageTrie)
+            self.assertEqual(CONTENTS['a/c'], (archive / 'a/c').content)
+            self.assertEqual(
+                ['a', 'd', 'e', 'empty'], sorted(x.name for x in archive))
+
+    @within_temp_dir
+    def test_changed_archive_is_indexed_again(self):
+        with self.open(index='archive.index') as archive:
+            pass
+        os.utime(archive._archive.path, (0, 0))
+        with self.open(index='archive.index') as archive:
+            self.assertIsInstance(archive._archive.trie, m.Trie)
+            self.assertEqual(CONTENTS['a/c'], (archive / 'a/c').content)
+
+    @within_temp_dir
+    def test_not_an_index_is_replaced(self):
+        with open('archive.index', 'wb') as f:
+            f.write(b'garbage' * 10)
+        with self.open(index='archive.index') as archive:
+            self.assertEqual(CONTENTS['d'], (archive / 'd').content)
+        with self.open(index='archive.index') as archive:
+            self.assertIsInstance(archive._archive.trie, m.ImageTrie)
+
+
+class Test_ZipArchive(unittest.TestCase, ArchiveTests):
+
+    def open(self, **kwargs):
+        if not os.path.exists('archive.zip'):
+            make_zip('archive.zip')
+        return m.ZipArchive('archive.zip', **kwargs)
+
+    @within_temp_dir
+    def test_stored_members_are_stored(self):
+        with self.open() as archive:
+            self.assertTrue(archive._archive.member(('a', 'b')).stored)
+
+
+class Test_ZipArchive_compressed(unittest.TestCase, ArchiveTests):
+
+    def open(self, **kwargs):
+        if not os.path.exists('archive.zip'):
+            make_zip('archive.zip', zipfile.ZIP_DEFLATED)
+        return m.ZipArchive('archive.zip', **kwargs)
+
+    @within_temp_dir
+    def test_compressed_members_are_not_stored(self):
+        with self.open() as archive:
+            self.assertFalse(archive._archive.member(('a', 'b')).stored)
+
+
+class Test_TarArchive(unittest.TestCase, ArchiveTests):
+
+    def open(self, **kwargs):
+        if not os.path.exists('archive.tar'):
+            make_tar('archive.tar')
+        return m.TarArchive('archive.tar', **kwargs)
+
+    @within_temp_dir
+    def test_members_are_stored(self):
+        with self.open() as archive:
+            member = archive._archive.member(('a', 'b'))
+            self.assertTrue(member.stored)
+            self.assertEqual(1234567890, member.mtime)
+
+
+class Test_TarArchive_compressed(unittest.TestCase, ArchiveTests):
+
+    def open(self, **kwargs):
+        if not os.path.exists('archive.tar.gz'):
+            make_tar('archive.tar.gz', 'w:gz')
+        return m.TarArchive('archive.tar.gz', **kwargs)
+
+    @within_temp_dir
+    def test_members_are_not_stored(self):
+        with self.open() as archive:
+            self.assertFalse(archive._archive.member(('a', 'b')).stored)
+
+    @within_temp_dir
+    def test_members_are_streamed(self):
+        with self.open() as archive:
+            # no lookup by name, which would scan the whole archive
+            with mock.patch.object(
+                    tarfile.TarFile, 'getmember', side_effect=AssertionError):
+                with mock.patch.object(
+                        tarfile.TarFile, 'extractfile',
+                        side_effect=AssertionError):
+                    with (archive / 'a/b').readable_stream() as stream:
+                        self.assertNotIsInstance(stream, io.BytesIO)
+                        self.assertEqual(b'abab', stream.read(4))
+                        self.assertEqual(b'ab' * 998, stream.read())
+            self.assertEqual(b'efg', (archive / 'e/f/g').content)
@@ -0,0 +1,171 @@
+import threading
+import unittest
+
+import externals.bounded as m
+from externals import NoContentError
+from externals.test import test_trie
+
+
+class Test_BoundedTrie(test_trie.Test_SizedTrie):
+
+    trie_class = m.BoundedTrie
+
+
+class Test_BoundedMemory(unittest.TestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        root = m.BoundedMemory(max_entries=2)
+        (root / 'a').content = b'a'
+        (root / 'b').content = b'b'
+        (root / 'a').content
+        (root / 'c').content = b'c'
+
+        self.assertTrue((root / 'a').is_file())
+        self.assertFalse((root / 'b').exists())
+        self.assertTrue((root / 'c').is_file())
+        self.assertEqual(1, root.evictions)
+        self.assertEqual(2, root.count())
+
+    def test_max_bytes(self):
+        root = m.BoundedMemory(max_bytes=10)
+        for name in 'abcd':
+            (root / name).content = b'xxxx'
+
+        self.assertEqual(['c', 'd'], sorted(x.name for x in root))
+        self.assertEqual(8, root.du())
+        self.assertEqual((2, 8), (root.evictions, root.evicted_bytes))
+
+    def test_overwrite_is_not_an_extra_entry(self):
+        root = m.BoundedMemory(max_entries=1)
+        (root / 'a').content = b'a'
+        (root / 'a').content = b'aa'
+        self.assertEqual(b'aa', (root / 'a').content)
+        self.assertEqual(0, root.evictions)
+
+    def test_content_bigger_than_the_budget_is_not_kept(self):
+        root = m.BoundedMemory(max_bytes=3)
+        (root / 'a').content = b'a'
+        (root / 'big').content = b'0123'
+        self.assertFalse((root / 'big').exists())
+        self.assertEqual(0, root.du())
+
+    def test_emptied_directories_are_pruned(self):
+        root = m.BoundedMemory(max_entries=2)
+        (root / 'x' / 'y' / 'a').content = b'a'
+        (root / 'x' / 'b').content = b'b'
+        (root / 'c').content = b'c'
+
+        self.assertFalse((root / 'x' / 'y').exists())
+        self.assertTrue((root / 'x').is_dir())
+        self.assertEqual(['c', 'x'], sorted(x.name for x in root))
+
+    def test_directory_content_is_evicted_without_children(self):
+        root = m.BoundedMemory(max_entries=2)
+        (root / 'd').content = b'd'
+        (root / 'd' / 'a').content = b'a'
+        (root / 'e').content = b'e'
+
+        self.assertFalse((root / 'd').is_file())
+        self.assertEqual(b'a', (root / 'd' / 'a').content)
+
+    def test_lfu_policy(self):
+        root = m.BoundedMemory(max_entries=2, policy=m.LFUPolicy())
+        (root / 'a').content = b'a'
+        (root / 'b').content = b'b'
+        for _ in range(3):
+            (root / 'a').content
+        (root / 'b').content
+        (root / 'c').content = b'c'
+        (root / 'd').content = b'd'
+
+        self.assertEqual(['a', 'd'], sorted(x.name for x in root))
+
+    def test_delete_forgets_contents(self):
+        root = m.BoundedMemory(max_entries=2)
+        (root / 'dir' / 'a').content = b'a'
+        (root / 'dir' / 'b').content = b'b'
+        (root / 'dir').delete()
+        (root / 'c').content = b'c'
+        (root / 'd').content = b'd'
+
+        self.assertEqual(0, root.evictions)
+        self.assertEqual(0, len(root._fs.policy) - 2)
+
+    def test_bulk_load(self):
+        root = m.BoundedMemory(max_entries=3)
+        root.bulk_load((('f', str(i)), b'x') for i in range(10))
+        self.assertEqual(3, root.count())
+        self.assertEqual(['7', '8', '9'], sorted(x.name for x in root / 'f'))
+        self.assertEqual(7, root.evictions)
+
+    def test_handles_share_the_budget(self):
+        root = m.BoundedMemory(max_entries=1)
+        other = m.BoundedMemory(root._fs) / 'x'
+        (root / 'a').content = b'a'
+        other.content = b'x'
+        self.assertFalse((root / 'a').exists())
+
+    def test_threads(self):
+        root = m.BoundedMemory(max_bytes=100)
+        errors = []
+
+        def write(name):
+            try:
+                for i in range(200):
+                    (root / name / str(i)).content = b'0123456789'
+                    try:
+                        (root / name / str(i // 2)).content
+                    except NoContentError:
+                        # evicted already
+                        pass
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=write, args=(str(n),)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(10, root.count())
+        self.assertEqual(100, root.du())
+        self.assertEqual(10, len(root._fs.policy))
+
+    def test_snapshot_keeps_the_limits(self):
+        root = m.BoundedMemory(max_entries=2, policy=m.LFUPolicy())
+        (root / 'a').content = b'a'
+        root._fs.extend(('empty', 'dir'))
+        fork = root.snapshot()
+        (root / 'b').content = b'b'
+
+        self.assertIsInstance(fork, m.BoundedMemory)
+        self.assertIsInstance(fork._fs.policy, m.LFUPolicy)
+        self.assertEqual((root / 'a').stat(), (fork / 'a').stat())
+        self.assertEqual(
+            [('a',), ('empty',), ('empty', 'dir')],
+            sorted(fork._fs.walk()))
+        self.assertFalse((fork / 'b').exists())
+        (fork / 'b').content = b'b'
+        (fork / 'c').content = b'c'
+        self.assertEqual(2, fork.count())
+        self.assertEqual(1, fork.evictions)
+        self.assertEqual(0, root.evictions)
+
+
+class Test_LFUPolicy(unittest.TestCase):
+
+    def test_ties_go_least_recently_used_first(self):
+        policy = m.LFUPolicy()
+        for path in 'abc':
+            policy.add(path)
+        policy.access('a')
+        self.assertEqual('b', policy.victim())
+        self.assertEqual('c', policy.victim(keep='b'))
+        policy.discard('b')
+        policy.discard('c')
+        self.assertEqual('a', policy.victim())
+        self.assertEqual('a', policy.victim(keep='a'))
+        policy.discard('a')
+        self.assertIsNone(policy.victim())
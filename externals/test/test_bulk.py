@@ -0,0 +1,227 @@
+import concurrent.futures
+import os
+import unittest
+import mock
+from temp_dir import within_temp_dir
+
+import externals.bulk as m
+from externals import Memory, File, working_directory
+from externals.mask import Mask
+from externals.overlay import Overlay
+
+
+TREE = {
+    'a/b/c': b'abc',
+    'a/d': b'ad',
+    'e': b'',
+    'f/g/h/i': b'fghi' * 1000,
+}
+
+
+def populate(root):
+    for path, content in TREE.items():
+        (root / path).content = content
+    return root
+
+
+def contents(root):
+    depth = len(root.path_segments)
+    return dict(
+        ('/'.join(x.path_segments[depth:]), bytes(x.content))
+        for x in root.walk()
+        if x.is_file())
+
+
+class Test_copy_tree(unittest.TestCase):
+
+    def check(self, source, destination, **kwargs):
+        stats = m.copy_tree(populate(source), destination, **kwargs)
+
+        self.assertEqual(TREE, contents(destination))
+        self.assertEqual(4, stats.files)
+        self.assertEqual(sum(len(c) for c in TREE.values()), stats.bytes)
+        self.assertGreaterEqual(stats.files_per_second, 0)
+        return stats
+
+    def test_memory_to_memory(self):
+        self.check(Memory() / 'source', Memory() / 'destination')
+
+    def test_memory_to_memory_serially(self):
+        self.check(Memory(), Memory() / 'x', workers=1)
+
+    @within_temp_dir
+    def test_memory_to_file(self):
+        self.check(Memory(), working_directory() / 'destination')
+
+    @within_temp_dir
+    def test_file_to_memory(self):
+        self.check(working_directory() / 'source', Memory())
+
+    @within_temp_dir
+    def test_file_to_file(self):
+        self.check(
+            working_directory() / 'source',
+            working_directory() / 'destination')
+
+    @within_temp_dir
+    def test_overlay_to_file(self):
+        overlay = Overlay(Memory(), Memory(), Mask())
+        self.check(overlay, working_directory() / 'destination')
+
+    def test_memory_to_overlay(self):
+        overlay = Overlay(Memory(), Memory(), Mask())
+        self.check(Memory(), overlay)
+
+    @within_temp_dir
+    def test_empty_directories_are_created(self):
+        os.makedirs('source/empty')
+
+        m.copy_tree(File('source'), File('destination'))
+
+        self.assertTrue(os.path.isdir('destination/empty'))
+
+    def test_many_files_on_few_threads(self):
+        source = Memory()
+        for i in range(200):
+            (source / 'dir' / str(i)).content = str(i).encode('ascii')
+        destination = Memory()
+
+        stats = m.copy_tree(source, destination, workers=2)
+
+        self.assertEqual(200, stats.files)
+        self.assertEqual(
+            [str(i).encode('ascii') for i in range(200)],
+            [(destination / 'dir' / str(i)).content for i in range(200)])
+
+    def test_single_file(self):
+        source = Memory() / 'file'
+        source.content = b'content'
+        destination = Memory() / 'copy'
+
+        stats = m.copy_tree(source, destination)
+
+        self.assertEqual(b'content', destination.content)
+        self.assertEqual(1, stats.files)
+
+    def test_errors_are_raised(self):
+        class Failing(Exception):
+            pass
+
+        original_copy_to = Memory.copy_to
+
+        def copy_to(self, other):
+            if self.name == 'c':
+                raise Failing
+            return original_copy_to(self, other)
+
+        with mock.patch.object(Memory, 'copy_to', copy_to):
+            with self.assertRaises(Failing):
+                m.copy_tree(populate(Memory()), Memory())
+
+
+class Test_read_many(unittest.TestCase):
+
+    def check(self, root, **kwargs):
+        populate(root)
+        externals = [root / path for path in TREE] + [root / 'missing']
+
+        results = list(m.read_many(externals, **kwargs))
+
+        self.assertEqual(len(externals), len(results))
+        contents = dict(
+            (x, bytes(content)) for x, content, error in results
+            if error is None)
+        self.assertEqual(
+            dict((root / path, content) for path, content in TREE.items()),
+            contents)
+        errors = [(x, error) for x, content, error in results if error]
+        self.assertEqual(1, len(errors))
+        self.assertEqual(root / 'missing', errors[0][0])
+
+    def test_memory(self):
+        self.check(Memory())
+
+    def test_memory_serially(self):
+        self.check(Memory(), workers=1)
+
+    @within_temp_dir
+    def test_file(self):
+        self.check(working_directory())
+
+    @within_temp_dir
+    def test_file_on_executor(self):
+        with concurrent.futures.ThreadPoolExecutor(3) as executor:
+            self.check(working_directory(), executor=executor)
+
+
+class Test_write_many(unittest.TestCase):
+
+    def check(self, root, **kwargs):
+        results = list(m.write_many(
+            dict((root / path, content) for path, content in TREE.items()),
+            **kwargs))
+
+        self.assertEqual(
+            set((root / path, None) for path in TREE), set(results))
+        self.assertEqual(TREE, contents(root))
+
+    def test_memory(self):
+        self.check(Memory())
+
+    def test_memory_serially(self):
+        self.check(Memory(), workers=1)
+
+    @within_temp_dir
+    def test_file(self):
+        self.check(working_directory())
+
+    def test_overlay(self):
+        self.check(Overlay(Memory(), Memory(), Mask()))
+
+    def test_writes_happen_without_iterating_the_results(self):
+        root = Memory()
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            m.write_many(
+                {root / 'a': b'1', root / 'b/c': b'2'}, executor=executor)
+        m.write_many({root / 'd': b'3'}, workers=1)
+
+        self.assertEqual(
+            {'a': b'1', 'b/c': b'2', 'd': b'3'}, contents(root))
+
+    def test_threads_are_shared_between_calls(self):
+        root = Memory()
+        for i in range(20):
+            list(m.write_many({root / str(i): b'x'}, workers=4))
+        self.assertIs(m._shared_executor(4), m._shared_executor(4))
+        self.assertLessEqual(len(m._shared_executor(4)._threads), 4)
+
+    def test_pairs(self):
+        root = Memory()
+        results = list(m.write_many([(root / 'a', b'1'), (root / 'b', b'2')]))
+        self.assertEqual(2, len(results))
+        self.assertEqual(b'2', (root / 'b').content)
+
+    @within_temp_dir
+    def test_parents_are_made_once(self):
+        root = working_directory()
+        items = dict(
+            (root / 'dir' / str(i), b'x') for i in range(20))
+
+        with mock.patch.object(File, 'make_dirs') as make_dirs:
+            list(m.write_many(items, workers=1))
+
+        self.assertEqual(1, make_dirs.call_count)
+
+    @within_temp_dir
+    def test_errors_are_collected_per_item(self):
+        with open('file', 'wb'):
+            pass
+        root = working_directory()
+
+        results = dict(m.write_many({
+            root / 'file' / 'below': b'x',
+            root / 'ok': b'y'}))
+
+        self.assertIsNone(results[root / 'ok'])
+        self.assertIsNotNone(results[root / 'file' / 'below'])
+        self.assertEqual(b'y', (root / 'ok').content)
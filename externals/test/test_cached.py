@@ -0,0 +1,207 @@
+import contextlib
+import os
+import unittest
+from temp_dir import in_temp_dir, within_temp_dir
+
+import externals.cached as m
+from externals import Memory, File, NoContentError
+from externals.compact_trie import CompactTrie
+from externals.test import common
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_CachedExternal(unittest.TestCase):
+
+    def test_second_read_is_a_hit(self):
+        backing = Memory()
+        (backing / 'x').content = b'content'
+        cached = m.CachedExternal(backing)
+
+        self.assertEqual(b'content', (cached / 'x').content)
+        self.assertEqual(b'content', (cached / 'x').content)
+
+        self.assertEqual((1, 1), (cached.stats.hits, cached.stats.misses))
+        self.assertEqual(7, cached.stats.bytes_saved)
+        self.assertEqual(0.5, cached.stats.hit_ratio)
+
+    def test_change_of_backing_is_noticed(self):
+        backing = Memory()
+        (backing / 'x').content = b'old'
+        cached = m.CachedExternal(backing)
+        (cached / 'x').content
+
+        (backing / 'x').content = b'newer'
+
+        self.assertEqual(b'newer', (cached / 'x').content)
+        self.assertEqual(0, cached.stats.hits)
+
+    def test_same_size_change_without_mtime_is_noticed(self):
+        backing = Memory(CompactTrie())
+        (backing / 'x').content = b'old'
+        cached = m.CachedExternal(backing)
+        self.assertIsNone((backing / 'x').stat().mtime)
+        (cached / 'x').content
+
+        (backing / 'x').content = b'new'
+
+        self.assertEqual(b'new', (cached / 'x').content)
+        self.assertEqual(0, cached.stats.hits)
+        self.assertFalse((cached._cache / 'x').exists())
+
+    def test_without_mtime_ttl_still_caches(self):
+        clock = Clock()
+        backing = Memory(CompactTrie())
+        (backing / 'x').content = b'old'
+        cached = m.CachedExternal(backing, ttl=10, clock=clock)
+        (cached / 'x').content
+        (backing / 'x').content = b'new'
+
+        self.assertEqual(b'old', (cached / 'x').content)
+        clock.now = 11
+        self.assertEqual(b'new', (cached / 'x').content)
+
+    def test_ttl_serves_without_validation(self):
+        clock = Clock()
+        backing = Memory()
+        (backing / 'x').content = b'old'
+        cached = m.CachedExternal(backing, ttl=10, clock=clock)
+        (cached / 'x').content
+        (backing / 'x').content = b'newer'
+
+        clock.now = 10
+        self.assertEqual(b'old', (cached / 'x').content)
+        clock.now = 11
+        self.assertEqual(b'newer', (cached / 'x').content)
+
+    def test_write_goes_through_and_invalidates(self):
+        backing = Memory()
+        cached = m.CachedExternal(backing)
+        x = cached / 'dir' / 'x'
+        x.content = b'1'
+        self.assertEqual(b'1', x.content)
+
+        x.content = b'2'
+
+        self.assertEqual(b'2', (backing / 'dir' / 'x').content)
+        self.assertEqual(b'2', x.content)
+
+    def test_writable_stream_invalidates_on_close(self):
+        clock = Clock()
+        cached = m.CachedExternal(Memory(), ttl=10, clock=clock)
+        x = cached / 'x'
+        x.content = b'1'
+        x.content
+        with x.writable_stream() as f:
+            f.write(b'2')
+        self.assertEqual(b'2', x.content)
+
+    def test_delete(self):
+        backing = Memory()
+        cached = m.CachedExternal(backing, ttl=10, clock=Clock())
+        x = cached / 'dir' / 'x'
+        x.content = b'1'
+        x.content
+
+        (cached / 'dir').delete()
+
+        self.assertFalse(x.exists())
+        with self.assertRaises(NoContentError):
+            x.content
+
+    def test_evicts_on_size(self):
+        backing = Memory()
+        for name in 'abc':
+            (backing / name).content = b'0123456789'
+        cached = m.CachedExternal(backing, max_bytes=25)
+
+        for name in 'abca':
+            (cached / name).content
+
+        self.assertEqual(0, cached.stats.hits)
+        self.assertEqual(20, cached._cache.du())
+
+    def test_listing_and_walk(self):
+        backing = Memory()
+        (backing / 'a' / 'b').content = b'ab'
+        cached = m.CachedExternal(backing)
+
+        self.assertEqual([cached / 'a'], list(cached))
+        self.assertEqual(
+            [cached / 'a', cached / 'a' / 'b'], list(cached.walk()))
+        self.assertEqual(b'ab', next(iter(cached / 'a')).content)
+
+    def test_readable_stream_and_ranges(self):
+        backing = Memory()
+        (backing / 'x').content = b'0123456789'
+        x = m.CachedExternal(backing) / 'x'
+        with x.readable_stream() as f:
+            self.assertEqual(b'0123456789', f.read())
+        self.assertEqual(b'345', x.read_range(3, 3))
+        self.assertEqual((1, 1), (x.stats.hits, x.stats.misses))
+        # only the bytes served count
+        self.assertEqual(3, x.stats.bytes_saved)
+        buffer = bytearray(4)
+        self.assertEqual(2, x.readinto_range(buffer, 8))
+        self.assertEqual(5, x.stats.bytes_saved)
+
+    def test_is_bounded_by_default(self):
+        cached = m.CachedExternal(Memory())
+        self.assertEqual(64 * 1024 ** 2, cached._cache._fs.max_bytes)
+
+    @within_temp_dir
+    def test_file(self):
+        with open('x', 'wb') as f:
+            f.write(b'1')
+        cached = m.CachedExternal(File('.'))
+        x = cached / 'x'
+        self.assertEqual(os.path.abspath('x'), x.backing.path)
+        self.assertEqual(b'1', x.content)
+        self.assertEqual(b'1', x.content)
+
+        with open('x', 'wb') as f:
+            f.write(b'22')
+
+        self.assertEqual(b'22', x.content)
+        self.assertEqual(1, cached.stats.hits)
+
+    def test_copy_to(self):
+        backing = Memory()
+        (backing / 'x').content = b'content'
+        x = m.CachedExternal(backing) / 'x'
+        destination = Memory() / 'y'
+        x.content
+
+        self.assertEqual(7, x.copy_to(destination))
+        self.assertEqual(b'content', destination.content)
+        self.assertEqual(1, x.stats.hits)
+
+
+class Test_CachedExternal_read_range(
+        unittest.TestCase, common.ReadRangeTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.CachedExternal(Memory())
+
+
+class Test_CachedExternal_stat(unittest.TestCase, common.StatTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with in_temp_dir():
+            yield m.CachedExternal(File('.'))
+
+
+class Test_CachedExternal_walk(unittest.TestCase, common.WalkTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.CachedExternal(Memory())
@@ -0,0 +1,123 @@
+import sys
+import threading
+import unittest
+
+import externals.compact_trie as m
+from externals import Memory
+from externals.test import test_trie
+
+
+class Test_CompactTrie(test_trie.Test_Trie):
+
+    trie_class = m.CompactTrie
+
+    def test_mtime(self):
+        t = self.trie_class()
+        t[('a', 'b')] = 'ab'
+        self.assertIsNone(t.mtime(('a', 'b')))
+        # no node for the leaf
+        self.assertEqual('ab', t._root.get(t._ids['a']).get(t._ids['b']))
+
+
+class TimedCompactTrie(m.CompactTrie):
+
+    def __init__(self, mtimes=True):
+        super(TimedCompactTrie, self).__init__(mtimes=True)
+
+
+class Test_CompactTrie_with_mtimes(test_trie.Test_Trie):
+
+    trie_class = TimedCompactTrie
+
+
+class Test_CompactTrie_fanout(unittest.TestCase):
+
+    def test_many_children(self):
+        t = m.CompactTrie()
+        names = ['child-{:03}'.format(i) for i in range(100)]
+        for name in reversed(names):
+            t[('dir', name)] = name
+
+        self.assertEqual(set(names), set(t.children(['dir'])))
+        for name in names:
+            self.assertEqual(name, t[('dir', name)])
+
+    def test_delete_from_small_and_large_fanouts(self):
+        for count in (3, m.MAX_SMALL_FANOUT + 5):
+            t = m.CompactTrie()
+            for i in range(count):
+                t[(str(i),)] = i
+
+            t.delete(['1'])
+
+            self.assertFalse(t.has_content(['1']))
+            self.assertEqual(count - 1, len(t.children(())))
+            self.assertEqual(0, t[('0',)])
+
+    def test_names_are_interned(self):
+        t = m.CompactTrie()
+        for i in range(10):
+            t[(str(i), 'data', 'part-00000')] = i
+
+        self.assertEqual(12, len(t._names))
+
+
+class Test_CompactTrie_threads(unittest.TestCase):
+
+    def setUp(self):
+        interval = sys.getswitchinterval()
+        self.addCleanup(sys.setswitchinterval, interval)
+        sys.setswitchinterval(1e-6)
+
+    def test_readers_see_consistent_children(self):
+        for trial in range(10):
+            t = m.CompactTrie()
+            names = ['a{:03}'.format(i) for i in range(2 * m.MAX_SMALL_FANOUT)]
+            # interned before 'zzz': inserting them shifts its position
+            t.update(((name,), None) for name in names)
+            t[('d', 'zzz')] = 'zzz'
+            done = threading.Event()
+            errors = []
+
+            def write():
+                try:
+                    for i, name in enumerate(names):
+                        t[('d', name)] = i
+                finally:
+                    done.set()
+
+            def read():
+                try:
+                    while not done.is_set():
+                        content = t[('d', 'zzz')]
+                        if content != 'zzz':
+                            errors.append(content)
+                except Exception as e:  # pragma: no cover
+                    errors.append(e)
+
+            threads = [threading.Thread(target=f) for f in (read, write)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual([], errors)
+
+
+class Test_Memory_with_CompactTrie(unittest.TestCase):
+
+    def test_content(self):
+        root = Memory(fs=m.CompactTrie())
+        (root / 'a/b').content = b'ab'
+
+        self.assertEqual(b'ab', (root / 'a/b').content)
+        self.assertTrue((root / 'a').is_dir())
+        self.assertEqual(['b'], [x.name for x in root / 'a'])
+
+    def test_walk(self):
+        root = Memory(fs=m.CompactTrie())
+        (root / 'a/b').content = b'ab'
+        (root / 'c').content = b'c'
+
+        self.assertEqual(
+            ['/a', '/a/b', '/c'], sorted(x.path for x in root.walk()))
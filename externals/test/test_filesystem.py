@@ -2,11 +2,14 @@
 import unittest
 import os
 import contextlib
+import mock
 from temp_dir import in_temp_dir, within_temp_dir
 
 import externals.filesystem as m
 from externals.test import common
-from externals import NoContentError
+from externals import NoContentError, Memory
+from externals.external import copy_stream
+from externals.statcache import StatCache
 
 
 class TestFsRoot(unittest.TestCase, common.RootTests):
@@ -33,6 +36,12 @@ class TestFile(unittest.TestCase):
     def test_this_file_is_not_a_directory(self):
         self.assertFalse(self._get_existing_file().is_dir())
 
+    def test_equality(self):
+        self.assertEqual(m.File('/a/b'), m.File('/a') / 'b')
+        self.assertEqual(hash(m.File('/a/b')), hash(m.File('/a') / 'b'))
+        self.assertNotEqual(m.File('/a/b'), m.File('/a'))
+        self.assertNotEqual(m.File('/a'), Memory() / 'a')
+
     def test_name_is_last_segment_of_path(self):
         x = m.File('/a/last')
         self.assertEqual('last', x.name)
@@ -198,6 +207,103 @@ class TestFile(unittest.TestCase):
             (x_tempdir / '/dir-a/dir-b/file/').content)
 
 
+class Test_File_listing(unittest.TestCase):
+
+    def _children_by_name(self):
+        return dict((x.name, x) for x in m.working_directory())
+
+    @within_temp_dir
+    def test_child_types_are_known_without_stat(self):
+        (m.working_directory() / 'file').content = b'file'
+        os.mkdir('dir')
+
+        children = self._children_by_name()
+        with mock.patch('os.stat', side_effect=AssertionError):
+            self.assertTrue(children['file'].is_file())
+            self.assertFalse(children['file'].is_dir())
+            self.assertTrue(children['dir'].is_dir())
+            self.assertFalse(children['dir'].is_file())
+            self.assertTrue(children['dir'].exists())
+
+    @within_temp_dir
+    def test_broken_symlink_child_does_not_exist(self):
+        os.symlink('nonexistent', 'broken')
+
+        broken = self._children_by_name()['broken']
+
+        self.assertFalse(broken.exists())
+        self.assertFalse(broken.is_file())
+
+    @within_temp_dir
+    def test_deleted_child_is_not_seen_as_existing(self):
+        os.makedirs('dir/subdir')
+
+        child = self._children_by_name()['dir']
+        child.delete()
+
+        self.assertFalse(child.exists())
+        self.assertFalse(child.is_dir())
+
+    @within_temp_dir
+    def test_children_have_canonical_paths(self):
+        os.mkdir('dir')
+
+        child = self._children_by_name()['dir']
+
+        self.assertEqual(os.path.realpath('dir'), child.path)
+
+
+class Test_File_path_resolution(unittest.TestCase):
+
+    def test_lexical_path_does_not_touch_the_disk(self):
+        with mock.patch('os.lstat', side_effect=AssertionError):
+            with mock.patch('os.readlink', side_effect=AssertionError):
+                x = m.File('/a/./b/../c', resolve=m.lexical_path)
+                y = x / '../d/./e'
+
+        self.assertEqual('/a/c', x.path)
+        self.assertEqual('/a/d/e', y.path)
+
+    def test_dots_are_resolved_with_realpath_by_default(self):
+        self.assertEqual('/a/c', (m.File('/a/b') / '../c').path)
+        self.assertEqual('/a/b', (m.File('/a/b') / '.').path)
+
+    @within_temp_dir
+    def test_lexical_and_real_paths_differ_with_symlinks(self):
+        os.makedirs('target/sub')
+        os.mkdir('dir')
+        os.symlink(os.path.abspath('target/sub'), 'dir/link')
+
+        real = m.File('dir/link/..')
+        lexical = m.File('dir/link/..', resolve=m.lexical_path)
+
+        self.assertEqual(os.path.realpath('target'), real.path)
+        self.assertEqual(os.path.abspath('dir'), lexical.path)
+
+    def test_resolution_is_inherited(self):
+        resolve = mock.Mock(side_effect=m.lexical_path)
+
+        (m.File('/a', resolve=resolve) / 'b' / '../c')
+
+        self.assertEqual(2, resolve.call_count)
+
+    @within_temp_dir
+    def test_realpath_cache(self):
+        os.mkdir('target')
+        os.symlink('target', 'link')
+        cache = m.RealpathCache(maxsize=1)
+
+        x1 = m.File('link', resolve=cache)
+        x2 = m.File('link', resolve=cache)
+        m.File('other', resolve=cache)
+        x3 = m.File('link', resolve=cache)
+
+        self.assertEqual(os.path.realpath('target'), x1.path)
+        self.assertEqual(x1, x2)
+        self.assertEqual(x1, x3)
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+
 class Test_working_directory(unittest.TestCase):
 
     def test_working_directory_is_an_fspath(self):
@@ -221,3 +327,136 @@ class Test_File_copy_to(
             x = m.working_directory() / 'temporary file'
             x.content = b'something smallish'
             yield x
+
+
+class Test_File_copy_to_File(unittest.TestCase):
+
+    @within_temp_dir
+    def test_content_is_copied(self):
+        source = m.working_directory() / 'source'
+        source.content = b'x' * 3000000 + b'end'
+        destination = m.working_directory() / 'dir' / 'destination'
+
+        self.assertEqual(3000003, source.copy_to(destination))
+
+        self.assertEqual(source.content, destination.content)
+
+    @within_temp_dir
+    def test_empty_file(self):
+        source = m.working_directory() / 'source'
+        source.content = b''
+        destination = m.working_directory() / 'destination'
+
+        self.assertEqual(0, source.copy_to(destination))
+
+        self.assertEqual(b'', destination.content)
+
+    @within_temp_dir
+    def test_copy_file_range_copying_nothing_is_not_trusted(self):
+        # as on kernels copying nothing from procfs/sysfs files
+        source = m.working_directory() / 'source'
+        source.content = b'content'
+        destination = m.working_directory() / 'destination'
+
+        with mock.patch.object(m, '_clone', return_value=None):
+            with mock.patch.object(
+                    m.os, 'copy_file_range', return_value=0, create=True):
+                self.assertEqual(7, source.copy_to(destination))
+
+        self.assertEqual(b'content', destination.content)
+
+    @unittest.skipUnless(
+        os.path.exists('/proc/self/status'), 'needs procfs')
+    @within_temp_dir
+    def test_pseudo_file(self):
+        source = m.File('/proc/self/status')
+        destination = m.working_directory() / 'status'
+
+        self.assertGreater(source.copy_to(destination), 0)
+
+        self.assertIn(b'Name:', destination.content)
+
+    @within_temp_dir
+    def test_buffer_copy_fallback(self):
+        source = m.working_directory() / 'source'
+        source.content = b'fallback'
+        destination = m.working_directory() / 'destination'
+
+        with source.readable_stream() as r, destination.writable_stream() as w:
+            self.assertEqual(8, copy_stream(r, w, max_block_size=3))
+
+        self.assertEqual(b'fallback', destination.content)
+
+
+class Test_File_copy_to_Memory(unittest.TestCase):
+
+    @within_temp_dir
+    def test_content_is_copied_into_one_buffer(self):
+        source = m.working_directory() / 'source'
+        source.content = b'y' * 2000000
+        destination = Memory() / 'destination'
+
+        self.assertEqual(2000000, source.copy_to(destination))
+
+        self.assertEqual(source.content, destination.content)
+
+
+class Test_walk(unittest.TestCase, common.WalkTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with in_temp_dir():
+            yield m.working_directory()
+
+    @within_temp_dir
+    def test_symlinked_directories_are_not_followed(self):
+        (m.working_directory() / 'dir' / 'file').content = b''
+        os.symlink('dir', 'link')
+
+        names = sorted(x.name for x in m.working_directory().walk())
+
+        self.assertEqual(['dir', 'file', 'link'], names)
+
+
+class Test_read_range(unittest.TestCase, common.ReadRangeTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with in_temp_dir():
+            yield m.working_directory()
+
+    @within_temp_dir
+    def test_read_range_of_directory(self):
+        os.mkdir('dir')
+        with self.assertRaises(NoContentError):
+            m.File('dir').read_range(0, 1)
+        with self.assertRaises(NoContentError):
+            m.File('dir').readinto_range(bytearray(1), 0)
+
+
+class Test_stat(unittest.TestCase, common.StatTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with in_temp_dir():
+            yield m.working_directory()
+
+    @within_temp_dir
+    def test_matches_os_stat(self):
+        with open('file', 'wb') as f:
+            f.write(b'content')
+        result = os.stat('file')
+        self.assertEqual(
+            m.Stat(result.st_size, result.st_mtime), m.File('file').stat())
+
+    @within_temp_dir
+    def test_with_stat_cache(self):
+        with open('file', 'wb') as f:
+            f.write(b'content')
+        cache = StatCache()
+        x = m.File('file', stat_cache=cache)
+        x.stat()
+        self.assertEqual(7, x.stat().size)
+        self.assertEqual(1, cache.hits)
+        with self.assertRaises(NoContentError):
+            m.File('missing', stat_cache=cache).stat()
@@ -0,0 +1,175 @@
+# coding: utf8
+import os
+import unittest
+import mock
+
+from temp_dir import within_temp_dir
+
+import externals.image as m
+from externals import Memory, NoContentError
+
+
+def memory_abcd():
+    mem = Memory()
+    (mem / 'a/b').content = b'ab'
+    (mem / 'a/c').content = b'ac'
+    (mem / 'a').content = b'a'
+    (mem / 'd').content = b'd'
+    (mem / 'e/f/g').content = b''
+    return mem
+
+
+def reopen(mem):
+    mem.save_image('image')
+    return Memory.open_image('image')
+
+
+class Test_image(unittest.TestCase):
+
+    @within_temp_dir
+    def test_contents(self):
+        image = reopen(memory_abcd())
+        self.assertEqual(b'a', (image / 'a').content)
+        self.assertEqual(b'ab', (image / 'a/b').content)
+        self.assertEqual(b'ac', (image / 'a/c').content)
+        self.assertEqual(b'd', (image / 'd').content)
+        self.assertEqual(b'', (image / 'e/f/g').content)
+        self.assertIsNone((image / 'e/f').content)
+        with self.assertRaises(NoContentError):
+            (image / 'x').content
+
+    @within_temp_dir
+    def test_content_is_a_view_into_the_mapping(self):
+        image = reopen(memory_abcd())
+        content = (image / 'a/b').content
+        self.assertIsInstance(content, memoryview)
+        self.assertTrue(content.readonly)
+        self.assertEqual(b'ab', (image / 'a/b').read_range(0, 10))
+
+    @within_temp_dir
+    def test_listing(self):
+        image = reopen(memory_abcd())
+        self.assertEqual(['a', 'd', 'e'], [x.name for x in image])
+        self.assertEqual(['b', 'c'], [x.name for x in image / 'a'])
+        self.assertEqual([], list(image / 'd'))
+        self.assertTrue((image / 'a').is_file())
+        self.assertTrue((image / 'a').is_dir())
+        self.assertTrue((image / 'e/f').is_dir())
+        self.assertFalse((image / 'e/f').is_file())
+        self.assertFalse((image / 'x').exists())
+        self.assertFalse((image / 'd/x').exists())
+
+    @within_temp_dir
+    def test_walk(self):
+        mem = memory_abcd()
+        image = reopen(mem)
+        for depth_first in (True, False):
+            self.assertEqual(
+                [x.path for x in mem.walk(depth_first=depth_first)],
+                [x.path for x in image.walk(depth_first=depth_first)])
+        self.assertEqual(
+            ['/a', '/d', '/e', '/e/f'],
+            [x.path for x in image.walk(
+                max_depth=2, prune=lambda x: x.name == 'a')])
+        self.assertEqual([], list((image / 'x').walk()))
+
+    @within_temp_dir
+    def test_many_children_and_unicode_names(self):
+        mem = Memory()
+        names = [u'{}é'.format(i) for i in range(1000)]
+        for name in names:
+            (mem / 'dir' / name).content = name.encode('utf8')
+        image = reopen(mem)
+        for name in names:
+            self.assertEqual(
+                name.encode('utf8'), (image / 'dir' / name).content)
+        self.assertEqual(
+            sorted(names), sorted(x.name for x in image / 'dir'))
+        self.assertFalse((image / 'dir' / 'x').exists())
+
+    @within_temp_dir
+    def test_saves_the_subtree(self):
+        image = reopen(memory_abcd() / 'a')
+        self.assertEqual(b'a', image.content)
+        self.assertEqual(['b', 'c'], [x.name for x in image])
+
+    @within_temp_dir
+    def test_stat_keeps_mtimes(self):
+        mem = memory_abcd()
+        mem.bulk_load([(('loaded',), b'12345')])
+        image = reopen(mem)
+        self.assertEqual((mem / 'a/b').stat(), (image / 'a/b').stat())
+        self.assertIsNotNone((image / 'a/b').stat().mtime)
+        self.assertEqual(5, (image / 'loaded').stat().size)
+        self.assertIsNone((image / 'loaded').stat().mtime)
+
+    @within_temp_dir
+    def test_empty(self):
+        image = reopen(Memory())
+        self.assertEqual([], list(image))
+        self.assertFalse(image.is_file())
+
+    @within_temp_dir
+    def test_is_read_only(self):
+        image = reopen(memory_abcd())
+        with self.assertRaises(TypeError):
+            (image / 'a').content = b'changed'
+        with self.assertRaises(TypeError):
+            (image / 'a').delete()
+        with self.assertRaises(TypeError):
+            image.bulk_load([(('x',), b'x')])
+        self.assertEqual(b'a', (image / 'a').content)
+
+    @within_temp_dir
+    def test_saving_again_leaves_open_images_unchanged(self):
+        mem = memory_abcd()
+        image = reopen(mem)
+        (mem / 'a').content = b'changed'
+        mem.save_image('image')
+        self.assertEqual(b'a', (image / 'a').content)
+        self.assertEqual(
+            b'changed', (Memory.open_image('image') / 'a').content)
+
+    @within_temp_dir
+    def test_image_of_an_image(self):
+        mem = memory_abcd()
+        image = reopen(reopen(mem))
+        self.assertEqual(
+            [(x.path, x.content) for x in mem.walk() if x.is_file()],
+            [(x.path, x.content) for x in image.walk() if x.is_file()])
+
+    @within_temp_dir
+    def test_not_an_image(self):
+        with open('other', 'wb') as f:
+            f.write(b'x' * 100)
+        with self.assertRaises(ValueError):
+            m.ImageTrie('other')
+
+    @within_temp_dir
+    def test_close(self):
+        memory_abcd().save_image('image')
+        with m.ImageTrie('image') as trie:
+            content = trie[('a', 'b')]
+            with self.assertRaises(BufferError):
+                trie.close()
+            # still usable
+            self.assertEqual(b'ab', trie[('a', 'b')])
+            content.release()
+        with self.assertRaises(ValueError):
+            trie[('a',)]
+
+    @within_temp_dir
+    def test_failed_save_leaves_the_old_image(self):
+        mem = memory_abcd()
+        mem.save_image('image')
+        (mem / 'a').content = b'changed'
+        with mock.patch.object(os, 'replace', side_effect=OSError):
+            with self.assertRaises(OSError):
+                mem.save_image('image')
+        self.assertEqual(['image'], os.listdir('.'))
+        self.assertEqual(b'a', (Memory.open_image('image') / 'a').content)
+
+    @within_temp_dir
+    def test_saved_image_is_not_private(self):
+        memory_abcd().save_image('image')
+        self.assertEqual(0o666 & ~m._UMASK, os.stat('image').st_mode & 0o777)
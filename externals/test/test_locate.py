@@ -1,6 +1,8 @@
 # coding: utf8
 import unittest
+import mock
 
+from externals import Memory
 from externals.external import Path
 import externals.locate as m
 
@@ -72,3 +74,78 @@ class Test_locate(unittest.TestCase):
     def test_locate_ab_z_raises_NotFoundError(self):
         with self.assertRaises(m.NotFoundError):
             m.locate(ConcretePath('/a/b'), 'z')
+
+
+class Test_locate_many(unittest.TestCase):
+
+    def setUp(self):
+        # same structure as above
+        self.root = Memory()
+        for path in ('a/b/x', 'a/y', 'x', '.git'):
+            (self.root / path).content = b''
+
+    def test_all_names_are_located(self):
+        located = m.locate_many(
+            self.root / 'a/b', ['b', 'x', 'y', '.git', 'z', 'b/x', 'a/z'])
+
+        self.assertEqual(
+            {
+                'b': '/a/b',
+                'x': '/a/b/x',
+                'y': '/a/y',
+                '.git': '/.git',
+                'b/x': '/a/b/x',
+            },
+            dict((name, x.path) for name, x in located.items()))
+
+    def test_results_are_the_same_as_for_locate(self):
+        for start in ('/', '/a', '/a/b', '/a/b/x'):
+            located = m.locate_many(self.root / start, ['x', 'y', '.git'])
+            for name in ('x', 'y', '.git'):
+                try:
+                    expected = m.locate(self.root / start, name)
+                except m.NotFoundError:
+                    expected = None
+                self.assertEqual(expected, located.get(name))
+
+    def test_each_parent_is_listed_once(self):
+        listed = []
+        original = Memory.__iter__
+
+        def listing(x):
+            listed.append(x.path)
+            return original(x)
+
+        with mock.patch.object(Memory, '__iter__', listing):
+            m.locate_many(self.root / 'a/b', ['.git', 'z', 'zz'])
+
+        self.assertEqual(['/a/b', '/a', '/'], listed)
+
+    def test_cache_is_used_from_sibling_directory(self):
+        cache = {}
+        m.locate_many(self.root / 'a/b', ['.git'], cache=cache)
+
+        with mock.patch.object(
+                Memory, '__iter__', side_effect=AssertionError):
+            located = m.locate_many(self.root / 'a', ['.git', 'z'], cache)
+
+        self.assertEqual(['.git'], list(located))
+
+    def test_directory_that_can_not_be_listed(self):
+        original = Memory.__iter__
+
+        def listing(x):
+            if x.path == '/a':
+                # search-only permission
+                raise PermissionError(13, 'Permission denied', x.path)
+            return original(x)
+
+        cache = {}
+        with mock.patch.object(Memory, '__iter__', listing):
+            located = m.locate_many(
+                self.root / 'a/b', ['y', '.git', 'z'], cache)
+
+        self.assertEqual(
+            {'y': '/a/y', '.git': '/.git'},
+            dict((name, x.path) for name, x in located.items()))
+        self.assertNotIn(self.root / 'a', cache)
@@ -73,3 +73,35 @@ class Test_Mask(unittest.TestCase):
         mask.drill(B_C)
         self.assertFalse(mask.covered(B_))
         self.assertFalse(mask.covered(B_C_D))
+
+
+class Test_Mask_uncovered(unittest.TestCase):
+
+    NAMES = ('a', 'b', 'c', 'd')
+
+    def check(self, mask):
+        for path in (ROOT, A_, A_B, B_, B_C, B_C_D, ('x', 'y')):
+            self.assertEqual(
+                [
+                    name for name in self.NAMES
+                    if not mask.covered(path + (name,))],
+                list(mask.uncovered(path, self.NAMES)),
+                path)
+
+    def test_empty_mask(self):
+        self.check(m.Mask())
+
+    def test_covered_root_drilled(self):
+        mask = m.Mask()
+        mask.cover(ROOT)
+        mask.drill(A_B)
+        mask.drill(B_C_D)
+        self.check(mask)
+
+    def test_covered_branches(self):
+        mask = m.Mask()
+        mask.cover(A_B)
+        mask.cover(B_C)
+        mask.drill(B_C_D)
+        mask.cover(('x',))
+        self.check(mask)
@@ -1,10 +1,13 @@
 # coding: utf8
+import array
 import unittest
 import contextlib
+import mock
 
 import externals.memory as m
 from externals.test import common
 from externals import NoContentError
+from externals.trie import SizedTrie
 
 
 class TestMemoryRoot(unittest.TestCase, common.RootTests):
@@ -78,6 +81,54 @@ class Test_Memory(unittest.TestCase):
             f.write(b'23')
         self.assertEqual(b'FILE123', x.content)
 
+    def test_readable_stream_seek_and_readinto(self):
+        x = m.Memory()
+        x.content = b'0123456789'
+        with x.readable_stream() as f:
+            f.seek(-4, 2)
+            buffer = bytearray(3)
+            self.assertEqual(3, f.readinto(buffer))
+            self.assertEqual(b'678', bytes(buffer))
+            self.assertEqual(9, f.tell())
+            self.assertEqual(b'9', f.read(5))
+            self.assertEqual(b'', f.read())
+
+    def test_content_view_shares_memory_with_content(self):
+        x = m.Memory()
+        content = bytearray(b'shared')
+        x.content = content
+        view = x.content_view()
+        content[0:1] = b'S'
+        self.assertEqual(b'Shared', view.tobytes())
+        self.assertTrue(view.readonly)
+
+    def test_content_view_of_nonexistent_raises(self):
+        with self.assertRaises(NoContentError):
+            (m.Memory() / 'nonexistent').content_view()
+
+    def test_writable_stream_hands_over_its_buffer(self):
+        x = m.Memory() / 'file'
+        with x.writable_stream() as f:
+            f.write(b'abc')
+            f.write(memoryview(b'def'))
+            self.assertEqual(6, f.tell())
+        content = x.content
+        self.assertEqual(b'abcdef', content)
+        # the same object is served, no copies on read either
+        self.assertIs(content, x.content_view().obj)
+        self.assertIsInstance(content, bytearray)
+
+    def test_closed_writable_stream_can_not_change_the_content(self):
+        x = m.Memory() / 'file'
+        with x.writable_stream() as f:
+            f.write(b'abc')
+        with self.assertRaises(ValueError):
+            f.write(b'XYZ')
+        with self.assertRaises(ValueError):
+            f.tell()
+        f.close()
+        self.assertEqual(b'abc', x.content)
+
     def test_children(self):
         x = m.Memory()
         (x / 'a' / 'b').content = 'content of a/b'
@@ -155,3 +206,149 @@ class Test_copy_to(unittest.TestCase, common.External_copy_to_Tests):
         x = m.Memory()
         x.content = 'small content'
         yield x
+
+
+class Test_walk(unittest.TestCase, common.WalkTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Memory() / 'root'
+
+    def test_walk_of_nonexistent(self):
+        self.assertEqual([], list((m.Memory() / 'x').walk()))
+
+    def test_delete_while_walking(self):
+        root = m.Memory()
+        for path in ('a/b', 'a/c', 'd', 'e/f/g'):
+            (root / path).content = b'x'
+        for x in root.walk():
+            x.delete()
+        self.assertEqual([], list(root))
+
+    def test_delete_while_iterating(self):
+        root = m.Memory()
+        for path in ('a', 'b', 'c'):
+            (root / path).content = b'x'
+        for x in root:
+            x.delete()
+        self.assertEqual([], list(root))
+
+
+class Test_bulk_load(unittest.TestCase):
+
+    def test_contents_are_loaded_below(self):
+        root = m.Memory()
+        (root / 'x').content = b'x'
+        target = root / 'loaded'
+
+        target.bulk_load([
+            (('a', 'b'), b'ab'),
+            (('a', 'c'), b'ac'),
+            (('d',), b'd'),
+        ])
+
+        self.assertEqual(b'x', (root / 'x').content)
+        self.assertEqual(b'ab', (target / 'a/b').content)
+        self.assertEqual(b'ac', (target / 'a/c').content)
+        self.assertEqual(b'd', (root / 'loaded/d').content)
+
+
+class Test_identity(unittest.TestCase):
+
+    def test_same_path_in_same_tree_is_equal(self):
+        root = m.Memory()
+        self.assertEqual(root / 'a/b', root / 'a' / 'b')
+        self.assertEqual(hash(root / 'a/b'), hash(root / 'a' / 'b'))
+        self.assertEqual(1, len(set([root / 'a/b', root / 'a' / 'b'])))
+
+    def test_same_path_in_other_tree_is_not_equal(self):
+        self.assertNotEqual(m.Memory() / 'a', m.Memory() / 'a')
+
+    def test_other_path_is_not_equal(self):
+        root = m.Memory()
+        self.assertNotEqual(root / 'a', root / 'b')
+        self.assertNotEqual(root / 'a', 'a')
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            m.Memory().__dict__
+
+    def test_path_is_computed_once(self):
+        x = m.Memory() / 'a/b'
+        self.assertIs(x.path, x.path)
+        self.assertEqual('/a/b', x.path)
+
+
+class Test_read_range(unittest.TestCase, common.ReadRangeTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Memory()
+
+
+class Test_stat(unittest.TestCase, common.StatTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Memory()
+
+    def test_bulk_loaded_content_has_no_mtime(self):
+        root = m.Memory()
+        (root / 'dir' / 'a').content = b'old'
+        (root / 'dir').bulk_load([(('a',), b'0123'), (('b',), b'')])
+        self.assertEqual(
+            m.Stat(4, None), (root / 'dir' / 'a').stat())
+        self.assertEqual(m.Stat(0, None), (root / 'dir' / 'b').stat())
+
+    def test_mtime_is_shared_by_handles_of_the_same_trie(self):
+        fs = SizedTrie()
+        (m.Memory(fs) / 'x').content = b'x'
+        self.assertIsNotNone((m.Memory(fs) / 'x').stat().mtime)
+
+    def test_mtime_is_forgotten_with_deleted_directory(self):
+        root = m.Memory()
+        (root / 'dir' / 'a').content = b'a'
+        (root / 'dir').delete()
+        root.bulk_load([(('dir', 'a'), b'new')])
+        self.assertIsNone((root / 'dir' / 'a').stat().mtime)
+
+
+class Test_du(unittest.TestCase):
+
+    def populate(self, fs):
+        root = m.Memory(fs)
+        (root / 'a' / 'b').content = b'ab'
+        (root / 'a' / 'c' / 'd').content = b'acd'
+        (root / 'e').content = b''
+        return root
+
+    def check(self, fs):
+        root = self.populate(fs)
+        self.assertEqual((5, 3), (root.du(), root.count()))
+        self.assertEqual((5, 2), ((root / 'a').du(), (root / 'a').count()))
+        self.assertEqual(
+            (2, 1), ((root / 'a' / 'b').du(), (root / 'a' / 'b').count()))
+        self.assertEqual((0, 0), ((root / 'x').du(), (root / 'x').count()))
+
+        (root / 'a' / 'c').delete()
+        (root / 'a' / 'b').content = b'abab'
+        self.assertEqual((4, 2), (root.du(), root.count()))
+
+    def test_sized_trie(self):
+        self.check(SizedTrie())
+
+    def test_plain_trie(self):
+        self.check(None)
+
+    def test_sized_trie_is_used(self):
+        root = self.populate(SizedTrie())
+        with mock.patch.object(m.Memory, 'walk') as walk:
+            self.assertEqual(5, root.du())
+        self.assertFalse(walk.called)
+
+    def test_sized_trie_counts_bytes_as_stat(self):
+        for fs in (SizedTrie(), None):
+            root = m.Memory(fs)
+            (root / 'a').content = array.array('d', [1.0, 2.0])
+            self.assertEqual(16, (root / 'a').stat().size)
+            self.assertEqual(16, root.du())
@@ -1,10 +1,13 @@
 from __future__ import unicode_literals
 
 import unittest
+import contextlib
+import mock
 
 import externals.overlay as m
 from externals import Memory, NoContentError
 from externals.mask import Mask
+from externals.test import common
 
 SOME_TEXT = b'some content'
 SOME_OTHER_TEXT = b'some other content'
@@ -16,7 +19,9 @@ SOME_PATH = 'some/path'
 
 class OverlayFixture(object):
 
-    def __init__(self, readonly_text=None, writable_text=None, path=''):
+    def __init__(
+            self, readonly_text=None, writable_text=None, path='',
+            exclusive_layers=False):
         self.readonly = Memory()
         if readonly_text is not None:
             (self.readonly / path).content = readonly_text
@@ -27,7 +32,9 @@ class OverlayFixture(object):
 
         self.mask = Mask()
 
-        self.root_overlay = m.Overlay(self.readonly, self.writable, self.mask)
+        self.root_overlay = m.Overlay(
+            self.readonly, self.writable, self.mask,
+            exclusive_layers=exclusive_layers)
         self.overlay = self.root_overlay / path
 
 
@@ -218,3 +225,176 @@ class Test_Overlay_children(unittest.TestCase):
             ]),
             sorted(child_names)
         )
+
+
+class Test_Overlay_identity(unittest.TestCase):
+
+    def test_equality(self):
+        f = OverlayFixture()
+        self.assertEqual(f.root_overlay / 'a', f.root_overlay / 'a')
+        self.assertEqual(
+            hash(f.root_overlay / 'a'), hash(f.root_overlay / 'a'))
+        self.assertNotEqual(
+            f.root_overlay / 'a', OverlayFixture().root_overlay / 'a')
+
+
+class Test_Overlay_listing(unittest.TestCase):
+
+    def setUp(self):
+        f = OverlayFixture()
+        (f.readonly / 'readonly').content = SOME_TEXT
+        (f.readonly / 'dir' / 'x').content = SOME_TEXT
+        (f.readonly / 'common').content = SOME_TEXT
+        (f.writable / 'common').content = SOME_OTHER_TEXT
+        (f.writable / 'deleted').content = SOME_TEXT
+        (f.root_overlay / 'deleted').delete()
+        self.f = f
+
+    def children(self):
+        return dict((x.name, x) for x in self.f.root_overlay)
+
+    def test_children_are_resolved_while_listing(self):
+        with mock.patch.object(
+                Mask, 'covered', side_effect=AssertionError):
+            children = self.children()
+
+            self.assertEqual(
+                ['common', 'dir', 'readonly'], sorted(children))
+            self.assertEqual(SOME_OTHER_TEXT, children['common'].content)
+            self.assertEqual(SOME_TEXT, children['readonly'].content)
+            self.assertTrue(children['dir'].is_dir())
+            self.assertFalse(children['dir'].is_file())
+
+    def test_writing_a_child_resolves_it_again(self):
+        children = self.children()
+        readonly = children['readonly']
+
+        readonly.content = SOME_OTHER_TEXT
+
+        self.assertEqual(SOME_OTHER_TEXT, readonly.content)
+        self.assertEqual(SOME_TEXT, (self.f.readonly / 'readonly').content)
+
+    def test_deleted_child_is_gone(self):
+        readonly = self.children()['readonly']
+
+        readonly.delete()
+
+        self.assertFalse(readonly.exists())
+
+
+class Test_Overlay_resolution_cache(unittest.TestCase):
+
+    def fixture(self, **kwargs):
+        return OverlayFixture(
+            path=SOME_PATH, exclusive_layers=True, **kwargs)
+
+    def test_resolution_is_remembered(self):
+        f = self.fixture(readonly_text=SOME_TEXT)
+        self.assertEqual(SOME_TEXT, f.overlay.content)
+        self.assertTrue((f.root_overlay / 'some').is_dir())
+
+        with mock.patch.object(
+                Mask, 'covered', side_effect=AssertionError):
+            self.assertEqual(SOME_TEXT, (f.root_overlay / SOME_PATH).content)
+            self.assertTrue((f.root_overlay / SOME_PATH).is_file())
+            self.assertTrue((f.root_overlay / 'some').is_dir())
+
+    def test_writes_are_seen(self):
+        f = self.fixture(readonly_text=SOME_TEXT)
+        self.assertEqual(SOME_TEXT, f.overlay.content)
+        self.assertTrue(f.root_overlay.is_dir())
+
+        (f.root_overlay / SOME_PATH).content = SOME_OTHER_TEXT
+
+        self.assertEqual(SOME_OTHER_TEXT, f.overlay.content)
+        self.assertEqual(SOME_OTHER_TEXT, (f.writable / SOME_PATH).content)
+        self.assertTrue(f.root_overlay.is_dir())
+
+    def test_stream_writes_are_seen(self):
+        f = self.fixture(readonly_text=SOME_TEXT)
+        self.assertEqual(SOME_TEXT, f.overlay.content)
+
+        with (f.root_overlay / SOME_PATH).writable_stream() as stream:
+            stream.write(SOME_OTHER_TEXT)
+
+        self.assertEqual(SOME_OTHER_TEXT, f.overlay.content)
+
+    def test_deletes_are_seen(self):
+        f = self.fixture(readonly_text=SOME_TEXT)
+        child = f.overlay / 'child'
+        child.content = SOME_OTHER_TEXT
+        self.assertTrue(child.is_file())
+        self.assertTrue(f.overlay.is_dir())
+
+        (f.root_overlay / SOME_PATH).delete()
+
+        self.assertFalse(f.overlay.exists())
+        self.assertFalse(child.exists())
+
+    def test_recreated_after_delete(self):
+        f = self.fixture(readonly_text=SOME_TEXT)
+        f.overlay.delete()
+        self.assertFalse(f.overlay.exists())
+
+        f.overlay.content = SOME_OTHER_TEXT
+
+        self.assertEqual(SOME_OTHER_TEXT, f.overlay.content)
+
+    def test_not_remembered_by_default(self):
+        f = OverlayFixture(readonly_text=SOME_TEXT, path=SOME_PATH)
+        self.assertEqual(SOME_TEXT, f.overlay.content)
+
+        (f.writable / SOME_PATH).content = SOME_OTHER_TEXT
+
+        self.assertEqual(SOME_OTHER_TEXT, f.overlay.content)
+
+
+class Test_Overlay_walk(unittest.TestCase, common.WalkTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Overlay(Memory(), Memory(), Mask()) / 'root'
+
+    def test_layers_are_merged_and_mask_applied(self):
+        f = OverlayFixture()
+        (f.readonly / 'a/readonly').content = SOME_TEXT
+        (f.readonly / 'a/deleted').content = SOME_TEXT
+        (f.readonly / 'b/c').content = SOME_TEXT
+        (f.writable / 'a/writable').content = SOME_TEXT
+        (f.root_overlay / 'a/deleted').delete()
+        (f.root_overlay / 'b').delete()
+        (f.root_overlay / 'b/new').content = SOME_OTHER_TEXT
+
+        paths = sorted(x.path for x in f.root_overlay.walk())
+
+        self.assertEqual(
+            ['/a', '/a/readonly', '/a/writable', '/b', '/b/new'], paths)
+
+    def test_writable_file_hides_readonly_directory(self):
+        f = OverlayFixture()
+        (f.readonly / 'a/b').content = SOME_TEXT
+        (f.writable / 'a').content = SOME_OTHER_TEXT
+
+        (a,) = list(f.root_overlay.walk())
+
+        self.assertEqual(SOME_OTHER_TEXT, a.content)
+
+
+class Test_Overlay_read_range(unittest.TestCase, common.ReadRangeTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Overlay(Memory(), Memory(), Mask())
+
+
+class Test_Overlay_stat(unittest.TestCase, common.StatTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        yield m.Overlay(Memory(), Memory(), Mask())
+
+    def test_readonly_layer(self):
+        readonly = Memory()
+        (readonly / 'file').content = b'012'
+        overlay = m.Overlay(readonly, Memory(), Mask())
+        self.assertEqual((readonly / 'file').stat(), (overlay / 'file').stat())
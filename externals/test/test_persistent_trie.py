@@ -0,0 +1,141 @@
+import threading
+import unittest
+
+import externals.persistent_trie as m
+from externals import Memory
+from externals.compact_trie import CompactTrie
+from externals.test import test_trie
+
+
+class Test_PersistentTrie(test_trie.Test_Trie):
+
+    trie_class = m.PersistentTrie
+
+
+class Test_PersistentTrie_snapshot(unittest.TestCase):
+
+    def test_snapshot_is_independent(self):
+        t = test_trie.trie_abcd(m.PersistentTrie)
+        s = t.snapshot()
+
+        t['a', 'b'] = 'changed'
+        t.delete('d')
+        s['a', 'x'] = 'new'
+
+        self.assertEqual('changed', t['a', 'b'])
+        self.assertEqual('ab', s['a', 'b'])
+        self.assertFalse(t.has_content('d'))
+        self.assertEqual('d', s['d'])
+        self.assertFalse(t.has_content(('a', 'x')))
+        self.assertEqual({'b', 'c', 'x'}, set(s.children('a')))
+
+    def test_only_the_changed_spine_is_copied(self):
+        t = m.PersistentTrie()
+        t.update([(('a', str(i)), i) for i in range(10)] + [(('b',), 'b')])
+        s = t.snapshot()
+
+        t['a', '0'] = 'changed'
+
+        self.assertIsNot(t._root, s._root)
+        self.assertIsNot(
+            t._root.children['a'], s._root.children['a'])
+        self.assertIs(t._root.children['b'], s._root.children['b'])
+        self.assertIs(
+            t._root.children['a'].children['1'],
+            s._root.children['a'].children['1'])
+
+    def test_update_does_not_change_snapshots(self):
+        t = m.PersistentTrie.from_items([(('a', 'b'), 1)])
+        s = t.snapshot()
+
+        t.update([(('b',), 2), (('c',), 3)], prefix=('a',))
+        t.extend(('x', 'y'), [None, 'xy'])
+
+        self.assertEqual(['b'], list(s.children('a')))
+        self.assertEqual({'b', 'c'}, set(t.children('a')))
+        self.assertEqual('xy', t['x', 'y'])
+        self.assertFalse(s.is_internal('x'))
+
+    def test_walk_sees_one_version(self):
+        t = m.PersistentTrie.from_items([(('a',), 1), (('b',), 2)])
+        walk = t.walk()
+        self.assertEqual(('a',), next(walk))
+        t.delete(('b',))
+        t['c'] = 3
+        self.assertEqual([('b',)], list(walk))
+
+    def test_readers_while_writing(self):
+        t = m.PersistentTrie()
+        t['d', 'zzz'] = 'zzz'
+        done = threading.Event()
+        errors = []
+
+        def write():
+            for i in range(500):
+                t['d', str(i)] = i
+            done.set()
+
+        def read():
+            while not done.is_set():
+                if t['d', 'zzz'] != 'zzz':  # pragma: no cover
+                    errors.append(t['d', 'zzz'])
+
+        threads = [threading.Thread(target=f) for f in (read, write)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(501, len(t.children('d')))
+
+
+class Test_Memory_snapshot(unittest.TestCase):
+
+    def check(self, fs):
+        root = Memory(fs)
+        (root / 'a' / 'b').content = b'ab'
+        (root / 'c').content = b'c'
+
+        fork = (root / 'a').snapshot()
+        (root / 'a' / 'b').content = b'changed'
+        (fork / 'x').content = b'new'
+
+        self.assertEqual(('a',), fork.path_segments)
+        self.assertEqual(b'ab', (fork / 'b').content)
+        self.assertEqual(b'c', (fork.parent() / 'c').content)
+        self.assertEqual(b'changed', (root / 'a' / 'b').content)
+        self.assertFalse((root / 'a' / 'x').exists())
+        self.assertNotEqual(root / 'a', fork)
+        return fork
+
+    def test_persistent_trie(self):
+        fork = self.check(m.PersistentTrie())
+        self.assertIsInstance(fork._fs, m.PersistentTrie)
+
+    def test_plain_trie_is_copied(self):
+        fork = self.check(None)
+        self.assertIsInstance(fork._fs, m.PersistentTrie)
+
+    def test_compact_trie_is_copied(self):
+        self.check(CompactTrie())
+
+    def test_copy_keeps_mtimes_and_empty_directories(self):
+        root = Memory()
+        (root / 'a/b').content = b'ab'
+        root._fs.extend(('empty', 'dir'))
+        root.bulk_load([(('loaded',), b'loaded')])
+        fork = root.snapshot()
+        self.assertEqual((root / 'a/b').stat(), (fork / 'a/b').stat())
+        self.assertIsNotNone((fork / 'a/b').stat().mtime)
+        self.assertIsNone((fork / 'loaded').stat().mtime)
+        self.assertEqual(list(root._fs.walk()), list(fork._fs.walk()))
+
+    def test_subclass_is_kept(self):
+        class SubMemory(Memory):
+            __slots__ = ()
+
+        fork = SubMemory().snapshot()
+        self.assertIsInstance(fork, SubMemory)
+        self.assertIsInstance(fork._fs, m.PersistentTrie)
+        self.assertIsInstance(fork.snapshot(), SubMemory)
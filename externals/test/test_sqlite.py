@@ -0,0 +1,250 @@
+import contextlib
+import gc
+import threading
+import unittest
+
+from temp_dir import in_temp_dir, within_temp_dir
+
+import externals.sqlite as m
+from externals import Memory, NoContentError
+from externals.bulk import write_many
+from externals.test import common
+
+
+@contextlib.contextmanager
+def sqlite_root():
+    with in_temp_dir():
+        with m.SQLite('tree.db') as root:
+            yield root
+
+
+class Test_SQLite_root(unittest.TestCase, common.RootTests):
+
+    def _get_root(self):
+        return m.SQLite(':memory:')
+
+
+class Test_walk(unittest.TestCase, common.WalkTests):
+
+    def _get_root(self):
+        return sqlite_root()
+
+
+class Test_read_range(unittest.TestCase, common.ReadRangeTests):
+
+    def _get_root(self):
+        return sqlite_root()
+
+
+class Test_stat(unittest.TestCase, common.StatTests):
+
+    def _get_root(self):
+        return sqlite_root()
+
+
+class Test_copy_to(unittest.TestCase, common.External_copy_to_Tests):
+
+    @contextlib.contextmanager
+    def _get_external(self):
+        with sqlite_root() as root:
+            x = root / 'external'
+            x.content = b'something smallish'
+            yield x
+
+
+class Test_SQLite(unittest.TestCase):
+
+    def test_content(self):
+        with sqlite_root() as root:
+            (root / 'a/b').content = b'ab'
+            (root / 'a/b').content = b'changed'
+            self.assertEqual(b'changed', (root / 'a/b').content)
+            with self.assertRaises(NoContentError):
+                (root / 'a').content
+            with self.assertRaises(NoContentError):
+                (root / 'x').content
+
+    def test_listing(self):
+        with sqlite_root() as root:
+            for path in ('b', 'a/x', 'a/y', 'c/d/e'):
+                (root / path).content = path.encode('ascii')
+            self.assertEqual(['a', 'b', 'c'], [x.name for x in root])
+            self.assertEqual(['x', 'y'], [x.name for x in root / 'a'])
+            self.assertEqual([], list(root / 'b'))
+            self.assertEqual([], list(root / 'missing'))
+            self.assertTrue((root / 'c/d').is_dir())
+            self.assertFalse((root / 'c/d').is_file())
+            self.assertTrue((root / 'b').is_file())
+            self.assertFalse((root / 'b').is_dir())
+            self.assertFalse((root / 'missing').exists())
+
+    def test_file_with_children(self):
+        with sqlite_root() as root:
+            (root / 'a').content = b'a'
+            (root / 'a/b').content = b'ab'
+            self.assertTrue((root / 'a').is_file())
+            self.assertTrue((root / 'a').is_dir())
+            self.assertEqual(b'a', (root / 'a').content)
+
+    def test_make_dirs(self):
+        with sqlite_root() as root:
+            (root / 'a/b').make_dirs()
+            self.assertTrue((root / 'a/b').is_dir())
+            self.assertFalse((root / 'a/b').is_file())
+            self.assertEqual([], list(root / 'a/b'))
+
+    def test_delete(self):
+        with sqlite_root() as root:
+            for path in ('a/b/c', 'a/d', 'e'):
+                (root / path).content = b'x'
+            (root / 'a').delete()
+            (root / 'missing').delete()
+            self.assertEqual(['e'], [x.name for x in root])
+            self.assertFalse((root / 'a/b/c').exists())
+            root.delete()
+            self.assertEqual([], list(root))
+
+    def test_streams(self):
+        with sqlite_root() as root:
+            x = root / 'x'
+            with x.writable_stream() as stream:
+                stream.write(b'0123')
+                stream.write(b'456789')
+            with x.readable_stream() as stream:
+                self.assertEqual(b'012', stream.read(3))
+                stream.seek(8)
+                self.assertEqual(b'89', stream.read())
+                stream.seek(20)
+                self.assertEqual(b'', stream.read())
+            with self.assertRaises(NoContentError):
+                (root / 'missing').readable_stream()
+
+    def test_reopen(self):
+        with in_temp_dir():
+            with m.SQLite('tree.db') as root:
+                (root / 'a/b').content = b'ab'
+            with m.SQLite('tree.db') as root:
+                self.assertEqual(b'ab', (root / 'a/b').content)
+
+    def test_root_has_no_content(self):
+        with sqlite_root() as root:
+            with self.assertRaises(ValueError):
+                root.content = b'x'
+            with self.assertRaises(ValueError):
+                root.writable_stream()
+            with self.assertRaises(NoContentError):
+                root.content
+
+    def test_uses_wal(self):
+        with sqlite_root() as root:
+            mode, = root._db.connection().execute(
+                'PRAGMA journal_mode').fetchone()
+            self.assertEqual('wal', mode)
+
+
+class Test_connections(unittest.TestCase):
+
+    def test_closed_when_the_thread_ends(self):
+        with sqlite_root() as root:
+            def use():
+                (root / threading.current_thread().name).content = b'x'
+
+            for _ in range(10):
+                threads = [threading.Thread(target=use) for _ in range(4)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            gc.collect()
+            # only the connection of this thread is left
+            self.assertEqual(1, root._db.open_connections)
+            self.assertEqual(40, len(list(root)))
+
+    def test_bulk_writes_do_not_add_connections(self):
+        with sqlite_root() as root:
+            for i in range(20):
+                list(write_many(
+                    dict((root / str(i) / str(j), b'x') for j in range(8)),
+                    workers=4))
+            self.assertLessEqual(root._db.open_connections, 5)
+
+    def test_close_closes_all_connections(self):
+        with sqlite_root() as root:
+            (root / 'x').content = b'x'
+            connection = root._db.connection()
+            root.close()
+            self.assertEqual(0, root._db.open_connections)
+            with self.assertRaises(Exception):
+                connection.execute('SELECT 1')
+            # usable again, with new connections
+            self.assertEqual(b'x', (root / 'x').content)
+
+
+class Test_batch(unittest.TestCase):
+
+    def test_writes_are_committed_at_the_end(self):
+        with sqlite_root() as root:
+            other = m.SQLite('tree.db')
+            with root.batch():
+                for i in range(100):
+                    (root / 'dir' / str(i)).content = b'x'
+                # visible in the batch, not to other connections
+                self.assertEqual(100, len(list(root / 'dir')))
+                self.assertEqual([], list(other))
+            self.assertEqual(100, len(list(other / 'dir')))
+            other.close()
+
+    def test_nothing_is_committed_on_error(self):
+        with sqlite_root() as root:
+            (root / 'kept').content = b'kept'
+            with self.assertRaises(ZeroDivisionError):
+                with root.batch():
+                    (root / 'new').content = b'new'
+                    (root / 'kept').delete()
+                    1 / 0
+            self.assertEqual(['kept'], [x.name for x in root])
+
+    def test_batches_nest(self):
+        with sqlite_root() as root:
+            with root.batch():
+                with root.batch():
+                    (root / 'a').content = b'a'
+                (root / 'b').content = b'b'
+            self.assertEqual(['a', 'b'], [x.name for x in root])
+
+    def test_readers_are_not_blocked_by_a_writer(self):
+        with sqlite_root() as root:
+            (root / 'old').content = b'old'
+            seen = []
+            with root.batch():
+                (root / 'new').content = b'new'
+
+                def read():
+                    seen.extend(x.name for x in root)
+
+                thread = threading.Thread(target=read)
+                thread.start()
+                thread.join(5)
+            self.assertEqual(['old'], seen)
+
+    @within_temp_dir
+    def test_threads_write_concurrently(self):
+        root = m.SQLite('tree.db')
+
+        def write(thread):
+            with root.batch():
+                for i in range(50):
+                    (root / str(thread) / str(i)).content = b'x'
+
+        threads = [
+            threading.Thread(target=write, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(
+            200, sum(1 for x in root.walk() if x.is_file()))
+        memory = Memory()
+        (root / '0' / '0').copy_to(memory / 'copy')
+        self.assertEqual(b'x', (memory / 'copy').content)
+        root.close()
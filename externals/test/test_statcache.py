@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import unittest
+import mock
+from temp_dir import within_temp_dir
+
+import externals.statcache as m
+from externals import File
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class Test_StatCache(unittest.TestCase):
+
+    @within_temp_dir
+    def test_missing_path_is_cached_as_none(self):
+        cache = m.StatCache()
+        self.assertIsNone(cache.stat(os.path.abspath('x')))
+        open('x', 'wb').close()
+        self.assertIsNone(cache.stat(os.path.abspath('x')))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    @within_temp_dir
+    def test_invalidate(self):
+        cache = m.StatCache()
+        path = os.path.abspath('x')
+        cache.stat(path)
+        open('x', 'wb').close()
+
+        cache.invalidate(path)
+
+        self.assertIsNotNone(cache.stat(path))
+
+    @within_temp_dir
+    def test_invalidate_drops_children(self):
+        cache = m.StatCache()
+        cache.stat(os.path.abspath('dir/x'))
+        cache.stat(os.path.abspath('dir-x'))
+
+        cache.invalidate(os.path.abspath('dir'))
+
+        self.assertEqual(1, len(cache))
+
+    @within_temp_dir
+    def test_invalidate_not_recursive(self):
+        cache = m.StatCache()
+        cache.stat(os.path.abspath('dir'))
+        cache.stat(os.path.abspath('dir/x'))
+
+        cache.invalidate(os.path.abspath('dir'), recursive=False)
+
+        self.assertEqual(1, len(cache))
+
+    @within_temp_dir
+    def test_least_recently_used_is_evicted(self):
+        cache = m.StatCache(maxsize=2)
+        a, b, c = [os.path.abspath(name) for name in 'abc']
+        cache.stat(a)
+        cache.stat(b)
+        cache.stat(a)
+        cache.stat(c)
+
+        misses = cache.misses
+        cache.stat(a)
+        self.assertEqual(misses, cache.misses)
+        cache.stat(b)
+        self.assertEqual(misses + 1, cache.misses)
+
+    @within_temp_dir
+    def test_entries_expire_after_ttl(self):
+        clock = Clock()
+        cache = m.StatCache(ttl=10, clock=clock)
+        path = os.path.abspath('x')
+        cache.stat(path)
+        open('x', 'wb').close()
+
+        clock.now = 10
+        self.assertIsNone(cache.stat(path))
+        clock.now = 11
+        self.assertIsNotNone(cache.stat(path))
+
+    @within_temp_dir
+    def test_result_of_stat_racing_with_invalidate_is_not_stored(self):
+        cache = m.StatCache()
+        open('x', 'wb').close()
+        path = os.path.abspath('x')
+        real_stat = os.stat
+
+        def stat(p):
+            result = real_stat(p)
+            # changed and invalidated after the stat, before the store
+            os.remove(p)
+            cache.invalidate(p)
+            return result
+
+        with mock.patch.object(m.os, 'stat', stat):
+            self.assertIsNotNone(cache.stat(path))
+
+        self.assertIsNone(cache.stat(path))
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'inotify is Linux only')
+class Test_StatCache_watch(unittest.TestCase):
+
+    def wait_for(self, predicate):
+        deadline = time.time() + 5
+        while not predicate() and time.time() < deadline:
+            time.sleep(0.01)
+        return predicate()
+
+    @within_temp_dir
+    def test_created_file_is_noticed(self):
+        cache = m.StatCache(watch=True)
+        try:
+            path = os.path.abspath('x')
+            self.assertIsNone(cache.stat(path))
+
+            open('x', 'wb').close()
+
+            self.assertTrue(self.wait_for(lambda: cache.stat(path)))
+        finally:
+            cache.close()
+
+    @within_temp_dir
+    def test_removed_directory_is_noticed(self):
+        os.makedirs('dir/sub')
+        cache = m.StatCache(watch=True)
+        try:
+            path = os.path.abspath('dir/sub')
+            self.assertIsNotNone(cache.stat(path))
+
+            os.rmdir('dir/sub')
+
+            self.assertTrue(self.wait_for(lambda: cache.stat(path) is None))
+        finally:
+            cache.close()
+
+    @within_temp_dir
+    def test_directory_is_unwatched_with_its_last_entry(self):
+        os.makedirs('a')
+        os.makedirs('b')
+        cache = m.StatCache(maxsize=1, watch=True)
+        try:
+            cache.stat(os.path.abspath('a/x'))
+            cache.stat(os.path.abspath('b/x'))
+
+            watcher = cache._watcher
+            self.assertFalse(watcher.is_watched(os.path.abspath('a')))
+            self.assertTrue(watcher.is_watched(os.path.abspath('b')))
+
+            cache.invalidate(os.path.abspath('b/x'))
+            self.assertFalse(watcher.is_watched(os.path.abspath('b')))
+        finally:
+            cache.close()
+
+    @within_temp_dir
+    def test_entry_is_cached_again_after_unwatch(self):
+        cache = m.StatCache(watch=True)
+        try:
+            path = os.path.abspath('x')
+            cache.stat(path)
+            cache.invalidate(path)
+            cache.stat(path)
+            cache.stat(path)
+            self.assertEqual(1, cache.hits)
+        finally:
+            cache.close()
+
+
+class Test_File_with_StatCache(unittest.TestCase):
+
+    @within_temp_dir
+    def test_types_are_answered_from_cache(self):
+        cache = m.StatCache()
+        root = File('.', stat_cache=cache)
+        (root / 'dir' / 'file').content = b'x'
+
+        self.assertTrue((root / 'dir').is_dir())
+        self.assertTrue((root / 'dir').exists())
+        self.assertFalse((root / 'dir').is_file())
+        self.assertEqual((2, 1), (cache.hits, cache.misses))
+
+    @within_temp_dir
+    def test_writing_invalidates_negative_entries(self):
+        root = File('.', stat_cache=m.StatCache())
+        x = root / 'a' / 'b' / 'c'
+        self.assertFalse(x.exists())
+        self.assertFalse(x.parent().parent().exists())
+
+        x.content = b'x'
+
+        self.assertTrue(x.is_file())
+        self.assertTrue(x.parent().parent().is_dir())
+
+    @within_temp_dir
+    def test_delete_invalidates_subtree(self):
+        root = File('.', stat_cache=m.StatCache())
+        x = root / 'a' / 'b'
+        x.content = b'x'
+        self.assertTrue(x.exists())
+
+        (root / 'a').delete()
+
+        self.assertFalse(x.exists())
+        self.assertFalse((root / 'a').exists())
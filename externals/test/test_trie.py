@@ -1,9 +1,11 @@
+import array
+import time
 import unittest
 
 import externals.trie as m
 
 
-def trie_abcd():
+def trie_abcd(trie_class=m.Trie):
     '''
     --+- a -+- b =ab
       |     |
@@ -11,7 +13,7 @@ def trie_abcd():
       |
       +- d =d
     '''
-    t = m.Trie()
+    t = trie_class()
     t[('a', 'b')] = 'ab'
     t[('a', 'c')] = 'ac'
     t['d'] = 'd'
@@ -20,75 +22,246 @@ def trie_abcd():
 
 class Test_Trie(unittest.TestCase):
 
+    trie_class = m.Trie
+
+    def trie_abcd(self):
+        return trie_abcd(self.trie_class)
+
     def test_root(self):
-        t = m.Trie()
+        t = self.trie_class()
         t[()] = 'content'
         self.assertEquals('content', t[()])
 
     def test_contents(self):
-        self.assertIsNone(trie_abcd()['a'])
-        self.assertEquals('ab', trie_abcd()['a', 'b'])
-        self.assertEquals('ac', trie_abcd()['a', 'c'])
-        self.assertEquals('d', trie_abcd()['d'])
+        self.assertIsNone(self.trie_abcd()['a'])
+        self.assertEquals('ab', self.trie_abcd()['a', 'b'])
+        self.assertEquals('ac', self.trie_abcd()['a', 'c'])
+        self.assertEquals('d', self.trie_abcd()['d'])
 
     def test_indexing_with_nonexisting_path_raises_KeyError(self):
         with self.assertRaises(KeyError):
-            trie_abcd()[('d', 'x')]
+            self.trie_abcd()[('d', 'x')]
         with self.assertRaises(KeyError):
-            trie_abcd()[['x']]
+            self.trie_abcd()[['x']]
 
     def test_setting_internal_content_leaves_others_as_is(self):
-        t = trie_abcd()
+        t = self.trie_abcd()
         t['a'] = 'a'
         self.assertEquals('ab', t[('a', 'b')])
 
+    def test_mtime(self):
+        t = self.trie_class()
+        before = time.time()
+        t[('a', 'b')] = 'ab'
+        t[()] = 'root'
+        self.assertLessEqual(before, t.mtime(('a', 'b')))
+        self.assertLessEqual(t.mtime(('a', 'b')), time.time())
+        self.assertIsNotNone(t.mtime(()))
+        self.assertIsNone(t.mtime(('a',)))
+        with self.assertRaises(KeyError):
+            t.mtime(('x',))
+
+    def test_bulk_loaded_content_has_no_mtime(self):
+        t = self.trie_class()
+        t[('a', 'b')] = 'ab'
+        t.update([(('a', 'b'), 'new'), (('c',), 'c')])
+        self.assertIsNone(t.mtime(('a', 'b')))
+        self.assertIsNone(t.mtime(('c',)))
+
+    def test_mtime_goes_with_deleted_subtree(self):
+        t = self.trie_class()
+        t[('a', 'b')] = 'ab'
+        t.delete(('a',))
+        t.extend(('a', 'b'), ['a', 'ab'])
+        self.assertIsNone(t.mtime(('a', 'b')))
+
     def test_set_existing_path_content(self):
-        t = trie_abcd()
+        t = self.trie_abcd()
         t[('a', 'b')] = 'abab'
         self.assertEquals('abab', t[('a', 'b')])
 
     def test_is_internal(self):
-        self.assertTrue(trie_abcd().is_internal(['a']))
-        self.assertFalse(trie_abcd().is_internal(['a', 'b']))
-        self.assertFalse(trie_abcd().is_internal(['d']))
-        self.assertFalse(trie_abcd().is_internal(['b']))
+        self.assertTrue(self.trie_abcd().is_internal(['a']))
+        self.assertFalse(self.trie_abcd().is_internal(['a', 'b']))
+        self.assertFalse(self.trie_abcd().is_internal(['d']))
+        self.assertFalse(self.trie_abcd().is_internal(['b']))
 
     def test_has_content(self):
-        self.assertTrue(trie_abcd().has_content(['a', 'b']))
-        self.assertTrue(trie_abcd().has_content(['a', 'c']))
-        self.assertTrue(trie_abcd().has_content(['d']))
-        self.assertFalse(trie_abcd().has_content(['a']))
-        self.assertFalse(trie_abcd().has_content(['b']))
+        self.assertTrue(self.trie_abcd().has_content(['a', 'b']))
+        self.assertTrue(self.trie_abcd().has_content(['a', 'c']))
+        self.assertTrue(self.trie_abcd().has_content(['d']))
+        self.assertFalse(self.trie_abcd().has_content(['a']))
+        self.assertFalse(self.trie_abcd().has_content(['b']))
 
     def test_last_existing(self):
-        self.assertEquals('ab', trie_abcd().last(['a', 'b']))
+        self.assertEquals('ab', self.trie_abcd().last(['a', 'b']))
 
     def test_last_nonexisting(self):
-        self.assertEquals('d', trie_abcd().last(['d', 'b', 'c']))
+        self.assertEquals('d', self.trie_abcd().last(['d', 'b', 'c']))
 
     def test_extend_path_keep(self):
-        t = trie_abcd()
+        t = self.trie_abcd()
         t.extend(('d', 'x'), ('?', 'extended'))
         self.assertEquals('d', t[['d']])
         self.assertEquals('extended', t[['d', 'x']])
 
     def test_extend_with_no_contents(self):
-        t = trie_abcd()
+        t = self.trie_abcd()
         t.extend(('d', 'x'))
         self.assertEquals('d', t[['d']])
         self.assertIsNone(t[['d', 'x']])
 
     def test_extend_with_shorter_values_raises(self):
-        t = m.Trie()
+        t = self.trie_class()
         with self.assertRaises(ValueError):
             t.extend(('a', 'b'), ['a only'])
 
     def test_children(self):
-        self.assertEquals({'a', 'd'}, set(trie_abcd().children(())))
-        self.assertEquals({'b', 'c'}, set(trie_abcd().children(['a'])))
-        self.assertEquals(set(), set(trie_abcd().children(['d'])))
+        self.assertEquals({'a', 'd'}, set(self.trie_abcd().children(())))
+        self.assertEquals({'b', 'c'}, set(self.trie_abcd().children(['a'])))
+        self.assertEquals(set(), set(self.trie_abcd().children(['d'])))
 
     def test_delete(self):
-        t = trie_abcd()
+        t = self.trie_abcd()
         t.delete(['d'])
         self.assertEquals({'a'}, set(t.children(())))
+
+    def test_delete_nonexistent_raises_KeyError(self):
+        with self.assertRaises(KeyError):
+            self.trie_abcd().delete(['d', 'x'])
+        with self.assertRaises(KeyError):
+            self.trie_abcd().delete(['x'])
+
+    def test_walk(self):
+        self.assertEqual(
+            {('a',), ('a', 'b'), ('a', 'c'), ('d',)},
+            set(self.trie_abcd().walk()))
+        self.assertEqual(
+            {('a', 'b'), ('a', 'c')},
+            set(self.trie_abcd().walk(['a'])))
+        self.assertEqual([], list(self.trie_abcd().walk(['x'])))
+        self.assertEqual([], list(self.trie_abcd().walk(['d'])))
+
+    def test_delete_while_walking(self):
+        for depth_first in (True, False):
+            t = self.trie_abcd()
+            t[('a', 'e')] = 'ae'
+            for path in t.walk(depth_first=depth_first):
+                if not t.is_internal(path):
+                    t.delete(path)
+            self.assertEqual(['a'], list(t.children(())))
+            self.assertEqual([], list(t.children(('a',))))
+
+    def test_from_items(self):
+        t = self.trie_class.from_items([
+            (('a', 'b'), 'ab'),
+            (('a', 'c'), 'ac'),
+            (('d',), 'd'),
+        ])
+        self.assertEqual({'a', 'd'}, set(t.children(())))
+        self.assertEqual('ab', t['a', 'b'])
+        self.assertEqual('ac', t['a', 'c'])
+        self.assertEqual('d', t[('d',)])
+        self.assertIsNone(t['a'])
+
+    def test_update_unsorted_with_prefix(self):
+        t = self.trie_abcd()
+        t.update(
+            [
+                (('x', 'y'), 'pxy'),
+                ((), 'p'),
+                (('x',), 'px'),
+                (('z',), 'pz'),
+                (('x', 'y', 'z'), 'pxyz'),
+                (('x', 'w'), 'pxw'),
+            ],
+            prefix=('d', 'p'))
+        self.assertEqual('d', t[('d',)])
+        self.assertEqual('p', t['d', 'p'])
+        self.assertEqual('px', t['d', 'p', 'x'])
+        self.assertEqual('pxy', t['d', 'p', 'x', 'y'])
+        self.assertEqual('pxyz', t['d', 'p', 'x', 'y', 'z'])
+        self.assertEqual('pxw', t['d', 'p', 'x', 'w'])
+        self.assertEqual('pz', t['d', 'p', 'z'])
+        self.assertEqual('ab', t['a', 'b'])
+
+    def test_update_overwrites(self):
+        t = self.trie_abcd()
+        t.update([(('a', 'b'), 'new'), (('a',), 'a')])
+        self.assertEqual('new', t['a', 'b'])
+        self.assertEqual('a', t[('a',)])
+        self.assertEqual('ac', t['a', 'c'])
+
+
+class Test_SizedTrie(Test_Trie):
+
+    trie_class = m.SizedTrie
+
+    def check_totals(self, t):
+        '''totals everywhere match a recount'''
+        for path in [()] + list(t.walk()):
+            contents = [
+                t[p] for p in [path] + list(t.walk(path))
+                if t.has_content(p)]
+            self.assertEqual(
+                (sum(m.nbytes(c) for c in contents), len(contents)),
+                (t.total_size(path), t.total_count(path)), path)
+
+    def test_totals(self):
+        t = self.trie_abcd()
+        self.assertEqual(5, t.total_size())
+        self.assertEqual(3, t.total_count())
+        self.assertEqual(4, t.total_size('a'))
+        self.assertEqual(2, t.total_count('a'))
+        self.assertEqual(1, t.total_size('d'))
+        self.check_totals(t)
+
+    def test_missing_path_has_zero_totals(self):
+        t = self.trie_abcd()
+        self.assertEqual(0, t.total_size('x'))
+        self.assertEqual(0, t.total_count('x'))
+
+    def test_overwrite(self):
+        t = self.trie_abcd()
+        t['a', 'b'] = 'abcdef'
+        t['a'] = 'a'
+        self.assertEqual(10, t.total_size())
+        self.assertEqual(4, t.total_count())
+        t['a'] = None
+        self.assertEqual(3, t.total_count())
+        self.check_totals(t)
+
+    def test_delete(self):
+        t = self.trie_abcd()
+        t.delete(('a', 'b'))
+        self.assertEqual(3, t.total_size())
+        t.delete('a')
+        self.assertEqual((1, 1), (t.total_size(), t.total_count()))
+        t.delete(())
+        self.assertEqual((0, 0), (t.total_size(), t.total_count()))
+        self.check_totals(t)
+
+    def test_extend(self):
+        t = self.trie_abcd()
+        t.extend(('a', 'x', 'y'), ['no', 'xx', 'yyy'])
+        self.assertEqual(10, t.total_size())
+        self.check_totals(t)
+
+    def test_update(self):
+        t = self.trie_abcd()
+        t.update([(('b',), 'bb'), (('c', 'd'), 'cdcd')], prefix=('a',))
+        self.assertEqual(8, t.total_size(('a',)))
+        self.assertEqual(9, t.total_size())
+        self.check_totals(t)
+
+    def test_sizeof(self):
+        t = m.SizedTrie.from_items(
+            [(('a',), 'x'), (('b',), 'yy')], sizeof=lambda c: 10)
+        self.assertEqual(20, t.total_size())
+
+    def test_sizes_are_in_bytes(self):
+        t = self.trie_class()
+        t['a'] = array.array('d', [1.0, 2.0])
+        t['b'] = memoryview(b'abcd').cast('I')
+        self.assertEqual(20, t.total_size())
+        self.check_totals(t)
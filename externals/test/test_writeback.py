@@ -0,0 +1,190 @@
+import contextlib
+import os
+import threading
+import time
+import unittest
+import mock
+from temp_dir import in_temp_dir, within_temp_dir
+
+import externals.writeback as m
+from externals import Memory, File, working_directory
+from externals.test import common
+
+
+def wait_for(predicate):
+    deadline = time.time() + 5
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+class Test_WriteBack(unittest.TestCase):
+
+    def writeback(self, backing, **limits):
+        limits.setdefault('max_age', 3600)
+        out = m.WriteBack(backing, **limits)
+        self.addCleanup(out.close)
+        return out
+
+    def test_written_content_is_readable_before_flush(self):
+        backing = Memory()
+        out = self.writeback(backing)
+        x = out / 'dir' / 'x'
+        x.content = b'x'
+
+        self.assertEqual(b'x', x.content)
+        self.assertTrue(x.is_file())
+        self.assertTrue(x.exists())
+        self.assertTrue((out / 'dir').is_dir())
+        self.assertEqual([out / 'dir'], list(out))
+        self.assertEqual(1, x.stat().size)
+        with x.readable_stream() as f:
+            self.assertEqual(b'x', f.read())
+        self.assertFalse((backing / 'dir' / 'x').exists())
+        self.assertEqual(1, out.pending)
+
+    def test_flush(self):
+        backing = Memory()
+        out = self.writeback(backing)
+        for i in range(10):
+            (out / str(i)).content = str(i).encode('ascii')
+
+        out.flush()
+
+        self.assertEqual(0, out.pending)
+        self.assertEqual(b'7', (backing / '7').content)
+        self.assertEqual(b'7', (out / '7').content)
+
+    def test_close_writes_everything(self):
+        backing = Memory()
+        out = m.WriteBack(backing, max_age=3600)
+        (out / 'x').content = b'x'
+        with (out / 'y').writable_stream() as f:
+            f.write(b'y')
+
+        out.close()
+
+        self.assertEqual(b'x', (backing / 'x').content)
+        self.assertEqual(b'y', (backing / 'y').content)
+        with self.assertRaises(ValueError):
+            (out / 'z').content = b'z'
+
+    def test_context_manager(self):
+        backing = Memory()
+        with m.WriteBack(backing) as out:
+            (out / 'x').content = b'x'
+        self.assertEqual(b'x', (backing / 'x').content)
+
+    def test_flushed_in_background_when_max_pending_is_reached(self):
+        backing = Memory()
+        out = self.writeback(backing, max_pending=5)
+        for i in range(5):
+            (out / str(i)).content = b'i'
+
+        self.assertTrue(wait_for(lambda: (backing / '4').exists()))
+
+    def test_flushed_in_background_when_max_pending_bytes_is_reached(self):
+        backing = Memory()
+        out = self.writeback(backing, max_pending_bytes=10)
+        (out / 'a').content = b'01234'
+        (out / 'b').content = b'56789'
+
+        self.assertTrue(wait_for(lambda: (backing / 'b').exists()))
+
+    def test_flushed_in_background_when_old(self):
+        backing = Memory()
+        out = self.writeback(backing, max_age=0.05)
+        (out / 'x').content = b'x'
+
+        self.assertTrue(wait_for(lambda: (backing / 'x').exists()))
+
+    def test_overwrite_before_flush_writes_once(self):
+        backing = Memory()
+        out = self.writeback(backing)
+        (out / 'x').content = b'1'
+        (out / 'x').content = b'2'
+        self.assertEqual(1, out.pending)
+
+        out.flush()
+
+        self.assertEqual(b'2', (backing / 'x').content)
+
+    def test_delete_drops_pending_writes(self):
+        backing = Memory()
+        (backing / 'dir' / 'old').content = b'old'
+        out = self.writeback(backing)
+        (out / 'dir' / 'new').content = b'new'
+
+        (out / 'dir').delete()
+        out.flush()
+
+        self.assertFalse((backing / 'dir').exists())
+        self.assertFalse((out / 'dir').exists())
+
+    def test_failures_are_kept_and_raised(self):
+        backing = Memory()
+        out = self.writeback(backing)
+        (out / 'x').content = b'x'
+        (out / 'y').content = b'y'
+
+        original = Memory.content.fset
+
+        def fail_x(self, value):
+            if self.name == 'x':
+                raise IOError('disk full')
+            original(self, value)
+
+        content = Memory.content.setter(fail_x)
+        with mock.patch.object(Memory, 'content', content):
+            with self.assertRaises(m.FlushError) as raised:
+                out.flush()
+
+        self.assertEqual(
+            [backing / 'x'], [x for x, _ in raised.exception.failures])
+        self.assertEqual(1, out.pending)
+        self.assertEqual(b'x', (out / 'x').content)
+        out.flush()
+        self.assertEqual(b'x', (backing / 'x').content)
+
+    @within_temp_dir
+    def test_file(self):
+        with m.WriteBack(working_directory()) as out:
+            for i in range(100):
+                (out / 'a' / 'b' / str(i)).content = b'x'
+        self.assertEqual(100, len(os.listdir('a/b')))
+
+    def test_threads(self):
+        backing = Memory()
+        out = self.writeback(backing, max_pending=10)
+
+        def write(name):
+            for i in range(100):
+                (out / name / str(i)).content = name.encode('ascii')
+
+        threads = [
+            threading.Thread(target=write, args=(str(n),)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        out.flush()
+
+        self.assertEqual(
+            400, sum(1 for x in backing.walk() if x.is_file()))
+
+
+class Test_WriteBack_read_range(unittest.TestCase, common.ReadRangeTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with m.WriteBack(Memory()) as out:
+            yield out
+
+
+class Test_WriteBack_stat(unittest.TestCase, common.StatTests):
+
+    @contextlib.contextmanager
+    def _get_root(self):
+        with in_temp_dir():
+            with m.WriteBack(File('.')) as out:
+                yield out
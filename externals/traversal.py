@@ -0,0 +1,49 @@
+'''
+Lazy tree traversal shared by the `walk()` implementations.
+'''
+import collections
+
+
+def walk_tree(
+        root, children, expand,
+        depth_first=True, max_depth=None, prune=None):
+    '''Yield all nodes below root, root excluded.
+
+    children: node -> iterable of the child nodes
+    expand: node -> true if its children are to be visited
+    depth_first: pre-order depth first when true, breadth first otherwise
+    max_depth: visit nodes at most this many levels below root
+    prune: node -> true if the children of an expandable node
+           are to be skipped
+
+    Only the iterators on the current branch (depth first) or
+    the pending directories (breadth first) are kept in memory.
+    '''
+    if max_depth is not None and max_depth < 1:
+        return
+
+    def descend(node, depth):
+        return (
+            (max_depth is None or depth < max_depth)
+            and expand(node)
+            and not (prune is not None and prune(node)))
+
+    if depth_first:
+        stack = [(1, iter(children(root)))]
+        while stack:
+            depth, iterator = stack[-1]
+            for node in iterator:
+                yield node
+                if descend(node, depth):
+                    stack.append((depth + 1, iter(children(node))))
+                    break
+            else:
+                stack.pop()
+    else:
+        pending = collections.deque([(1, root)])
+        while pending:
+            depth, directory = pending.popleft()
+            for node in children(directory):
+                yield node
+                if descend(node, depth):
+                    pending.append((depth + 1, node))
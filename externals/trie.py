@@ -1,19 +1,63 @@
 import itertools
+import threading
+import time
+
+from .traversal import walk_tree
+
+
+# guards creating the children dict of a node,
+# so that concurrent inserts do not lose siblings
+_children_lock = threading.Lock()
+
+
+def nbytes(content):
+    '''Size of content in bytes, as `Memory.stat().size` tells it.
+
+    Contents not supporting the buffer protocol count their `len`.
+    '''
+    try:
+        return memoryview(content).nbytes
+    except TypeError:
+        return len(content)
 
 
 class Node(object):
 
-    __slots__ = ('children', 'content')
+    __slots__ = ('children', 'content', 'mtime')
 
     def __init__(self, content):
         self.children = None
         self.content = content
+        # when content was last set by `Trie.__setitem__`
+        self.mtime = None
+
+
+class SizedNode(Node):
+
+    '''Node knowing the total size and number of contents below it'''
+
+    __slots__ = ('size', 'count')
+
+    def __init__(self, content):
+        super(SizedNode, self).__init__(content)
+        # both include own content, always set by the trie
+        self.size = 0
+        self.count = 0
 
 
 class Trie(object):
 
+    node_class = Node
+
     def __init__(self):
-        self._root = Node(None)
+        self._root = self.node_class(None)
+
+    @classmethod
+    def from_items(cls, items):
+        '''New trie from (path, content) pairs, see `update`'''
+        trie = cls()
+        trie.update(items)
+        return trie
 
     def __setitem__(self, path, content):
         if path:
@@ -21,10 +65,15 @@ class Trie(object):
             self._extend(path, contents, set_last=True)
         else:
             self._root.content = content
+            self._root.mtime = time.time()
 
     def __getitem__(self, path):
         return self._get_node(path).content
 
+    def mtime(self, path):
+        '''Time content at path was set, None if not set one by one'''
+        return self._get_node(path).mtime
+
     def is_internal(self, path):
         try:
             return bool(self._get_node(path).children)
@@ -44,7 +93,24 @@ class Trie(object):
 
     def children(self, path):
         children = self._get_node(path).children
-        return children.keys() if children else ()
+        return list(children) if children else ()
+
+    def walk(self, path=(), depth_first=True, max_depth=None, prune=None):
+        '''Iterate over the paths of all nodes below path.
+
+        prune is called with paths of internal nodes,
+        see `traversal.walk_tree` for the rest of the parameters.
+        '''
+        try:
+            root = (tuple(path), self._get_node(path))
+        except KeyError:
+            return iter(())
+
+        return (
+            item[0]
+            for item in walk_tree(
+                root, _child_items, _has_children, depth_first, max_depth,
+                None if prune is None else (lambda item: prune(item[0]))))
 
     def extend(self, path, contents=itertools.repeat(None)):
         '''Add missing nodes along path.
@@ -57,9 +123,48 @@ class Trie(object):
         '''
         self._extend(path, contents, set_last=False)
 
+    def update(self, items, prefix=()):
+        '''Set contents from (path, content) pairs, paths relative to prefix.
+
+        The nodes on the previous path are remembered, only the part
+        of a path not shared with the previous one is looked up or created.
+        Sorted input is the fastest.
+        Contents set this way have no `mtime`.
+        '''
+        self.extend(prefix)
+        names = []
+        nodes = [self._get_node(prefix)]
+        for path, content in items:
+            if not path:
+                nodes[0].content = content
+                continue
+            directories = len(path) - 1
+            common = 0
+            for name in names:
+                if common == directories or name != path[common]:
+                    del names[common:]
+                    del nodes[common + 1:]
+                    break
+                common += 1
+
+            node = nodes[-1]
+            for i in range(common, directories):
+                node = _get_or_add_child(node, path[i], None)
+                names.append(path[i])
+                nodes.append(node)
+
+            children = node.children
+            child = None if children is None else children.get(path[-1])
+            if child is None:
+                child = _get_or_add_child(node, path[-1], content)
+            child.content = content
+            child.mtime = None
+
     def delete(self, path):
         if path:
             node = self._get_node(path[:-1])
+            if not node.children:
+                raise KeyError(path)
             del node.children[path[-1]]
         else:
             self._root.children = None
@@ -92,11 +197,162 @@ class Trie(object):
                 content = next(icontents)
             except StopIteration:
                 raise ValueError
-            if node.children is None:
-                node.children = {}
-            if name not in node.children:
-                node.children[name] = Node(content)
-            node = node.children[name]
+            node = _get_or_add_child(node, name, content)
 
         if set_last:
             node.content = content
+            node.mtime = time.time()
+
+
+class SizedTrie(Trie):
+
+    '''Trie maintaining the total size and count of contents per subtree.
+
+    Totals are updated along the path on every change,
+    so `total_size` and `total_count` take time proportional
+    to the path length only.
+    '''
+
+    node_class = SizedNode
+
+    def __init__(self, sizeof=nbytes):
+        '''
+        sizeof: size of a content, `None` contents have none
+        '''
+        self._sizeof = sizeof
+        # reentrant: `Trie.update` calls `extend`
+        self._lock = threading.RLock()
+        super(SizedTrie, self).__init__()
+
+    @classmethod
+    def from_items(cls, items, sizeof=nbytes):
+        trie = cls(sizeof)
+        trie.update(items)
+        return trie
+
+    def total_size(self, path=()):
+        '''Sum of content sizes at and below path'''
+        try:
+            return self._get_node(path).size
+        except KeyError:
+            return 0
+
+    def total_count(self, path=()):
+        '''Number of contents at and below path'''
+        try:
+            return self._get_node(path).count
+        except KeyError:
+            return 0
+
+    def __setitem__(self, path, content):
+        with self._lock:
+            nodes = self._spine(path)
+            node = nodes[-1]
+            size = self._size(content) - self._size(node.content)
+            count = (content is not None) - (node.content is not None)
+            node.content = content
+            node.mtime = time.time()
+            _add_totals(nodes, size, count)
+
+    def extend(self, path, contents=itertools.repeat(None)):
+        with self._lock:
+            super(SizedTrie, self).extend(path, contents)
+            self._recount_path(path)
+
+    def update(self, items, prefix=()):
+        '''See `Trie.update`, totals below prefix are recounted after'''
+        with self._lock:
+            super(SizedTrie, self).update(items, prefix)
+            self._recount(self._get_node(prefix))
+            self._recount_path(prefix[:-1])
+
+    def delete(self, path):
+        with self._lock:
+            if not path:
+                super(SizedTrie, self).delete(path)
+                self._root.size = self._root.count = 0
+                return
+            nodes = self._spine(path, create=False)
+            node = nodes.pop()
+            super(SizedTrie, self).delete(path)
+            _add_totals(nodes, -node.size, -node.count)
+
+    # helpers
+
+    def _size(self, content):
+        return 0 if content is None else self._sizeof(content)
+
+    def _spine(self, path, create=True):
+        '''Nodes from the root to path'''
+        nodes = [self._root]
+        for name in path:
+            if create:
+                nodes.append(_get_or_add_child(nodes[-1], name, None))
+            else:
+                children = nodes[-1].children
+                if not children or name not in children:
+                    raise KeyError(path)
+                nodes.append(children[name])
+        return nodes
+
+    def _recount_path(self, path):
+        '''Recompute totals of the nodes on path, deepest first'''
+        for node in reversed(self._spine(path, create=False)):
+            self._recount_node(node)
+
+    def _recount(self, root):
+        '''Recompute totals of the whole subtree at root'''
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if children_done or not node.children:
+                self._recount_node(node)
+            else:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False) for child in node.children.values())
+
+    def _recount_node(self, node):
+        size = self._size(node.content)
+        count = int(node.content is not None)
+        if node.children:
+            for child in node.children.values():
+                size += child.size
+                count += child.count
+        node.size = size
+        node.count = count
+
+
+def _add_totals(nodes, size, count):
+    if size or count:
+        for node in nodes:
+            node.size += size
+            node.count += count
+
+
+def _get_or_add_child(node, name, content):
+    '''Child of node called name, created with content if missing'''
+    children = node.children
+    if children is None:
+        with _children_lock:
+            if node.children is None:
+                node.children = {}
+        children = node.children
+    child = children.get(name)
+    if child is None:
+        child = children.setdefault(name, node.__class__(content))
+    return child
+
+
+def _child_items(item):
+    path, node = item
+    if not node.children:
+        return ()
+    # a snapshot: the walk goes on when children are deleted meanwhile
+    return [
+        (path + (name,), child)
+        for name, child in list(node.children.items())]
+
+
+def _has_children(item):
+    return bool(item[1].children)
@@ -0,0 +1,294 @@
+'''
+Write-back buffering in front of another external.
+
+    out = WriteBack(File('/results'), max_age=2)
+    for name, data in results:
+        (out / name).content = data  # returns at once
+    out.close()  # everything is written, or FlushError is raised
+
+Written contents are kept in memory and readable right away,
+a background thread writes them to the backing external in batches
+(with `bulk.write_many`) when there are max_pending of them,
+max_pending_bytes of them or the oldest is max_age seconds old.
+'''
+import collections
+import threading
+import time
+
+from . import HierarchicalExternal
+from .bulk import write_many
+from .external import Stat
+from .memory import ReadableStream, WritableStream, readonly_view
+
+
+class FlushError(IOError):
+
+    '''Some contents could not be written, they are kept for the next try'''
+
+    def __init__(self, failures):
+        # [(backing external, error)]
+        self.failures = failures
+        super(FlushError, self).__init__(
+            '{} writes failed, first: {!r}'.format(
+                len(failures), failures[0][1]))
+
+
+class WriteBuffer(object):
+
+    '''Pending writes of a `WriteBack` tree and the thread flushing them'''
+
+    def __init__(
+            self, backing, max_pending=1000, max_pending_bytes=8 * 1024 ** 2,
+            max_age=1.0, workers=8, executor=None):
+        self.backing = backing
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.max_age = max_age
+        self.workers = workers
+        self.executor = executor
+        self.flushes = 0
+        # failures of the last flush
+        self.failures = []
+        # path segments -> (content, time written), oldest first
+        self._queue = collections.OrderedDict()
+        self._queued_bytes = 0
+        # the batch being written, still served to readers
+        self._flushing = {}
+        self._condition = threading.Condition()
+        # one flush at a time
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def pending(self):
+        with self._condition:
+            return len(self._queue) + len(self._flushing)
+
+    def put(self, path, content):
+        with self._condition:
+            if self._closed:
+                raise ValueError('write to closed WriteBack')
+            old = self._queue.pop(path, None)
+            if old is not None:
+                self._queued_bytes -= _size(old[0])
+            self._queue[path] = (content, time.time())
+            self._queued_bytes += _size(content)
+            # the first write starts the max_age countdown
+            if len(self._queue) == 1 or self._is_due():
+                self._condition.notify()
+
+    def get(self, path):
+        '''(content, time written) if pending, None otherwise'''
+        with self._condition:
+            pending = self._queue.get(path)
+            if pending is None:
+                pending = self._flushing.get(path)
+            return pending
+
+    def paths(self):
+        with self._condition:
+            return list(self._queue) + list(self._flushing)
+
+    def discard_below(self, path):
+        '''Forget pending writes at or below path'''
+        depth = len(path)
+        with self._condition:
+            for pending in list(self._queue):
+                if pending[:depth] == path:
+                    content, _ = self._queue.pop(pending)
+                    self._queued_bytes -= _size(content)
+
+    def flush(self):
+        '''Write all pending contents, raise FlushError for failed ones'''
+        with self._flush_lock:
+            with self._condition:
+                batch = self._flushing = self._queue
+                self._queue = collections.OrderedDict()
+                self._queued_bytes = 0
+            if not batch:
+                return
+            backing = self.backing
+            results = write_many(
+                ((backing.new(path), content)
+                 for path, (content, _) in batch.items()),
+                self.workers, self.executor)
+            failures = [
+                (external, error)
+                for external, error in results if error is not None]
+            with self._condition:
+                for external, _ in failures:
+                    path = external.path_segments
+                    if path not in self._queue:
+                        # retried after max_age, not right away
+                        content, _ = batch[path]
+                        self._queue[path] = (content, time.time())
+                        self._queued_bytes += _size(content)
+                self._flushing = {}
+                self.flushes += 1
+                self.failures = failures
+            if failures:
+                raise FlushError(failures)
+
+    def close(self):
+        '''Flush everything and stop the thread'''
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _is_due(self):
+        queue = self._queue
+        if not queue:
+            return False
+        if (len(queue) >= self.max_pending
+                or self._queued_bytes >= self.max_pending_bytes):
+            return True
+        return self._oldest_age() >= self.max_age
+
+    def _oldest_age(self):
+        _, written = next(iter(self._queue.values()))
+        return time.time() - written
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._is_due():
+                    timeout = None
+                    if self._queue:
+                        timeout = max(
+                            self.max_age - self._oldest_age(), 0.001)
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except FlushError:
+                # kept in the queue, retried after max_age
+                pass
+
+
+def _size(content):
+    return readonly_view(content).nbytes
+
+
+class WriteBack(HierarchicalExternal):
+
+    __slots__ = ('_buffer',)
+
+    def __init__(
+            self, backing, path=None, path_segments=None, buffer=None,
+            **limits):
+        '''
+        backing: the external written to, my paths are its paths
+        limits: max_pending, max_pending_bytes, max_age, workers and
+            executor of the `WriteBuffer`
+        '''
+        self._buffer = buffer or WriteBuffer(backing, **limits)
+        if path is None and path_segments is None:
+            path_segments = backing.path_segments
+        super(WriteBack, self).__init__(path, path_segments or ())
+
+    def new(self, path_segments):
+        return self.__class__(
+            self._buffer.backing, path_segments=path_segments,
+            buffer=self._buffer)
+
+    def _backend_key(self):
+        return self._buffer
+
+    @property
+    def backing(self):
+        '''The external written to'''
+        return self._buffer.backing.new(self.path_segments)
+
+    @property
+    def pending(self):
+        '''Number of contents not yet written'''
+        return self._buffer.pending
+
+    def flush(self):
+        '''Write the pending contents now'''
+        self._buffer.flush()
+
+    def close(self):
+        '''Write the pending contents and stop writing in the background.
+
+        Raises FlushError if not everything could be written.
+        '''
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        names = set()
+        for x in self.backing:
+            names.add(x.name)
+            yield self.new(x.path_segments)
+        for name in self._pending_children():
+            if name not in names:
+                names.add(name)
+                yield self / name
+
+    def _pending_children(self):
+        path = self.path_segments
+        depth = len(path)
+        return [
+            pending[depth] for pending in self._buffer.paths()
+            if len(pending) > depth and pending[:depth] == path]
+
+    # External implementation
+    def exists(self):
+        return self.is_file() or self.backing.exists()
+
+    def is_file(self):
+        if self._buffer.get(self.path_segments) is not None:
+            return True
+        return self.backing.is_file()
+
+    def is_dir(self):
+        return self.backing.is_dir() or bool(self._pending_children())
+
+    @property
+    def content(self):
+        pending = self._buffer.get(self.path_segments)
+        if pending is not None:
+            return pending[0]
+        return self.backing.content
+
+    @content.setter
+    def content(self, value):
+        self._buffer.put(self.path_segments, value)
+
+    def stat(self):
+        pending = self._buffer.get(self.path_segments)
+        if pending is not None:
+            content, written = pending
+            return Stat(_size(content), written)
+        return self.backing.stat()
+
+    def readable_stream(self):
+        pending = self._buffer.get(self.path_segments)
+        if pending is not None:
+            return ReadableStream(readonly_view(pending[0]))
+        return self.backing.readable_stream()
+
+    def writable_stream(self):
+        return WritableStream(self)
+
+    def make_dirs(self):
+        self.backing.make_dirs()
+
+    def delete(self):
+        '''Delete now, pending writes below me are dropped'''
+        # a write in flight must not bring back what is deleted
+        self._buffer.discard_below(self.path_segments)
+        with self._buffer._flush_lock:
+            self.backing.delete()
@@ -15,7 +15,13 @@ setup(
     author='Krisztián Fekete',
     author_email='fekete.krisztyan@gmail.com',
     url='http://maybe.later',
+    classifiers=[
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+    ],
     packages=['externals', 'externals.test'],
+    # memoryview.toreadonly, os.scandir, concurrent.futures, async def
+    python_requires='>=3.8',
     setup_requires=['versiontools >= 1.8'],
     install_requires=[],
     tests_require=[